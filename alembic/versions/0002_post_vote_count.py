@@ -0,0 +1,38 @@
+"""
+Denormalized vote counter on posts
+
+Adds posts.vote_count and backfills it from the votes table.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0002_post_vote_count"
+down_revision = "0001_initial"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "posts",
+        sa.Column("vote_count", sa.Integer(), server_default=sa.text("0"), nullable=False),
+    )
+    op.execute(
+        """
+        UPDATE posts
+        SET vote_count = counts.total
+        FROM (
+            SELECT post_id, COUNT(*) AS total
+            FROM votes
+            GROUP BY post_id
+        ) AS counts
+        WHERE posts.id = counts.post_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("posts", "vote_count")
@@ -0,0 +1,28 @@
+"""
+Index for keyset pagination of the posts feed
+
+Adds a partial (created_at, id) index over published posts.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0003_posts_keyset_index"
+down_revision = "0002_post_vote_count"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_posts_published_created_at_id",
+        "posts",
+        ["created_at", "id"],
+        postgresql_where=sa.text("published"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_posts_published_created_at_id", table_name="posts")
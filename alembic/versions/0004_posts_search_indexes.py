@@ -0,0 +1,45 @@
+"""
+Indexed search over posts
+
+Enables pg_trgm and adds a trigram GIN index on posts.title (serves the
+LIKE '%...%' search), plus a generated tsvector column over title and
+content with its own GIN index for ranked full-text search.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "0004_posts_search_indexes"
+down_revision = "0003_posts_keyset_index"
+branch_labels = None
+depends_on = None
+
+
+SEARCH_DOCUMENT = "to_tsvector('english', coalesce(title, '') || ' ' || coalesce(content, ''))"
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index(
+        "ix_posts_title_trgm",
+        "posts",
+        ["title"],
+        postgresql_using="gin",
+        postgresql_ops={"title": "gin_trgm_ops"},
+    )
+
+    op.add_column(
+        "posts",
+        sa.Column("search_vector", postgresql.TSVECTOR(), sa.Computed(SEARCH_DOCUMENT, persisted=True)),
+    )
+    op.create_index("ix_posts_search_vector", "posts", ["search_vector"], postgresql_using="gin")
+
+
+def downgrade() -> None:
+    op.drop_index("ix_posts_search_vector", table_name="posts")
+    op.drop_column("posts", "search_vector")
+    op.drop_index("ix_posts_title_trgm", table_name="posts")
+    # pg_trgm is left installed; other objects in the database may use it
@@ -0,0 +1,37 @@
+"""
+Indexes for foreign-key lookups
+
+Adds votes(post_id) and posts(owner_id), built CONCURRENTLY so writes to the
+live tables are not blocked. The partial index over published posts used by
+the feed already exists (0003_posts_keyset_index).
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "0005_foreign_key_indexes"
+down_revision = "0004_posts_search_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_votes_post_id", "votes", ["post_id"],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            "ix_posts_owner_id", "posts", ["owner_id"],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_posts_owner_id", table_name="posts",
+                      postgresql_concurrently=True, if_exists=True)
+        op.drop_index("ix_votes_post_id", table_name="votes",
+                      postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,45 @@
+"""
+Top posts ranking
+
+Adds a partial (vote_count, id) index over published posts (built
+CONCURRENTLY) and the top_posts materialized view: the 1000 most-voted
+published posts ranked by (vote_count DESC, id DESC), with the time of the
+refresh. The unique index on post_id is what allows REFRESH ... CONCURRENTLY.
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "0006_top_posts_view"
+down_revision = "0005_foreign_key_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_posts_published_vote_count_id "
+            "ON posts (vote_count, id) WHERE published"
+        )
+    op.execute(
+        """
+        CREATE MATERIALIZED VIEW IF NOT EXISTS top_posts AS
+        SELECT id AS post_id, vote_count AS votes,
+               row_number() OVER (ORDER BY vote_count DESC, id DESC)::integer AS rank,
+               now() AS refreshed_at
+        FROM (SELECT id, vote_count FROM posts WHERE published
+              ORDER BY vote_count DESC, id DESC LIMIT 1000) AS ranked
+        WITH DATA
+        """
+    )
+    op.execute("CREATE UNIQUE INDEX IF NOT EXISTS ix_top_posts_post_id ON top_posts (post_id)")
+    op.execute("CREATE UNIQUE INDEX IF NOT EXISTS ix_top_posts_rank ON top_posts (rank)")
+
+
+def downgrade() -> None:
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS top_posts")
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_posts_published_vote_count_id")
@@ -0,0 +1,57 @@
+"""
+Keep the top_posts refresh time outside the ranked rows
+
+The time of the last refresh moves from a column of every top_posts row to
+the one-row top_posts_refresh table, updated in the refresh's transaction. An
+empty ranking then still records when it was computed, instead of reading as
+never refreshed. The view is rebuilt without its refreshed_at column.
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "0007_top_posts_refresh_time"
+down_revision = "0006_top_posts_view"
+branch_labels = None
+depends_on = None
+
+
+_CREATE_VIEW = """
+CREATE MATERIALIZED VIEW top_posts AS
+SELECT id AS post_id, vote_count AS votes,
+       row_number() OVER (ORDER BY vote_count DESC, id DESC)::integer AS rank{extra}
+FROM (SELECT id, vote_count FROM posts WHERE published
+      ORDER BY vote_count DESC, id DESC LIMIT 1000) AS ranked
+WITH DATA
+"""
+
+
+def _create_view(extra: str = "") -> None:
+    op.execute(_CREATE_VIEW.format(extra=extra))
+    op.execute("CREATE UNIQUE INDEX ix_top_posts_post_id ON top_posts (post_id)")
+    op.execute("CREATE UNIQUE INDEX ix_top_posts_rank ON top_posts (rank)")
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS top_posts_refresh (
+            id boolean PRIMARY KEY DEFAULT true,
+            refreshed_at timestamptz,
+            CONSTRAINT ck_top_posts_refresh_single_row CHECK (id)
+        )
+        """
+    )
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS top_posts")
+    _create_view()
+    op.execute(
+        "INSERT INTO top_posts_refresh (id, refreshed_at) VALUES (true, now()) "
+        "ON CONFLICT (id) DO UPDATE SET refreshed_at = excluded.refreshed_at"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS top_posts")
+    _create_view(extra=",\n       now() AS refreshed_at")
+    op.execute("DROP TABLE IF EXISTS top_posts_refresh")
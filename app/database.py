@@ -1,10 +1,27 @@
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
-from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
+import asyncio
+import hashlib
+import hmac
+from contextlib import AsyncExitStack
+from fastapi import Request
+from jose import JWTError, jwt
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, create_async_engine, async_sessionmaker
+from sqlalchemy import text
+from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from starlette.datastructures import MutableHeaders
+import logging
+import os
 import psycopg
 from psycopg.rows import dict_row
+import threading
 import time
+from typing import Awaitable, Callable, Optional, Tuple
 from .config import settings
+from .pool_metrics import instrumented_pool_class, plan_pool_sizes
+from .query_stats import instrument_engine
+
+
+logger = logging.getLogger(__name__)
 
 
 # Normalize host for Windows where 'localhost' may misresolve
@@ -12,46 +29,329 @@ _host = settings.database_hostname.strip() if isinstance(settings.database_hostn
 if _host.lower() == "localhost":
     _host = "127.0.0.1"
 
-# Synchronous (v1) database setup
 SQLALCHEMY_DATABASE_URL = (
     f"postgresql+psycopg://{settings.database_username}:{settings.database_password}@"
     f"{_host}:{settings.database_port}/{settings.database_name}"
 )
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-# Asynchronous (v2) database setup
 ASYNC_SQLALCHEMY_DATABASE_URL = (
     f"postgresql+asyncpg://{settings.database_username}:{settings.database_password}@"
     f"{_host}:{settings.database_port}/{settings.database_name}"
 )
-async_engine = create_async_engine(
-    ASYNC_SQLALCHEMY_DATABASE_URL,
-    pool_size=20,
-    max_overflow=40,
-    pool_timeout=30,
-    pool_recycle=1800,
-)
-AsyncSessionLocal = async_sessionmaker(autocommit=False, autoflush=False, bind=async_engine)
+
+
+def _server_max_connections() -> Optional[int]:
+    try:
+        with psycopg.connect(SQLALCHEMY_DATABASE_URL.replace("+psycopg", ""), connect_timeout=5) as conn:
+            return int(conn.execute("SHOW max_connections").fetchone()[0])
+    except psycopg.Error:
+        logger.warning("Could not read max_connections; using the configured pool sizes", exc_info=True)
+        return None
+
+
+def _pool_sizes() -> dict:
+    """{"async": (pool_size, max_overflow)} for this worker."""
+    pools = {
+        "async": (settings.db_pool_size, settings.db_max_overflow),
+    }
+    if settings.db_pool_mode != "auto":
+        return pools
+    max_connections = settings.db_max_connections or _server_max_connections()
+    if max_connections is None:
+        return pools
+    workers = settings.db_pool_workers or int(os.environ.get("WEB_CONCURRENCY", "1"))
+    planned = plan_pool_sizes(pools, max_connections, settings.db_reserved_connections, workers)
+    logger.info("Auto-sized connection pools for %d worker(s), max_connections=%d: %s",
+                workers, max_connections, planned)
+    return planned
+
+
+def _pool_options(name: str, sizes: Tuple[int, int]) -> dict:
+    pool_size, max_overflow = sizes
+    return {
+        "poolclass": instrumented_pool_class(AsyncAdaptedQueuePool, name),
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+    }
+
+
+# The engines, session factory and replica router are built by init_engines(),
+# which the app's lifespan calls at startup. Anything else touching them (scripts,
+# tests) builds them on first attribute access, so importing this module neither
+# connects nor sizes pools.
+_ENGINE_NAMES = frozenset({"async_engine", "AsyncSessionLocal", "replica_engine", "replica_router"})
+_init_lock = threading.Lock()
+
+
+def init_engines() -> None:
+    """Create the engines, session factory and replica router once per process."""
+    global async_engine, AsyncSessionLocal, replica_engine, replica_router
+    with _init_lock:
+        if "async_engine" in globals():
+            return
+        sizes = _pool_sizes()["async"]
+
+        # One async engine serves both API versions (v1 is a thin layer over app.services)
+        primary = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL, **_pool_options("primary", sizes))
+        session_factory = async_sessionmaker(autocommit=False, autoflush=False, bind=primary)
+
+        # Optional read replica (GET requests), sized like the primary
+        replica = (
+            create_async_engine(settings.database_replica_url, **_pool_options("replica", sizes))
+            if settings.database_replica_url else None
+        )
+
+        # Per-request statement counts/timings and the slow-query log
+        instrument_engine(primary.sync_engine)
+        if replica is not None:
+            instrument_engine(replica.sync_engine)
+
+        replica_router = ReplicaRouter(
+            session_factory,
+            replica,
+            max_lag=settings.replica_max_lag_seconds,
+            lag_check_interval=settings.replica_lag_check_interval_seconds,
+            read_your_writes=settings.replica_read_your_writes_seconds,
+            lag_check_timeout=settings.replica_lag_check_timeout_seconds,
+        )
+        AsyncSessionLocal = session_factory
+        replica_engine = replica
+        async_engine = primary
+
+
+def __getattr__(name: str):
+    if name in _ENGINE_NAMES:
+        init_engines()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+async def prewarm(connections: int, warm_up: Optional[Callable[[AsyncConnection], Awaitable[None]]] = None) -> dict:
+    """Open pooled connections ahead of traffic and run `warm_up(conn)` on each.
+
+    Up to `connections` are opened at once on the primary and on the replica,
+    capped at the pool size: overflow connections are closed on checkin, so
+    they would not stay in the pool. With a warm-up but no connections, one is
+    opened so the compiled statement cache still gets filled.
+    Returns {"primary": opened, "replica": opened}.
+    """
+    init_engines()
+    if warm_up is not None:
+        connections = max(connections, 1)
+    opened = {"primary": await _prewarm_engine(async_engine, connections, warm_up)}
+    if replica_engine is not None:
+        opened["replica"] = await _prewarm_engine(replica_engine, connections, warm_up)
+    return opened
+
+
+async def _prewarm_engine(engine: AsyncEngine, connections: int, warm_up) -> int:
+    count = min(connections, engine.pool.size())
+    if count <= 0:
+        return 0
+    async with AsyncExitStack() as stack:
+        # All checked out together, so each one is a separate pooled connection;
+        # gather waits for every attempt, so none is left open on failure
+        results = await asyncio.gather(
+            *(stack.enter_async_context(engine.connect()) for _ in range(count)), return_exceptions=True)
+        conns = [conn for conn in results if not isinstance(conn, BaseException)]
+        if warm_up is not None:
+            await asyncio.gather(*(warm_up(conn) for conn in conns))
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+    return len(conns)
+
+
+async def dispose_engines() -> None:
+    """Close every pooled connection (the engines stay usable and reconnect on demand)."""
+    if "async_engine" not in globals():
+        return
+    await async_engine.dispose()
+    if replica_engine is not None:
+        await replica_engine.dispose()
+
 
 Base = declarative_base()
 
 
-# Dependency for synchronous (v1) sessions
-def get_db():
-    db = SessionLocal()
+_SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+# Seconds the replica is behind. An idle primary produces no WAL to replay, so
+# a replica that has replayed everything it received counts as caught up.
+_REPLICA_LAG_SQL = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() "
+    "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+# Cookie carrying the time of the caller's last write, signed with secret_key
+READ_YOUR_WRITES_COOKIE = "rw_at"
+
+
+class ReplicaRouter:
+    """Picks the primary or the replica session factory for each request.
+
+    Safe (GET/HEAD/OPTIONS) requests read from the replica unless the caller
+    wrote recently (read-your-writes pin) or the replica lags more than
+    `max_lag` seconds. Everything else, and everything when no replica is
+    configured, goes to the primary.
+
+    The pin is kept by the client, not the worker: a successful write by an
+    authenticated user returns a cookie with the user id and the write time,
+    signed with `secret`, so whichever worker serves the next read honours it
+    for `read_your_writes` seconds.
+    """
+
+    def __init__(self, primary: async_sessionmaker, replica_engine: Optional[AsyncEngine] = None,
+                 max_lag: float = 2.0, lag_check_interval: float = 1.0,
+                 read_your_writes: float = 5.0, lag_check_timeout: float = 0.5,
+                 secret: str = settings.secret_key, clock=time.time):
+        self.primary = primary
+        self.replica_engine = replica_engine
+        self.replica = (
+            async_sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+            if replica_engine is not None else None
+        )
+        self.max_lag = max_lag
+        self.lag_check_interval = lag_check_interval
+        self.lag_check_timeout = lag_check_timeout
+        self.read_your_writes = read_your_writes
+        self._secret = secret.encode()
+        self._clock = clock
+        self._lag: Optional[float] = None
+        self._lag_checked_at: Optional[float] = None
+        self.replica_reads = 0
+        self.primary_reads = 0
+        self.lag_fallbacks = 0
+        self.pins = 0
+
+    def _sign(self, payload: str) -> str:
+        return hmac.new(self._secret, payload.encode(), hashlib.sha256).hexdigest()
+
+    def pin_cookie(self, user_id: int) -> str:
+        """Set-Cookie value pinning `user_id` to the primary from now on."""
+        self.pins += 1
+        payload = f"{user_id}.{self._clock():.3f}"
+        return (f"{READ_YOUR_WRITES_COOKIE}={payload}.{self._sign(payload)}; "
+                f"Max-Age={max(1, round(self.read_your_writes))}; Path=/; HttpOnly; SameSite=Lax")
+
+    def is_pinned(self, cookie: Optional[str], user_id: Optional[int]) -> bool:
+        """Whether `cookie` is a valid pin for `user_id` that is still inside the window."""
+        if not cookie or user_id is None:
+            return False
+        payload, _, signature = cookie.rpartition(".")
+        if not hmac.compare_digest(signature.encode(), self._sign(payload).encode()):
+            return False
+        pinned_user, _, written_at = payload.partition(".")
+        try:
+            return pinned_user == str(user_id) and self._clock() - float(written_at) < self.read_your_writes
+        except ValueError:
+            return False
+
+    async def replica_lag(self) -> Optional[float]:
+        """Last measured lag in seconds, refreshed at most every `lag_check_interval`.
+
+        None means the replica could not be reached.
+        """
+        now = self._clock()
+        if self._lag_checked_at is None or now - self._lag_checked_at >= self.lag_check_interval:
+            # Claim the check first so concurrent requests reuse the previous value
+            self._lag_checked_at = now
+            try:
+                # Bounded, so an unreachable replica doesn't hold up the reads waiting on it
+                self._lag = await asyncio.wait_for(self._measure_lag(), self.lag_check_timeout)
+            except Exception:
+                logger.warning("Replica lag check failed; reading from the primary", exc_info=True)
+                self._lag = None
+        return self._lag
+
+    async def _measure_lag(self) -> float:
+        async with self.replica_engine.connect() as conn:
+            return float((await conn.execute(_REPLICA_LAG_SQL)).scalar())
+
+    async def route(self, method: str, cookie: Optional[str] = None,
+                    user_id: Optional[int] = None) -> Tuple[async_sessionmaker, bool]:
+        """Return (session factory, pinned) for a request."""
+        if self.replica is None or method not in _SAFE_METHODS:
+            return self.primary, False
+        if self.is_pinned(cookie, user_id):
+            self.primary_reads += 1
+            return self.primary, True
+        lag = await self.replica_lag()
+        if lag is None or lag > self.max_lag:
+            self.lag_fallbacks += 1
+            self.primary_reads += 1
+            return self.primary, False
+        self.replica_reads += 1
+        return self.replica, False
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.replica is not None,
+            "replica_reads": self.replica_reads,
+            "primary_reads": self.primary_reads,
+            "lag_fallbacks": self.lag_fallbacks,
+            "last_lag_seconds": self._lag,
+            "pins": self.pins,
+        }
+
+
+def _client_key(request: Request) -> Optional[int]:
+    """User id from the bearer token, matched against the pin cookie's user.
+
+    The token's signature is not checked here (the cookie's is), so a forged
+    token can at worst send the reads of a client holding a valid pin to the
+    primary. Authentication still happens in oauth2.
+    """
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
     try:
-        yield db
-    finally:
-        db.close()
+        return jwt.get_unverified_claims(token).get("user_id")
+    except JWTError:
+        return None
 
 
-# Dependency for asynchronous (v2) sessions
-async def get_async_db():
-    async with AsyncSessionLocal() as db:
+# Session dependency for both API versions
+async def get_async_db(request: Request):
+    init_engines()  # no-op once the lifespan has built them
+    session_factory, pinned = await replica_router.route(
+        request.method, request.cookies.get(READ_YOUR_WRITES_COOKIE), _client_key(request))
+    async with session_factory() as db:
+        # Pinned readers skip shared response caches that replica reads may fill
+        db.info["read_your_writes"] = pinned
         yield db
 
 
+class ReadYourWritesMiddleware:
+    """Pure ASGI middleware issuing the pin cookie after a successful write.
+
+    Only 2xx responses to unsafe requests made by an authenticated user
+    (oauth2 records the id in `request.state.principal_id`) are pinned. The
+    cookie is timed when the response starts, after the write committed, so
+    the window covers replication.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in _SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and 200 <= message["status"] < 300:
+                user_id = scope.get("state", {}).get("principal_id")
+                if user_id is not None and replica_router.replica is not None:
+                    MutableHeaders(scope=message).append("set-cookie", replica_router.pin_cookie(user_id))
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
 # # Run native sql query using psycopg
 # while True:
 #     try:
@@ -0,0 +1,66 @@
+import hmac
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
+
+from . import database, oauth2, utils
+from .pool_metrics import pool_stats
+from .profiler import profile_store
+from .config import settings
+from .response_cache import response_cache
+from .startup import startup_state
+from .top_posts import top_posts_ranking
+from .vote_buffer import vote_buffer
+
+
+def require_internal_token(x_internal_token: Optional[str] = Header(default=None)):
+    # Closed until a token is configured, like the profiler
+    if (settings.internal_token is None or x_internal_token is None
+            or not hmac.compare_digest(x_internal_token, settings.internal_token)):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
+                            detail="Not authorized to perform requested action.")
+
+
+router = APIRouter(
+    prefix="/internal",
+    tags=['Internal'],
+    dependencies=[Depends(require_internal_token)],
+    include_in_schema=False,
+)
+
+
+@router.get("/stats")
+async def get_stats():
+    return {
+        "response_cache": response_cache.stats(),
+        "principal_cache": oauth2.principal_cache.stats(),
+        "token_cache": oauth2.token_cache.stats(),
+        "password_hasher": utils.password_hasher.stats(),
+        "vote_buffer": vote_buffer.stats(),
+        "top_posts": top_posts_ranking.stats(),
+        "replica": database.replica_router.stats(),
+        "db_pools": {
+            "primary": pool_stats(database.async_engine),
+            "replica": pool_stats(database.replica_engine) if database.replica_engine is not None else None,
+        },
+        "startup": startup_state.stats(),
+    }
+
+
+def _get_profile(profile_id: str):
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail=f"Profile {profile_id} not found")
+    return profile
+
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str):
+    return _get_profile(profile_id).to_dict()
+
+
+@router.get("/profiles/{profile_id}/folded")
+async def get_profile_folded(profile_id: str):
+    # Folded stacks, one "frame;frame;... count" line each (flamegraph.pl, speedscope)
+    return Response(content=_get_profile(profile_id).folded(), media_type="text/plain")
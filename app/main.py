@@ -1,16 +1,66 @@
-from fastapi import FastAPI
-from app import models
-from app.database import engine
+import time
+
+_IMPORT_STARTED = time.perf_counter()
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Response, status
+from app import database, internal, metrics, models, services, utils
+from app.config import settings
+from app.pagination import NEXT_CURSOR_HEADER
+from app.profiler import PROFILE_ID_HEADER, PROFILE_SUMMARY_HEADER, ProfilerMiddleware
+from app.query_stats import DB_QUERIES_HEADER, SERVER_TIMING_HEADER, QueryStatsMiddleware
+from app.response_cache import CACHE_STATUS_HEADER
+from app.startup import startup_state
+from app.top_posts import REFRESHED_AT_HEADER, top_posts_ranking
+from app.vote_buffer import vote_buffer
 from app.v1.routers import post as v1_post, user as v1_user, auth as v1_auth, vote as v1_vote
 from app.v2.routers import post as v2_post, user as v2_user, auth as v2_auth, vote as v2_vote
 from fastapi.middleware.cors import CORSMiddleware
 
 
+logger = logging.getLogger(__name__)
+
+
 # # Create databse for postgres
 # models.Base.metadata.create_all(bind=engine)
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    with startup_state.phase("engine"):
+        # Off the loop: db_pool_mode=auto asks the server for max_connections
+        await asyncio.to_thread(database.init_engines)
+    with startup_state.phase("prewarm"):
+        try:
+            await database.prewarm(settings.db_prewarm_connections,
+                                   services.warm_up if settings.db_warm_up_statements else None)
+        except Exception:
+            # Not fatal: requests open their connections on demand as before
+            logger.warning("Connection prewarm failed", exc_info=True)
+    if settings.vote_buffer_enabled:
+        await vote_buffer.start()
+    await top_posts_ranking.start()
+    snapshot_writer = None
+    if settings.metrics_enabled and settings.metrics_multiproc_dir:
+        snapshot_writer = metrics.SnapshotWriter(settings.metrics_multiproc_dir,
+                                                 settings.metrics_flush_interval_seconds)
+        await snapshot_writer.start()
+    startup_state.mark_ready()
+    yield
+    startup_state.ready = False
+    # Flush buffered votes before the worker exits
+    await vote_buffer.stop()
+    await top_posts_ranking.stop()
+    if snapshot_writer is not None:
+        await snapshot_writer.stop()
+    utils.password_hasher.shutdown()
+    await database.dispose_engines()
+
+
+app = FastAPI(lifespan=lifespan)
 
 origins = ["*"] # allow for every single domain
 
@@ -20,8 +70,22 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, CACHE_STATUS_HEADER, DB_QUERIES_HEADER, SERVER_TIMING_HEADER,
+                    PROFILE_ID_HEADER, PROFILE_SUMMARY_HEADER, REFRESHED_AT_HEADER],
 )
 
+app.add_middleware(database.ReadYourWritesMiddleware)
+
+if settings.query_stats_enabled:
+    app.add_middleware(QueryStatsMiddleware)
+
+if settings.profiler_enabled:
+    app.add_middleware(ProfilerMiddleware)
+
+# Added last so it wraps everything else and also times CORS preflights
+if settings.metrics_enabled:
+    app.add_middleware(metrics.MetricsMiddleware)
+
 app.include_router(v1_post.router)
 app.include_router(v1_user.router)
 app.include_router(v1_auth.router)
@@ -32,7 +96,22 @@ app.include_router(v2_user.router)
 app.include_router(v2_auth.router)
 app.include_router(v2_vote.router)
 
+app.include_router(internal.router)
+if settings.metrics_enabled:
+    app.include_router(metrics.router)
+
+
+startup_state.record("import", time.perf_counter() - _IMPORT_STARTED)
+
 
 @app.get("/")
 async def root():
-    return {"message": "Welcome to my new api"}
\ No newline at end of file
+    return {"message": "Welcome to my new api"}
+
+
+@app.get("/ready", include_in_schema=False)
+async def ready(response: Response):
+    # 503 until the lifespan has built the engines and warmed the pools
+    if not startup_state.ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return startup_state.stats()
\ No newline at end of file
@@ -0,0 +1,276 @@
+"""In-process HTTP metrics served in the Prometheus text format at /metrics.
+
+`MetricsMiddleware` records, per method and route template, request counts by
+status, a latency histogram and a response size histogram, plus the number of
+requests in flight. Everything is plain dict/list arithmetic on the event loop.
+
+With `metrics_multiproc_dir` set, every worker periodically writes its own
+snapshot to `<dir>/metrics-<pid>.json` and /metrics sums the files of all
+workers, so a scrape of any worker reports the whole server. Counters from
+workers that have exited stay in the totals until the directory is cleared
+(`python -m app.serve` does that when it starts); their in-flight gauge is
+dropped.
+"""
+
+import asyncio
+import bisect
+import json
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, Response
+
+from .config import settings
+from .internal import require_internal_token
+
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000)
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class Histogram:
+    __slots__ = ("counts", "sum")
+
+    def __init__(self, buckets: int, counts: Optional[List[int]] = None, total: float = 0.0):
+        # counts[i] is observations in bucket i only; the last slot is +Inf
+        self.counts = counts if counts is not None else [0] * (buckets + 1)
+        self.sum = total
+
+    def merge(self, other: "Histogram") -> None:
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.sum += other.sum
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.requests: Dict[Tuple[str, str, str], int] = {}
+        self.latency: Dict[Tuple[str, str], Histogram] = {}
+        self.sizes: Dict[Tuple[str, str], Histogram] = {}
+        self.in_flight = 0
+
+    def observe(self, method: str, route: str, status: int, seconds: float, size: int) -> None:
+        key = (method, route)
+        status_key = (method, route, str(status))
+        self.requests[status_key] = self.requests.get(status_key, 0) + 1
+
+        latency = self.latency.get(key)
+        if latency is None:
+            latency = self.latency[key] = Histogram(len(LATENCY_BUCKETS))
+        latency.counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        latency.sum += seconds
+
+        sizes = self.sizes.get(key)
+        if sizes is None:
+            sizes = self.sizes[key] = Histogram(len(SIZE_BUCKETS))
+        sizes.counts[bisect.bisect_left(SIZE_BUCKETS, size)] += 1
+        sizes.sum += size
+
+    def reset(self) -> None:
+        self.__init__()
+
+    # Multiprocess snapshots
+
+    def to_dict(self) -> dict:
+        return {
+            "requests": [[*key, value] for key, value in self.requests.items()],
+            "latency": [[*key, h.counts, h.sum] for key, h in self.latency.items()],
+            "sizes": [[*key, h.counts, h.sum] for key, h in self.sizes.items()],
+            "in_flight": self.in_flight,
+        }
+
+    def merge_dict(self, data: dict, include_gauges: bool = True) -> None:
+        for method, route, status, value in data["requests"]:
+            key = (method, route, status)
+            self.requests[key] = self.requests.get(key, 0) + value
+        for field in ("latency", "sizes"):
+            histograms = getattr(self, field)
+            for method, route, counts, total in data[field]:
+                incoming = Histogram(0, list(counts), total)
+                current = histograms.get((method, route))
+                if current is None:
+                    histograms[(method, route)] = incoming
+                else:
+                    current.merge(incoming)
+        if include_gauges:
+            self.in_flight += data["in_flight"]
+
+    # Exposition
+
+    def render(self) -> str:
+        lines = [
+            "# HELP http_requests_total HTTP requests by method, route template and status.",
+            "# TYPE http_requests_total counter",
+        ]
+        for (method, route, status), value in sorted(self.requests.items()):
+            lines.append(f"http_requests_total{_labels(method=method, route=route, status=status)} {value}")
+        lines += _render_histogram(
+            "http_request_duration_seconds", "Request latency in seconds.", self.latency, LATENCY_BUCKETS)
+        lines += _render_histogram(
+            "http_response_size_bytes", "Response body size in bytes.", self.sizes, SIZE_BUCKETS)
+        lines += [
+            "# HELP http_requests_in_flight Requests currently being served.",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {self.in_flight}",
+        ]
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**labels: str) -> str:
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels.items()) + "}"
+
+
+def _format_bound(bound: float) -> str:
+    return repr(float(bound))
+
+
+def _render_histogram(name: str, help_text: str, histograms: Dict[Tuple[str, str], Histogram],
+                      buckets: Iterable[float]) -> List[str]:
+    bounds = [_format_bound(b) for b in buckets] + ["+Inf"]
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for (method, route), histogram in sorted(histograms.items()):
+        cumulative = 0
+        for bound, count in zip(bounds, histogram.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels(method=method, route=route, le=bound)} {cumulative}")
+        lines.append(f"{name}_sum{_labels(method=method, route=route)} {histogram.sum}")
+        lines.append(f"{name}_count{_labels(method=method, route=route)} {cumulative}")
+    return lines
+
+
+registry = MetricsRegistry()
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware feeding a MetricsRegistry (HTTP requests only)."""
+
+    def __init__(self, app, registry: MetricsRegistry = registry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        self.registry.in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.registry.in_flight -= 1
+            # The router stores the matched route in the scope; templated
+            # paths keep the label set bounded
+            route = getattr(scope.get("route"), "path", None) or UNMATCHED_ROUTE
+            self.registry.observe(scope["method"], route, status, time.perf_counter() - started, size)
+
+
+# Multiprocess mode
+
+def _snapshot_path(directory: str, pid: int) -> Path:
+    return Path(directory) / f"metrics-{pid}.json"
+
+
+def write_snapshot(directory: str, registry: MetricsRegistry = registry) -> None:
+    """Atomically replace this worker's snapshot file."""
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".metrics-")
+    with os.fdopen(fd, "w") as tmp:
+        json.dump(registry.to_dict(), tmp)
+    os.replace(tmp_path, _snapshot_path(directory, os.getpid()))
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def aggregate(directory: str, registry: MetricsRegistry = registry) -> MetricsRegistry:
+    """Sum every worker's snapshot, with this worker's live numbers in place of its file."""
+    total = MetricsRegistry()
+    total.merge_dict(registry.to_dict())
+    own = os.getpid()
+    for path in Path(directory).glob("metrics-*.json"):
+        try:
+            pid = int(path.stem.split("-", 1)[1])
+            if pid == own:
+                continue
+            data = json.loads(path.read_text())
+        except (ValueError, OSError):
+            logger.warning("Skipping unreadable metrics snapshot %s", path, exc_info=True)
+            continue
+        total.merge_dict(data, include_gauges=_pid_alive(pid))
+    return total
+
+
+class SnapshotWriter:
+    """Background task writing this worker's snapshot every `interval` seconds."""
+
+    def __init__(self, directory: str, interval: float, registry: MetricsRegistry = registry):
+        self.directory = directory
+        self.interval = interval
+        self.registry = registry
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                write_snapshot(self.directory, self.registry)
+            except OSError:
+                logger.warning("Could not write metrics snapshot", exc_info=True)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Final totals, so requests served just before exit are kept
+        write_snapshot(self.directory, self.registry)
+
+
+router = APIRouter(dependencies=[Depends(require_internal_token)], include_in_schema=False)
+
+
+@router.get("/metrics")
+async def get_metrics():
+    if settings.metrics_multiproc_dir:
+        body = aggregate(settings.metrics_multiproc_dir).render()
+    else:
+        body = registry.render()
+    return Response(content=body, media_type=CONTENT_TYPE)
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey
-from sqlalchemy.orm import relationship
-from sqlalchemy.sql.expression import text
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Index, Computed, CheckConstraint, DDL, event
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import relationship, deferred
+from sqlalchemy.sql.expression import column, table, text
 from sqlalchemy.sql.sqltypes import TIMESTAMP
 from .database import Base
 
@@ -15,8 +16,43 @@ class Post(Base):
     created_at = Column(TIMESTAMP(timezone=True),
                         nullable=False, server_default=text('now()'))
     owner_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    # Denormalized COUNT(votes); maintained by the vote endpoints
+    vote_count = Column(Integer, server_default=text('0'), nullable=False)
+    # Full-text document over title + content; deferred so feed reads skip it
+    search_vector = deferred(Column(
+        TSVECTOR,
+        Computed("to_tsvector('english', coalesce(title, '') || ' ' || coalesce(content, ''))",
+                 persisted=True),
+    ))
     owner = relationship("User")
 
+    # The pg_trgm GIN index on title (LIKE '%...%' search) is created by
+    # migration 0004 and, for create_all() (tests), by the DDL below.
+    __table_args__ = (
+        # Serves keyset pagination of the published feed (created_at DESC, id DESC)
+        Index("ix_posts_published_created_at_id", "created_at", "id",
+              postgresql_where=text("published")),
+        Index("ix_posts_search_vector", "search_vector", postgresql_using="gin"),
+        # FK lookups: ON DELETE CASCADE from users
+        Index("ix_posts_owner_id", "owner_id"),
+        # Most-voted published posts first (scanned backwards), for the top_posts refresh
+        Index("ix_posts_published_vote_count_id", "vote_count", "id",
+              postgresql_where=text("published")),
+    )
+
+
+# Skipped on servers without the contrib extensions, where the search falls
+# back to scanning; the query plan tests check the index where it exists
+event.listen(Post.__table__, "after_create", DDL("""
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm') THEN
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+        CREATE INDEX IF NOT EXISTS ix_posts_title_trgm ON posts USING gin (title gin_trgm_ops);
+    END IF;
+END
+$$"""))
+
 
 class User(Base):
     __tablename__ = "users"
@@ -30,4 +66,50 @@ class User(Base):
 class Vote(Base):
     __tablename__ = "votes"
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
-    post_id = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), primary_key=True)
\ No newline at end of file
+    post_id = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), primary_key=True)
+
+    # The (user_id, post_id) primary key can't serve lookups by post alone
+    # (joins/counts per post, ON DELETE CASCADE from posts)
+    __table_args__ = (
+        Index("ix_votes_post_id", "post_id"),
+    )
+
+
+class TopPostsRefresh(Base):
+    """When top_posts was last refreshed; one row, updated in the refresh's transaction."""
+    __tablename__ = "top_posts_refresh"
+    id = Column(Boolean, primary_key=True, server_default=text('true'))
+    # NULL until the first refresh
+    refreshed_at = Column(TIMESTAMP(timezone=True))
+
+    __table_args__ = (
+        CheckConstraint("id", name="ck_top_posts_refresh_single_row"),
+    )
+
+
+# Snapshot of the TOP_POSTS_SIZE most-voted published posts, ranked 1..n by
+# (vote_count DESC, id DESC), for GET /v2/posts/top. Refreshed concurrently by
+# app.top_posts, which needs the unique index; created by migrations 0006/0007
+# and, for create_all()/drop_all() (tests), by the DDL below.
+TOP_POSTS_SIZE = 1000
+
+top_posts = table(
+    "top_posts",
+    column("post_id", Integer),
+    column("votes", Integer),
+    column("rank", Integer),
+)
+
+for _statement in (
+    f"""CREATE MATERIALIZED VIEW IF NOT EXISTS top_posts AS
+    SELECT id AS post_id, vote_count AS votes,
+           row_number() OVER (ORDER BY vote_count DESC, id DESC)::integer AS rank
+    FROM (SELECT id, vote_count FROM posts WHERE published
+          ORDER BY vote_count DESC, id DESC LIMIT {TOP_POSTS_SIZE}) AS ranked
+    WITH DATA""",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_top_posts_post_id ON top_posts (post_id)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_top_posts_rank ON top_posts (rank)",
+    "INSERT INTO top_posts_refresh (id, refreshed_at) VALUES (true, now()) ON CONFLICT (id) DO NOTHING",
+):
+    event.listen(Base.metadata, "after_create", DDL(_statement))
+event.listen(Base.metadata, "before_drop", DDL("DROP MATERIALIZED VIEW IF EXISTS top_posts"))
@@ -1,12 +1,16 @@
 from jose import JWTError, jwt
 import copy
+import hashlib
+import time
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 from . import schemas, database, models
-from fastapi import Depends, status, HTTPException
+from fastapi import Depends, Request, status, HTTPException
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import make_transient_to_detached
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import event, select
+from .cache import LRUCache
 from .config import settings
 
 
@@ -20,6 +24,40 @@ ALGORITHM = settings.algorithm
 ACCESS_TOKEN_EXPIRE_MINUTES = settings.access_token_expire_minutes
 
 
+@dataclass(frozen=True)
+class Principal:
+    """Session-free stand-in for `models.User` returned in lightweight mode."""
+    id: int
+    email: str
+    created_at: datetime
+
+
+# Column snapshots of authenticated users, keyed by user id
+principal_cache = LRUCache(maxsize=settings.principal_cache_size,
+                           ttl=settings.principal_cache_ttl_seconds)
+
+_PRINCIPAL_COLUMNS = ("id", "email", "password", "created_at")
+
+
+# Decoded claims of verified tokens keyed by SHA-256 of the token; entries
+# expire at the token's own `exp` (wall clock), so expiry is never extended
+token_cache = LRUCache(maxsize=settings.token_cache_size, clock=time.time)
+
+
+def invalidate_principal(user_id: int) -> None:
+    principal_cache.invalidate(user_id)
+
+
+def clear_principal_cache() -> None:
+    principal_cache.clear()
+
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _invalidate_principal_on_change(mapper, connection, target) -> None:
+    invalidate_principal(target.id)
+
+
 def create_access_token(data: dict):
     to_encode = copy.deepcopy(data)
     # add expiration data to the JWT
@@ -31,7 +69,16 @@ def create_access_token(data: dict):
     return encoded_jwt
 
 
-def verify_access_token(token: str, credentials_exception):
+def _credentials_exception() -> HTTPException:
+    return HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
+                         detail="Could not validate credentials", headers={"WWW-Authenticate": "Bearer"})
+
+
+def verify_access_token(token: str, credentials_exception=None):
+    token_key = hashlib.sha256(token.encode()).digest()
+    token_data = token_cache.get(token_key)
+    if token_data is not None:
+        return token_data
 
     try:
         # python-jose expects a list for "algorithms"
@@ -39,36 +86,43 @@ def verify_access_token(token: str, credentials_exception):
         raw_id = payload.get("user_id")
 
         if raw_id is None:
-            raise credentials_exception
+            raise credentials_exception or _credentials_exception()
         # Coerce to int to match TokenData schema
         token_data = schemas.TokenData(id=int(raw_id))
     except JWTError:
-        raise credentials_exception
-    
-    return token_data
-    
+        raise credentials_exception or _credentials_exception()
 
-def get_current_user(token: str = Depends(oath2_schema), db: Session = Depends(database.get_db)) -> int:
-    credentials_exception = HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
-                                          detail=f"Could not validate credentials", headers={"WWW-Authenticate":"Bearer"})
+    expires_at = payload.get("exp")
+    if expires_at is not None:
+        token_cache.set(token_key, token_data, expires_at=float(expires_at))
+    return token_data
     
-    token_data = verify_access_token(token, credentials_exception)
-    user = db.query(models.User).filter(models.User.id == token_data.id).first()
-    return user
-
 
 async def get_current_user_async(
+    request: Request,
     token: str = Depends(oath2_schema),
     db: AsyncSession = Depends(database.get_async_db)
 ):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"}
-    )
-
-    token_data = verify_access_token(token, credentials_exception)
-    result = await db.execute(select(models.User).where(models.User.id == token_data.id))
-    user = result.scalar_one_or_none()
-    return user
+    token_data = verify_access_token(token)
+    # Lets a successful write pin this user's reads to the primary
+    request.state.principal_id = token_data.id
+
+    snapshot = principal_cache.get(token_data.id)
+    if snapshot is None:
+        result = await db.execute(select(models.User).where(models.User.id == token_data.id))
+        user = result.scalar_one_or_none()
+        if user is None:
+            return None
+        snapshot = {column: getattr(user, column) for column in _PRINCIPAL_COLUMNS}
+        principal_cache.set(token_data.id, snapshot)
+        if not settings.principal_cache_lightweight:
+            return user
+
+    if settings.principal_cache_lightweight:
+        return Principal(id=snapshot["id"], email=snapshot["email"], created_at=snapshot["created_at"])
+
+    # Re-attach the cached row to this request's session without a SELECT
+    user = models.User(**snapshot)
+    make_transient_to_detached(user)
+    return await db.merge(user, load=False)
 
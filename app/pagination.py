@@ -0,0 +1,43 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import tuple_
+
+from . import models
+
+
+# Response header carrying the opaque cursor for the next feed page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Bounds on the `limit` query parameter of the feed endpoints
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(created_at: datetime, post_id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), post_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, post_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), int(post_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="Invalid pagination cursor.")
+
+
+def keyset_order():
+    """Feed order for cursor pagination: newest first, id breaks ties."""
+    return (models.Post.created_at.desc(), models.Post.id.desc())
+
+
+def keyset_after(cursor: str):
+    """Predicate selecting rows strictly after `cursor` in `keyset_order()`."""
+    created_at, post_id = decode_cursor(cursor)
+    return tuple_(models.Post.created_at, models.Post.id) < tuple_(created_at, post_id)
@@ -0,0 +1,103 @@
+"""Connection pool sizing and instrumentation shared by the database engines."""
+
+import math
+import time
+from collections import deque
+from threading import Lock
+from typing import Dict, Type
+
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+
+
+class PoolMetrics:
+    """Checkout counters for one engine's pool.
+
+    Lives on the pool class rather than the instance so the numbers survive
+    `engine.dispose()`, which swaps in a fresh pool of the same class.
+    """
+
+    def __init__(self, name: str, window: int = 1024):
+        self.name = name
+        self._lock = Lock()
+        self._waits = deque(maxlen=window)  # recent checkout waits, seconds
+        self.checkouts = 0
+        self.timeouts = 0
+        self.max_wait = 0.0
+        self.peak_checked_out = 0
+        self.peak_overflow = 0
+
+    def record(self, pool: QueuePool, wait: float, timed_out: bool = False) -> None:
+        with self._lock:
+            self._waits.append(wait)
+            self.max_wait = max(self.max_wait, wait)
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.peak_checked_out = max(self.peak_checked_out, pool.checkedout())
+            self.peak_overflow = max(self.peak_overflow, pool.overflow())
+
+    def snapshot(self, pool: QueuePool) -> dict:
+        with self._lock:
+            waits = sorted(self._waits)
+        p95 = waits[min(len(waits) - 1, math.ceil(len(waits) * 0.95) - 1)] if waits else 0.0
+        return {
+            "pool_size": pool.size(),
+            # overflow() counts from -pool_size: only positive values are extra connections
+            "max_overflow": pool._max_overflow,
+            "checked_out": pool.checkedout(),
+            "overflow_in_use": max(0, pool.overflow()),
+            "peak_checked_out": self.peak_checked_out,
+            "peak_overflow": self.peak_overflow,
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_ms_avg": round(sum(waits) / len(waits) * 1000, 3) if waits else 0.0,
+            "wait_ms_p95": round(p95 * 1000, 3),
+            "wait_ms_max": round(self.max_wait * 1000, 3),
+        }
+
+
+def instrumented_pool_class(base: Type[QueuePool], name: str) -> Type[QueuePool]:
+    """Subclass `base` so each checkout is timed into a dedicated PoolMetrics."""
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = base.connect(self)
+        except exc.TimeoutError:
+            self.metrics.record(self, time.perf_counter() - started, timed_out=True)
+            raise
+        self.metrics.record(self, time.perf_counter() - started)
+        return connection
+
+    return type(f"Instrumented{base.__name__}", (base,), {
+        "metrics": PoolMetrics(name),
+        "connect": connect,
+    })
+
+
+def pool_stats(engine) -> dict:
+    pool = engine.pool
+    metrics = getattr(pool, "metrics", None)
+    return metrics.snapshot(pool) if metrics is not None else {}
+
+
+def plan_pool_sizes(pools: Dict[str, tuple], max_connections: int,
+                    reserved: int, workers: int) -> Dict[str, tuple]:
+    """Scale {name: (pool_size, max_overflow)} to fit the server's connection budget.
+
+    Every worker opens each pool, so the budget per worker is
+    (max_connections - reserved) / workers. Pools keep their relative sizes and
+    their size/overflow split; each keeps at least one connection. Pools are
+    only ever shrunk: a large budget does not grow them past their settings.
+    """
+    budget = max(1, (max_connections - reserved) // max(1, workers))
+    wanted = sum(size + overflow for size, overflow in pools.values())
+    factor = min(1.0, budget / wanted) if wanted else 1.0
+    planned = {}
+    for name, (size, overflow) in pools.items():
+        total = max(1, math.floor((size + overflow) * factor))
+        planned_size = min(total, max(1, math.floor(size * factor)))
+        planned[name] = (planned_size, total - planned_size)
+    return planned
@@ -0,0 +1,222 @@
+"""On-demand sampling profiler for single requests.
+
+When `profiler_enabled` is set, `ProfilerMiddleware` profiles any request that
+carries `X-Profile: 1` together with a valid `X-Internal-Token` (so profiling
+is only possible once `internal_token` is configured). Without the setting
+the middleware is not installed at all.
+
+A sampler thread wakes every `profiler_interval_ms` and records the stack of
+the request's task: the live thread stack while the task runs, or the chain
+of awaiting coroutines while it is suspended. That makes it a wall-clock
+profile, so time spent waiting on the database shows up. Each sample is
+filed under auth (inside `oauth2.get_current_user_async`), db (SQLAlchemy or
+driver frames), serialization (Pydantic/FastAPI response encoding) or app.
+The category becomes the root frame of the folded stacks, which can go
+straight into flamegraph.pl or speedscope. Profiles are kept in a small
+in-memory store (and optionally `profiler_output_dir`) and served from
+/internal/profiles/{id}.
+"""
+
+import asyncio
+import hmac
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, Optional
+
+from starlette.datastructures import MutableHeaders
+
+from .cache import LRUCache
+from .config import settings
+
+
+PROFILE_ID_HEADER = "X-Profile-Id"
+PROFILE_SUMMARY_HEADER = "X-Profile-Summary"
+
+CATEGORIES = ("auth", "db", "serialization", "app")
+
+_DB_PATHS = (f"{os.sep}sqlalchemy{os.sep}", f"{os.sep}asyncpg{os.sep}", f"{os.sep}psycopg{os.sep}")
+_SERIALIZATION_PATHS = (f"{os.sep}pydantic{os.sep}", f"{os.sep}pydantic_core{os.sep}",
+                        f"fastapi{os.sep}encoders.py")
+_SERIALIZATION_FUNCTIONS = {"serialize_response", "construct_from", "construct_from_row", "dump_json"}
+
+
+def _categorize(codes) -> str:
+    """auth wins over everything it contains, then db, then serialization."""
+    if any(code.co_name == "get_current_user_async" for code in codes):
+        return "auth"
+    if any(code.co_filename.find(path) != -1 for code in codes for path in _DB_PATHS):
+        return "db"
+    if any(code.co_name in _SERIALIZATION_FUNCTIONS
+           or any(path in code.co_filename for path in _SERIALIZATION_PATHS) for code in codes):
+        return "serialization"
+    return "app"
+
+
+_ROOT_DIR = str(Path(__file__).resolve().parents[1]) + os.sep
+_SITE_PACKAGES = "site-packages" + os.sep
+
+
+def _label(code) -> str:
+    filename = code.co_filename
+    index = filename.rfind(_SITE_PACKAGES)
+    if index != -1:
+        filename = filename[index + len(_SITE_PACKAGES):]
+    elif filename.startswith(_ROOT_DIR):
+        filename = filename[len(_ROOT_DIR):]
+    # co_qualname only exists from Python 3.11
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{name} ({filename}:{code.co_firstlineno})"
+
+
+def _await_chain(coro) -> list:
+    """Code objects of a suspended coroutine and everything it awaits, outermost first."""
+    codes = []
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None) \
+            or getattr(coro, "ag_frame", None)
+        if frame is None:
+            break
+        codes.append(frame.f_code)
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None) \
+            or getattr(coro, "ag_await", None)
+    return codes
+
+
+def _task_stack(task: asyncio.Task, loop, thread_id: int) -> list:
+    coro = task.get_coro()
+    if asyncio.current_task(loop) is not task:
+        return _await_chain(coro)
+    frame = sys._current_frames().get(thread_id)
+    target = coro.cr_frame
+    codes = []
+    while frame is not None:
+        codes.append(frame.f_code)
+        if frame is target:
+            return codes[::-1]
+        frame = frame.f_back
+    # Running inside a greenlet (SQLAlchemy's async bridge): its frames don't
+    # link back to the task, so hang them under the await chain
+    return _await_chain(coro) + codes[::-1]
+
+
+class Profile:
+    def __init__(self, profile_id: str, method: str, path: str):
+        self.id = profile_id
+        self.method = method
+        self.path = path
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.stacks: Counter = Counter()
+        self.category_seconds: Dict[str, float] = defaultdict(float)
+
+    def summary_header(self) -> str:
+        return " ".join(f"{name}={self.category_seconds.get(name, 0.0) * 1000:.1f}ms" for name in CATEGORIES)
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items()))
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "duration_ms": round(self.duration * 1000, 3),
+            "samples": sum(self.stacks.values()),
+            "categories_ms": {name: round(self.category_seconds.get(name, 0.0) * 1000, 3)
+                              for name in CATEGORIES},
+        }
+
+
+class _Sampler(threading.Thread):
+    def __init__(self, profile: Profile, task: asyncio.Task, loop, thread_id: int, interval: float):
+        super().__init__(name=f"profiler-{profile.id}", daemon=True)
+        self.profile = profile
+        self.task = task
+        self.loop = loop
+        self.thread_id = thread_id
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        last = time.perf_counter()
+        while not self._stopped.wait(self.interval):
+            now = time.perf_counter()
+            elapsed, last = now - last, now
+            codes = _task_stack(self.task, self.loop, self.thread_id)
+            if not codes:
+                continue
+            category = _categorize(codes)
+            self.profile.stacks[";".join([category, *map(_label, codes)])] += 1
+            self.profile.category_seconds[category] += elapsed
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self.join()
+
+
+class ProfileStore:
+    def __init__(self, maxsize: int = 50, output_dir: Optional[str] = None):
+        self._profiles = LRUCache(maxsize=maxsize)
+        self.output_dir = output_dir
+
+    def add(self, profile: Profile) -> None:
+        self._profiles.set(profile.id, profile)
+        if self.output_dir:
+            os.makedirs(self.output_dir, exist_ok=True)
+            Path(self.output_dir, f"{profile.id}.folded").write_text(profile.folded())
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        return self._profiles.get(profile_id)
+
+
+profile_store = ProfileStore(settings.profiler_keep, settings.profiler_output_dir)
+
+
+def _requested(scope) -> bool:
+    if settings.internal_token is None:
+        return False
+    profile = token = None
+    for name, value in scope["headers"]:
+        if name == b"x-profile":
+            profile = value
+        elif name == b"x-internal-token":
+            token = value
+    return (profile == b"1" and token is not None
+            and hmac.compare_digest(token, settings.internal_token.encode()))
+
+
+class ProfilerMiddleware:
+    """Pure ASGI middleware sampling requests that ask for it (see module docstring)."""
+
+    def __init__(self, app, store: ProfileStore = profile_store):
+        self.app = app
+        self.store = store
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = Profile(uuid.uuid4().hex[:16], scope["method"], scope["path"])
+        sampler = _Sampler(profile, asyncio.current_task(), asyncio.get_running_loop(),
+                           threading.get_ident(), settings.profiler_interval_ms / 1000)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers[PROFILE_ID_HEADER] = profile.id
+                headers[PROFILE_SUMMARY_HEADER] = profile.summary_header()
+            await send(message)
+
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            sampler.stop()
+            profile.duration = time.perf_counter() - profile.started
+            self.store.add(profile)
@@ -0,0 +1,144 @@
+"""Per-request SQL statement counts and timings, plus a slow-query log.
+
+Cursor-execute hooks on every engine add each statement's duration to the
+QueryStats of the current request, held in a context variable (async
+sessions run in greenlets that share the request's context). `QueryStatsMiddleware`
+opens the stats for each HTTP request and reports them in the
+`Server-Timing` and `X-DB-Queries` response headers.
+
+Statements slower than `slow_query_threshold_ms` are logged to the
+`app.slow_query` logger as one JSON object, with a fingerprint that is the
+same for every execution of the same query shape.
+"""
+
+import hashlib
+import json
+import logging
+import re
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+
+from .config import settings
+
+
+slow_query_logger = logging.getLogger("app.slow_query")
+
+DB_QUERIES_HEADER = "X-DB-Queries"
+SERVER_TIMING_HEADER = "Server-Timing"
+
+
+class QueryStats:
+    __slots__ = ("method", "path", "count", "seconds")
+
+    def __init__(self, method: Optional[str] = None, path: Optional[str] = None):
+        self.method = method
+        self.path = path
+        self.count = 0
+        self.seconds = 0.0
+
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def current_stats() -> Optional[QueryStats]:
+    return _current.get()
+
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w$])-?\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*(?:\?|\$\d+|%\(\w+\)s)(?:::\w+(?:\[\])?)?\s*,?)+\)", re.IGNORECASE)
+_SPACE = re.compile(r"\s+")
+
+
+def normalize_statement(statement: str) -> str:
+    """Statement with literals replaced by ? and IN lists collapsed."""
+    normalized = _STRING.sub("?", statement)
+    normalized = _NUMBER.sub("?", normalized)
+    normalized = _SPACE.sub(" ", normalized).strip()
+    return _IN_LIST.sub("IN (...)", normalized)
+
+
+def fingerprint(statement: str) -> str:
+    return hashlib.sha1(normalize_statement(statement).encode()).hexdigest()[:16]
+
+
+def _truncate(value, limit: int = 200):
+    text = repr(value)
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+def _log_slow_query(statement: str, parameters, executemany: bool, seconds: float) -> None:
+    stats = _current.get()
+    entry = {
+        "event": "slow_query",
+        "fingerprint": fingerprint(statement),
+        "duration_ms": round(seconds * 1000, 3),
+        "statement": normalize_statement(statement),
+        "executemany": executemany,
+        "request": f"{stats.method} {stats.path}" if stats is not None else None,
+    }
+    if settings.slow_query_log_parameters:
+        if executemany:
+            entry["parameters"] = _truncate(parameters)
+        elif isinstance(parameters, dict):
+            entry["parameters"] = {key: _truncate(value) for key, value in parameters.items()}
+        else:
+            entry["parameters"] = [_truncate(value) for value in parameters or ()]
+    slow_query_logger.warning(json.dumps(entry), extra={"slow_query": entry})
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_stats_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_query_stats_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    stats = _current.get()
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += elapsed
+    threshold = settings.slow_query_threshold_ms
+    if threshold is not None and elapsed * 1000 >= threshold:
+        _log_slow_query(statement, parameters, executemany, elapsed)
+
+
+def instrument_engine(sync_engine) -> None:
+    """Attach the hooks to a sync Engine (use `.sync_engine` for async engines)."""
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class QueryStatsMiddleware:
+    """Pure ASGI middleware exposing each request's DB statement count and time."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats(scope["method"], scope["path"])
+        token = _current.set(stats)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers[DB_QUERIES_HEADER] = str(stats.count)
+                headers.append(SERVER_TIMING_HEADER,
+                               f'db;dur={stats.seconds * 1000:.2f};desc="{stats.count} queries"')
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
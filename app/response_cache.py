@@ -0,0 +1,284 @@
+import asyncio
+import json
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlencode, urlparse
+
+from fastapi import Response
+
+from .cache import LRUCache
+from .config import settings
+
+
+logger = logging.getLogger(__name__)
+
+CACHE_STATUS_HEADER = "X-Cache"
+
+
+class InMemoryBackend:
+    """Per-worker LRU backend. Invalidation is only seen by this worker;
+    other workers serve their copy until the TTL runs out.
+
+    Counters are kept for the `counters_maxsize` most recently used keys. A
+    missing counter reads as `_floor`, which is above every value an evicted
+    counter ever had, so generations never go backwards and an entry keyed
+    by an old generation is never read again.
+    """
+
+    def __init__(self, maxsize: int = 1024, counters_maxsize: Optional[int] = None):
+        self._entries = LRUCache(maxsize=maxsize)
+        self._counters: "OrderedDict[str, int]" = OrderedDict()
+        self.counters_maxsize = counters_maxsize if counters_maxsize is not None else 4 * maxsize
+        self._floor = 0
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self._entries.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._entries.set(key, value, ttl=ttl)
+
+    async def incr(self, key: str) -> int:
+        self._counters[key] = self._counters.get(key, self._floor) + 1
+        self._counters.move_to_end(key)
+        while len(self._counters) > self.counters_maxsize:
+            _, evicted = self._counters.popitem(last=False)
+            self._floor = max(self._floor, evicted + 1)
+        return self._counters[key]
+
+    async def get_counter(self, key: str) -> int:
+        return self._counters.get(key, self._floor)
+
+    async def clear(self, prefix: str) -> None:
+        self._entries.clear()
+        self._counters.clear()
+
+
+class RedisBackend:
+    """Minimal RESP2 client (GET/SET PX/INCR/SCAN/DEL) shared by all workers.
+
+    Talks the wire protocol directly over asyncio streams, so anything that
+    speaks RESP (Redis, Valkey, KeyDB or a test stand-in) can back it.
+    """
+
+    def __init__(self, url: str, timeout: float = 1.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.password = parsed.password
+        self.timeout = timeout
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @staticmethod
+    def _encode(*args: Any) -> bytes:
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            parts.append(f"${len(data)}\r\n".encode() + data + b"\r\n")
+        return b"".join(parts)
+
+    async def _read_reply(self) -> Any:
+        line = await self._reader.readline()
+        if not line:
+            raise ConnectionError("connection closed by server")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode()
+        if kind == b"-":
+            raise RuntimeError(payload.decode())
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length == -1:
+                return None
+            data = await self._reader.readexactly(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(payload)
+            if length == -1:
+                return None
+            return [await self._read_reply() for _ in range(length)]
+        raise RuntimeError(f"unexpected RESP reply: {line!r}")
+
+    async def _connect(self) -> None:
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        if self.password:
+            self._writer.write(self._encode("AUTH", self.password))
+            await self._read_reply()
+        if self.db:
+            self._writer.write(self._encode("SELECT", self.db))
+            await self._read_reply()
+
+    def _reset(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+    async def execute(self, *args: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # streams and locks belong to one event loop
+            self._reader = self._writer = None
+            self._lock = asyncio.Lock()
+            self._loop = loop
+        async with self._lock:
+            try:
+                if self._writer is None:
+                    await asyncio.wait_for(self._connect(), self.timeout)
+                self._writer.write(self._encode(*args))
+                return await asyncio.wait_for(self._read_reply(), self.timeout)
+            except (OSError, ConnectionError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+                self._reset()
+                raise
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.execute("GET", key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        await self.execute("SET", key, value, "PX", max(1, int(ttl * 1000)))
+
+    async def incr(self, key: str) -> int:
+        return await self.execute("INCR", key)
+
+    async def get_counter(self, key: str) -> int:
+        value = await self.execute("GET", key)
+        return int(value) if value is not None else 0
+
+    async def clear(self, prefix: str) -> None:
+        cursor = b"0"
+        while True:
+            cursor, keys = await self.execute("SCAN", cursor, "MATCH", f"{prefix}*", "COUNT", 500)
+            if keys:
+                await self.execute("DEL", *keys)
+            if cursor == b"0":
+                break
+
+
+class ResponseCache:
+    """Cache of serialized GET /v2/posts responses.
+
+    Keys are the normalized query parameters plus a generation number:
+    every write bumps the feed generation (lists) and the post's own
+    generation (detail), so older entries are simply never read again and
+    age out. A backend failure is logged and treated as a miss.
+    """
+
+    def __init__(self, backend, ttl: float = 5.0, namespace: str = "posts"):
+        self.backend = backend
+        self.ttl = ttl
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.invalidations = 0
+        self.errors = 0
+
+    def _feed_generation_key(self) -> str:
+        return f"{self.namespace}:gen:feed"
+
+    def _post_generation_key(self, post_id: int) -> str:
+        return f"{self.namespace}:gen:post:{post_id}"
+
+    async def lookup(self, scope: str, params: Dict[str, Any],
+                     post_id: Optional[int] = None) -> Tuple[Optional[str], Optional[Tuple[bytes, Dict[str, str]]]]:
+        """Return (cache key, cached (body, headers) or None)."""
+        normalized = urlencode(sorted((k, v) for k, v in params.items() if v is not None))
+        try:
+            if post_id is None:
+                generation = await self.backend.get_counter(self._feed_generation_key())
+            else:
+                generation = await self.backend.get_counter(self._post_generation_key(post_id))
+            key = f"{self.namespace}:{scope}:{generation}:{normalized}"
+            cached = await self.backend.get(key)
+        except Exception:
+            logger.warning("response cache lookup failed", exc_info=True)
+            self.errors += 1
+            return None, None
+        if cached is None:
+            self.misses += 1
+            return key, None
+        self.hits += 1
+        raw_headers, body = cached.split(b"\n", 1)
+        return key, (body, json.loads(raw_headers))
+
+    async def store(self, key: Optional[str], body: bytes, headers: Dict[str, str]) -> None:
+        if key is None:
+            return
+        try:
+            await self.backend.set(key, json.dumps(headers).encode() + b"\n" + body, self.ttl)
+            self.stores += 1
+        except Exception:
+            logger.warning("response cache store failed", exc_info=True)
+            self.errors += 1
+
+    async def invalidate(self, post_ids: List[int] = ()) -> None:
+        """Drop every feed page, plus the detail entries of `post_ids`."""
+        try:
+            await self.backend.incr(self._feed_generation_key())
+            for post_id in post_ids:
+                await self.backend.incr(self._post_generation_key(post_id))
+            self.invalidations += 1
+        except Exception:
+            logger.warning("response cache invalidation failed", exc_info=True)
+            self.errors += 1
+
+    async def clear(self) -> None:
+        await self.backend.clear(f"{self.namespace}:")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "stores": self.stores,
+            "invalidations": self.invalidations,
+            "errors": self.errors,
+        }
+
+
+class NullResponseCache(ResponseCache):
+    """Used when response_cache_backend is "off"; every lookup misses."""
+
+    def __init__(self):
+        super().__init__(backend=None, ttl=0)
+
+    async def lookup(self, scope, params, post_id=None):
+        return None, None
+
+    async def store(self, key, body, headers):
+        pass
+
+    async def invalidate(self, post_ids=()):
+        pass
+
+    async def clear(self):
+        pass
+
+
+def cached_response(body: bytes, headers: Dict[str, str], hit: bool) -> Response:
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={**headers, CACHE_STATUS_HEADER: "HIT" if hit else "MISS"},
+    )
+
+
+def _build_response_cache() -> ResponseCache:
+    if settings.response_cache_backend == "redis":
+        return ResponseCache(RedisBackend(settings.response_cache_redis_url),
+                             ttl=settings.response_cache_ttl_seconds)
+    if settings.response_cache_backend == "memory":
+        return ResponseCache(InMemoryBackend(settings.response_cache_size),
+                             ttl=settings.response_cache_ttl_seconds)
+    return NullResponseCache()
+
+
+response_cache = _build_response_cache()
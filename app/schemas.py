@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr, ConfigDict
 from datetime import datetime
-from typing import Optional
+from typing import Any, List, Optional
 # from pydantic.types import conint
 from typing import Literal
 
@@ -20,6 +20,11 @@ class UserOut(BaseModel):
     email: EmailStr
     created_at: datetime
     model_config = ConfigDict(from_attributes=True)
+
+    @classmethod
+    def construct_from(cls, user) -> "UserOut":
+        """Build from a trusted database row without re-running validation."""
+        return cls.model_construct(id=user.id, email=user.email, created_at=user.created_at)
         
 
 class Post(PostBase):
@@ -29,12 +34,55 @@ class Post(PostBase):
     owner: UserOut
     model_config = ConfigDict(from_attributes=True)
 
+    @classmethod
+    def construct_from(cls, post, owner) -> "Post":
+        """Build from trusted post/owner rows without re-running validation."""
+        return cls.model_construct(
+            title=post.title,
+            content=post.content,
+            published=post.published,
+            id=post.id,
+            created_at=post.created_at,
+            owner_id=post.owner_id,
+            owner=UserOut.construct_from(owner),
+        )
+
 
 class PostWithVotes(BaseModel):
     post: Post
     votes: int
     model_config = ConfigDict(from_attributes=True)
 
+    @classmethod
+    def construct_from(cls, post, owner, votes: int) -> "PostWithVotes":
+        return cls.model_construct(post=Post.construct_from(post, owner), votes=votes)
+
+    @classmethod
+    def construct_from_row(cls, row) -> "PostWithVotes":
+        """Build from a flat feed row: post columns plus owner_email/owner_created_at."""
+        owner = UserOut.model_construct(id=row.owner_id, email=row.owner_email,
+                                        created_at=row.owner_created_at)
+        post = Post.model_construct(
+            title=row.title,
+            content=row.content,
+            published=row.published,
+            id=row.id,
+            created_at=row.created_at,
+            owner_id=row.owner_id,
+            owner=owner,
+        )
+        return cls.model_construct(post=post, votes=row.vote_count)
+
+
+class PostBatchError(BaseModel):
+    index: int
+    detail: Any
+
+
+class PostBatchResult(BaseModel):
+    created: List[Post]
+    errors: List[PostBatchError]
+
 
 class UserCreate(BaseModel):
     email: EmailStr
@@ -0,0 +1,248 @@
+"""Production launcher: gunicorn master with uvicorn workers.
+
+    python -m app.serve                  # start the server
+    python -m app.serve memory           # RSS / USS / PSS of the running master and workers
+    python -m app.serve restart          # replace the workers one at a time
+
+Workers default to the CPUs this process may use (affinity mask and cgroup v2
+quota) times `web_workers_per_cpu`; `web_concurrency` / $WEB_CONCURRENCY pins
+the count, and the chosen number is exported as $WEB_CONCURRENCY so
+`db_pool_mode=auto` sizes every worker's pool for it. Workers are
+`uvicorn_worker.UvicornWorker` with a draining shutdown (see below); its "auto"
+loop and HTTP settings pick uvloop and httptools when they are installed.
+
+With `web_preload` the master imports the app before forking. Importing it
+opens no connections (engines are built per worker in the lifespan), and the
+garbage collector stays off until the import is done, when every object so far
+is moved to the permanent generation with `gc.freeze()`: collections in the
+workers then never write to those pages, so they stay shared copy-on-write
+instead of being copied into each worker.
+
+`restart` sends SIGTERM to one worker at a time; the worker stops accepting,
+finishes its in-flight requests (up to `web_graceful_timeout`) and the master
+forks a replacement from the preloaded image. Stock uvicorn closes every idle
+connection right after it stops accepting, which drops requests on
+connections it accepted a moment earlier and had not read yet, so workers
+wait `_SHUTDOWN_DRAIN_SECONDS` for those before shutting connections down. `web_max_requests` recycles
+workers the same way after a number of requests, staggered by the jitter.
+Deploying new code still needs a full restart (or gunicorn's USR2 upgrade),
+since forked workers run the code the master loaded.
+
+gunicorn does not run on Windows; use uvicorn there.
+"""
+
+import argparse
+import asyncio
+import gc
+import math
+import os
+import signal
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import psutil
+from gunicorn.app.base import BaseApplication
+from gunicorn.arbiter import Arbiter
+from uvicorn.server import Server as _UvicornServer
+from uvicorn_worker import UvicornWorker as _UvicornWorker
+
+from .config import settings
+
+
+_MIB = 1024 * 1024
+_SHUTDOWN_DRAIN_SECONDS = 0.5
+
+
+def available_cpus() -> int:
+    """CPUs this process may run on: the affinity mask, capped by a cgroup v2 CPU quota."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        quota, period = Path("/sys/fs/cgroup/cpu.max").read_text().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+def worker_count(cpus: int, per_cpu: float, configured: Optional[int] = None) -> int:
+    if configured:
+        return configured
+    return max(1, round(cpus * per_cpu))
+
+
+def process_memory(pid: int) -> dict:
+    """RSS, USS (private to the process) and, on Linux, PSS in MiB."""
+    info = psutil.Process(pid).memory_full_info()
+    memory = {"rss": info.rss / _MIB, "uss": info.uss / _MIB}
+    if hasattr(info, "pss"):
+        memory["pss"] = info.pss / _MIB
+    return memory
+
+
+def _format_memory(memory: dict) -> str:
+    return ", ".join(f"{name} {value:.1f} MiB" for name, value in memory.items())
+
+
+class _DrainingServer(_UvicornServer):
+    async def shutdown(self, sockets=None) -> None:
+        # Stop accepting, then let just-accepted connections send their request
+        # so the stock shutdown finishes them instead of closing them as idle
+        for server in self.servers:
+            server.close()
+        await asyncio.sleep(_SHUTDOWN_DRAIN_SECONDS)
+        await super().shutdown(sockets=sockets)
+
+
+class UvicornWorker(_UvicornWorker):
+    async def _serve(self) -> None:
+        # uvicorn_worker.UvicornWorker._serve, with the draining server
+        self.config.app = self.wsgi
+        server = _DrainingServer(config=self.config)
+        self._install_sigquit_handler()
+        await server.serve(sockets=self.sockets)
+        if not server.started:
+            sys.exit(Arbiter.WORKER_BOOT_ERROR)
+
+
+# gunicorn hooks
+
+def _on_starting(server) -> None:
+    # Snapshots of the previous server's workers would stay in the totals
+    directory = settings.metrics_multiproc_dir
+    if settings.metrics_enabled and directory:
+        for path in Path(directory).glob("metrics-*.json"):
+            path.unlink(missing_ok=True)
+
+
+def _when_ready(server) -> None:
+    # Runs in the master after the (pre)load and before the first fork
+    gc.freeze()
+    gc.enable()
+    server.log.info("Master %d: %d objects frozen, %s", os.getpid(), gc.get_freeze_count(),
+                    _format_memory(process_memory(os.getpid())))
+
+
+def _post_worker_init(worker) -> None:
+    worker.log.info("Worker %d booted: %s", worker.pid, _format_memory(process_memory(worker.pid)))
+
+
+class Server(BaseApplication):
+    def __init__(self, options: dict):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        from .main import app
+        return app
+
+
+def gunicorn_options(args: argparse.Namespace) -> dict:
+    return {
+        "bind": args.bind,
+        "workers": args.workers,
+        "worker_class": "app.serve.UvicornWorker",
+        "preload_app": args.preload,
+        "graceful_timeout": args.graceful_timeout,
+        "max_requests": args.max_requests,
+        "max_requests_jitter": args.max_requests_jitter,
+        "pidfile": args.pid_file,
+        "accesslog": None,
+        "errorlog": "-",
+        "on_starting": _on_starting,
+        "when_ready": _when_ready,
+        "post_worker_init": _post_worker_init,
+    }
+
+
+def run(args: argparse.Namespace) -> int:
+    os.environ["WEB_CONCURRENCY"] = str(args.workers)
+    # Off until _when_ready freezes what the preload allocated
+    gc.disable()
+    Server(gunicorn_options(args)).run()
+    return 0
+
+
+def _master_pid(pid_file: str) -> int:
+    return int(Path(pid_file).read_text().strip())
+
+
+def _workers(master: psutil.Process) -> List[psutil.Process]:
+    return sorted(master.children(), key=lambda process: process.pid)
+
+
+def memory(args: argparse.Namespace) -> int:
+    master = psutil.Process(_master_pid(args.pid_file))
+    rows = [("master", master.pid, process_memory(master.pid))]
+    rows += [("worker", worker.pid, process_memory(worker.pid)) for worker in _workers(master)]
+    columns = [column for column in ("rss", "pss", "uss") if column in rows[0][2]]
+    print(f"{'role':<8} {'pid':>8} " + " ".join(f"{column + ' MiB':>10}" for column in columns))
+    for role, pid, values in rows:
+        print(f"{role:<8} {pid:>8} " + " ".join(f"{values[column]:>10.1f}" for column in columns))
+    return 0
+
+
+def restart(args: argparse.Namespace) -> int:
+    master = psutil.Process(_master_pid(args.pid_file))
+    workers = _workers(master)
+    for worker in workers:
+        print(f"Restarting worker {worker.pid}", flush=True)
+        worker.send_signal(signal.SIGTERM)
+        try:
+            worker.wait(timeout=args.graceful_timeout + 5)
+        except psutil.TimeoutExpired:
+            print(f"Worker {worker.pid} is still running; stopping", file=sys.stderr)
+            return 1
+        # The master notices the exit and forks a replacement
+        deadline = time.monotonic() + args.graceful_timeout
+        while len(master.children()) < len(workers):
+            if time.monotonic() > deadline:
+                print("No replacement worker was started; stopping", file=sys.stderr)
+                return 1
+            time.sleep(0.1)
+        # Time for the replacement's lifespan startup (engines, prewarm)
+        time.sleep(args.interval)
+    print(f"Restarted {len(workers)} worker(s)")
+    return 0
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run the API under gunicorn with uvicorn workers.")
+    parser.add_argument("command", nargs="?", choices=("run", "memory", "restart"), default="run")
+    parser.add_argument("--bind", default=settings.web_bind, help=f"Address to bind (default: {settings.web_bind})")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes (default: web_concurrency, else CPUs * web_workers_per_cpu)")
+    parser.add_argument("--no-preload", dest="preload", action="store_false", default=settings.web_preload,
+                        help="Import the app in each worker instead of once in the master")
+    parser.add_argument("--max-requests", type=int, default=settings.web_max_requests,
+                        help="Recycle a worker after this many requests; 0 disables (default: %(default)s)")
+    parser.add_argument("--max-requests-jitter", type=int, default=settings.web_max_requests_jitter,
+                        help="Random extra requests per worker, so they recycle at different times")
+    parser.add_argument("--graceful-timeout", type=int, default=settings.web_graceful_timeout,
+                        help="Seconds a stopping worker gets to finish its requests (default: %(default)s)")
+    parser.add_argument("--pid-file", default=settings.web_pid_file,
+                        help="Master pid file, written by run and read by memory/restart")
+    parser.add_argument("--interval", type=float, default=5.0,
+                        help="restart: seconds to wait after each replacement is forked (default: 5)")
+    args = parser.parse_args(argv)
+    if args.workers is None:
+        args.workers = worker_count(available_cpus(), settings.web_workers_per_cpu, settings.web_concurrency)
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    return {"run": run, "memory": memory, "restart": restart}[args.command](args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
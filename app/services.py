@@ -0,0 +1,360 @@
+"""Query logic shared by the /v1 and /v2 routers, on the async engine.
+
+Functions take the request's AsyncSession and return ORM objects, rows or
+schema models; failures are raised as the `ServiceError` subclasses below,
+which each router turns into its own HTTP response (v1 and v2 word some of
+their error messages differently). Writes commit and invalidate the response
+cache themselves, so a write through either API version is visible to the
+cached /v2 reads.
+"""
+
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+from sqlalchemy.orm import selectinload
+
+from . import models, schemas, utils
+from .config import settings
+from .pagination import encode_cursor, keyset_after, keyset_order
+from .response_cache import response_cache
+from .top_posts import top_posts_ranking
+
+
+class ServiceError(Exception):
+    pass
+
+
+class UserNotFoundError(ServiceError):
+    pass
+
+
+class InvalidPasswordError(ServiceError):
+    pass
+
+
+class EmailTakenError(ServiceError):
+    pass
+
+
+class PostNotFoundError(ServiceError):
+    pass
+
+
+class NotPostOwnerError(ServiceError):
+    pass
+
+
+class VoteNotFoundError(ServiceError):
+    pass
+
+
+class DuplicateVoteError(ServiceError):
+    pass
+
+
+# Users and authentication
+
+async def create_user(db: AsyncSession, user: schemas.UserCreate) -> models.User:
+    user_data = user.model_dump()
+    user_data["password"] = await utils.hash_async(user_data["password"])
+    new_user = models.User(**user_data)
+    db.add(new_user)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise EmailTakenError(user.email)
+    await db.refresh(new_user)
+    return new_user
+
+
+async def get_user(db: AsyncSession, user_id: int) -> Optional[models.User]:
+    result = await db.execute(select(models.User).where(models.User.id == user_id))
+    return result.scalar_one_or_none()
+
+
+async def authenticate(db: AsyncSession, email: str, password: str) -> models.User:
+    result = await db.execute(select(models.User).where(models.User.email == email))
+    user = result.scalar_one_or_none()
+    if user is None:
+        raise UserNotFoundError(email)
+    if not await utils.verify_async(password, user.password):
+        raise InvalidPasswordError(email)
+    return user
+
+
+# Posts
+
+# Everything a feed entry needs, as plain columns of one posts JOIN users row
+FEED_COLUMNS = (
+    models.Post.id,
+    models.Post.title,
+    models.Post.content,
+    models.Post.published,
+    models.Post.created_at,
+    models.Post.owner_id,
+    models.Post.vote_count,
+    models.User.email.label("owner_email"),
+    models.User.created_at.label("owner_created_at"),
+)
+
+
+def feed_query():
+    if settings.feed_query_mode == "inline":
+        return (
+            select(*FEED_COLUMNS)
+            .join(models.User, models.User.id == models.Post.owner_id)
+        )
+    return select(models.Post).options(selectinload(models.Post.owner))
+
+
+async def fetch_feed(db: AsyncSession, query) -> list:
+    result = await db.execute(query)
+    if settings.feed_query_mode == "inline":
+        return result.all()
+    return result.scalars().all()
+
+
+def feed_entry(row) -> schemas.PostWithVotes:
+    # Rows come straight from the database: build the models without
+    # validation (no per-owner EmailStr check)
+    if isinstance(row, models.Post):
+        return schemas.PostWithVotes.construct_from(row, row.owner, row.vote_count)
+    return schemas.PostWithVotes.construct_from_row(row)
+
+
+async def list_posts(
+    db: AsyncSession,
+    limit: int = 10,
+    skip: int = 0,
+    search: Optional[str] = "",
+    search_mode: str = "contains",
+    pagination: str = "offset",
+    cursor: Optional[str] = None,
+) -> Tuple[List[schemas.PostWithVotes], Optional[str]]:
+    """A page of published posts and the next page's cursor (cursor mode only).
+
+    Full-text search ranks by relevance, so callers must not combine it with
+    cursor pagination.
+    """
+    query = feed_query().where(models.Post.published == True)
+
+    if search and search_mode == "fulltext":
+        # Ranked full-text match served by the GIN index on posts.search_vector
+        ts_query = func.websearch_to_tsquery("english", search)
+        query = (
+            query.where(models.Post.search_vector.op("@@")(ts_query))
+            .order_by(func.ts_rank(models.Post.search_vector, ts_query).desc(), models.Post.id.desc())
+        )
+    elif search:
+        # LIKE '%...%', served by the pg_trgm index on posts.title
+        query = query.where(models.Post.title.contains(search))
+
+    # Both modes read newest first through the (created_at, id) index; offset
+    # mode is kept for existing clients, cursor mode seeks on that key so deep
+    # pages cost the same as the first one.
+    next_cursor = None
+    if search_mode != "fulltext" or not search:
+        query = query.order_by(*keyset_order())
+    if pagination == "offset" and cursor is None:
+        posts = await fetch_feed(db, query.limit(limit).offset(skip))
+    else:
+        if cursor:
+            query = query.where(keyset_after(cursor))
+        posts = await fetch_feed(db, query.limit(limit + 1))
+        if len(posts) > limit:
+            posts = posts[:limit]
+            next_cursor = encode_cursor(posts[-1].created_at, posts[-1].id)
+
+    return [feed_entry(post) for post in posts], next_cursor
+
+
+async def list_top_posts(
+    db: AsyncSession, limit: int = 10, skip: int = 0,
+) -> Tuple[List[schemas.PostWithVotes], Optional[datetime]]:
+    """A page of the most-voted published posts and when the ranking was computed.
+
+    Pages come from the top_posts snapshot, so paging through it is stable
+    between refreshes and `skip` is a seek on the rank, not an OFFSET. Vote
+    totals are the live ones.
+    """
+    refreshed_at = await top_posts_ranking.ensure_fresh(db)
+    query = (
+        feed_query()
+        .join(models.top_posts, models.top_posts.c.post_id == models.Post.id)
+        .where(models.Post.published == True, models.top_posts.c.rank > skip)
+        .order_by(models.top_posts.c.rank)
+        .limit(limit)
+    )
+    posts = await fetch_feed(db, query)
+    return [feed_entry(post) for post in posts], refreshed_at
+
+
+async def get_post(db: AsyncSession, post_id: int) -> Optional[models.Post]:
+    query = (
+        select(models.Post)
+        .options(selectinload(models.Post.owner))
+        .where(models.Post.id == post_id)
+    )
+    result = await db.execute(query)
+    return result.scalar_one_or_none()
+
+
+async def get_posts_by_ids(db: AsyncSession, ids: List[int]) -> List[Tuple[models.Post, models.User]]:
+    """(post, owner) pairs in the order of `ids`; missing ids are skipped."""
+    # Owner joined in, so the whole batch is a single statement
+    query = (
+        select(models.Post, models.User)
+        .join(models.User, models.User.id == models.Post.owner_id)
+        .where(models.Post.id.in_(ids))
+    )
+    result = await db.execute(query)
+    rows = {post.id: (post, owner) for post, owner in result.all()}
+    return [rows[post_id] for post_id in ids if post_id in rows]
+
+
+async def create_post(db: AsyncSession, owner_id: int, post: schemas.PostCreate) -> models.Post:
+    new_post = models.Post(owner_id=owner_id, **post.model_dump())
+    db.add(new_post)
+    await db.commit()
+    await response_cache.invalidate()
+    await db.refresh(new_post)
+    await db.refresh(new_post, attribute_names=["owner"])
+    return new_post
+
+
+async def create_posts(db: AsyncSession, owner, posts: List[schemas.PostCreate]) -> List[schemas.Post]:
+    """Insert every post in one statement; `owner` is the authenticated user."""
+    query = (
+        insert(models.Post)
+        .values([{"owner_id": owner.id, **post.model_dump()} for post in posts])
+        .returning(models.Post.id, models.Post.title, models.Post.content, models.Post.published,
+                   models.Post.created_at, models.Post.owner_id)
+    )
+    # Snapshot the owner before commit expires the ORM instance
+    owner_out = schemas.UserOut.construct_from(owner)
+    result = await db.execute(query)
+    created = result.all()
+    await db.commit()
+    await response_cache.invalidate()
+    return [schemas.Post.construct_from(row, owner_out) for row in created]
+
+
+async def _owned_post(db: AsyncSession, post_id: int, user_id: int) -> models.Post:
+    result = await db.execute(select(models.Post).where(models.Post.id == post_id))
+    post = result.scalar_one_or_none()
+    if post is None:
+        raise PostNotFoundError(post_id)
+    if post.owner_id != user_id:
+        raise NotPostOwnerError(post_id)
+    return post
+
+
+async def update_post(db: AsyncSession, post_id: int, user_id: int,
+                      post: schemas.PostCreate) -> models.Post:
+    post_to_update = await _owned_post(db, post_id, user_id)
+    for key, value in post.model_dump().items():
+        setattr(post_to_update, key, value)
+
+    await db.commit()
+    await response_cache.invalidate([post_id])
+    await db.refresh(post_to_update)
+    await db.refresh(post_to_update, attribute_names=["owner"])
+    return post_to_update
+
+
+async def delete_post(db: AsyncSession, post_id: int, user_id: int) -> None:
+    post_to_delete = await _owned_post(db, post_id, user_id)
+    await db.delete(post_to_delete)
+    await db.commit()
+    await response_cache.invalidate([post_id])
+
+
+# Votes
+
+def _bump_vote_count(changed_votes, delta: int):
+    # UPDATE posts ... FROM (data-modifying CTE): the counter only moves when
+    # the CTE actually inserted/deleted a vote row.
+    return (
+        update(models.Post)
+        .where(models.Post.id == changed_votes.c.post_id)
+        .values(vote_count=models.Post.vote_count + delta)
+        .returning(models.Post.id)
+        .execution_options(synchronize_session=False)
+    )
+
+
+_VOTE_POST_FOREIGN_KEY = "votes_post_id_fkey"
+
+
+def _violated_constraint(exc: IntegrityError) -> Optional[str]:
+    # asyncpg's error, chained by SQLAlchemy's DBAPI adapter, names the constraint
+    return getattr(exc.orig.__cause__, "constraint_name", None)
+
+
+async def add_vote(db: AsyncSession, user_id: int, post_id: int) -> None:
+    inserted = (
+        pg_insert(models.Vote)
+        .values(post_id=post_id, user_id=user_id)
+        .on_conflict_do_nothing(index_elements=[models.Vote.user_id, models.Vote.post_id])
+        .returning(models.Vote.post_id)
+        .cte("inserted_vote")
+    )
+    try:
+        changed = (await db.execute(_bump_vote_count(inserted, 1))).first()
+    except IntegrityError as exc:
+        await db.rollback()
+        # Only the votes.post_id foreign key means the post does not exist
+        if _violated_constraint(exc) == _VOTE_POST_FOREIGN_KEY:
+            raise PostNotFoundError(post_id) from exc
+        raise
+    if changed is None:
+        await db.rollback()
+        raise DuplicateVoteError(post_id)
+    await db.commit()
+    await response_cache.invalidate([post_id])
+
+
+async def remove_vote(db: AsyncSession, user_id: int, post_id: int) -> None:
+    deleted = (
+        delete(models.Vote)
+        .where(models.Vote.post_id == post_id, models.Vote.user_id == user_id)
+        .returning(models.Vote.post_id)
+        .cte("deleted_vote")
+    )
+    changed = (await db.execute(_bump_vote_count(deleted, -1))).first()
+    if changed is None:
+        await db.rollback()
+        # Only the failure path pays for telling the two cases apart
+        exists = (await db.execute(select(models.Post.id).where(models.Post.id == post_id))).first()
+        raise VoteNotFoundError(post_id) if exists else PostNotFoundError(post_id)
+    await db.commit()
+    await response_cache.invalidate([post_id])
+
+
+# Startup
+
+async def warm_up(conn: AsyncConnection) -> None:
+    """Run the hot read statements once on `conn`.
+
+    Fills SQLAlchemy's compiled statement cache (per engine) and asyncpg's
+    prepared statements (per connection), so the first requests after a deploy
+    skip both. Every lookup misses on purpose and nothing is written.
+    """
+    async with AsyncSession(bind=conn) as db:
+        await list_posts(db, limit=1)
+        await list_posts(db, limit=1, search="warm-up")
+        await list_posts(db, limit=1, search="warm-up", search_mode="fulltext")
+        await list_posts(db, limit=1, pagination="cursor")
+        await list_posts(db, limit=1, cursor=encode_cursor(datetime.now(timezone.utc), 0))
+        await get_post(db, 0)
+        await get_posts_by_ids(db, [0])
+        await get_user(db, 0)
+        try:
+            await authenticate(db, "", "")
+        except ServiceError:
+            pass
@@ -0,0 +1,47 @@
+"""Startup phase timings and the readiness flag behind `GET /ready`.
+
+Phases are recorded as they finish: "settings" (reading the environment and
+.env), "import" (importing app.main, settings included), then from the
+lifespan "engine" (building the engines and pools) and "prewarm" (opening
+pooled connections and running the warm-up statements). The worker reports
+ready once the lifespan startup is complete.
+"""
+
+import logging
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+
+class StartupState:
+    def __init__(self, clock=time.perf_counter):
+        self._clock = clock
+        self.phases: Dict[str, float] = {}
+        self.ready = False
+
+    @contextmanager
+    def phase(self, name: str):
+        started = self._clock()
+        try:
+            yield
+        finally:
+            self.record(name, self._clock() - started)
+
+    def record(self, name: str, seconds: float) -> None:
+        self.phases[name] = seconds
+        logger.info("Startup phase %s took %.3fs", name, seconds)
+
+    def mark_ready(self) -> None:
+        self.ready = True
+        logger.info("Ready (%s)", ", ".join(f"{name} {seconds:.3f}s" for name, seconds in self.phases.items()))
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "phases": {name: round(seconds, 4) for name, seconds in self.phases.items()},
+        }
+
+
+startup_state = StartupState()
@@ -0,0 +1,143 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Optional, Tuple
+
+from sqlalchemy import text
+
+from .config import settings
+from . import database
+
+
+logger = logging.getLogger(__name__)
+
+# Response header with the time the served ranking was computed
+REFRESHED_AT_HEADER = "X-Ranking-Refreshed-At"
+
+# Key of the transaction-level advisory lock held while refreshing, so only one
+# process (across workers and instances) rebuilds the view at a time
+REFRESH_LOCK_ID = 0x746F7070
+
+REFRESH_SQL = text("REFRESH MATERIALIZED VIEW CONCURRENTLY top_posts")
+
+# Committed with the refresh, so readers (replicas too) see the time of the
+# ranking they read, even an empty one
+MARK_REFRESHED_SQL = text(
+    "INSERT INTO top_posts_refresh (id, refreshed_at) VALUES (true, now()) "
+    "ON CONFLICT (id) DO UPDATE SET refreshed_at = excluded.refreshed_at"
+)
+
+# Ages are measured on the database clock, the one refreshed_at comes from
+AGE_SQL = text(
+    "SELECT refreshed_at, EXTRACT(EPOCH FROM clock_timestamp() - refreshed_at) "
+    "FROM top_posts_refresh WHERE refreshed_at IS NOT NULL"
+)
+
+
+async def snapshot_age(db) -> Tuple[Optional[datetime], Optional[float]]:
+    """(refreshed_at, age in seconds) of the view; (None, None) when never refreshed."""
+    row = (await db.execute(AGE_SQL)).first()
+    if row is None:
+        return None, None
+    return row[0], float(row[1])
+
+
+class TopPostsRanking:
+    """Keeps the top_posts materialized view within `max_staleness` seconds.
+
+    Every worker runs a task that refreshes the view each `interval` seconds
+    unless some process did so within the interval; the refresh itself is
+    serialized by an advisory lock and runs CONCURRENTLY, so readers are never
+    blocked. Readers that find the view older than `max_staleness` (a stopped
+    task, a slow refresh) refresh it before answering. Refreshes always go to
+    the primary: a replica serves the view as of its replay position.
+    """
+
+    def __init__(self, interval: float = 30.0, max_staleness: float = 120.0):
+        self.interval = interval
+        self.max_staleness = max_staleness
+        self._task: Optional[asyncio.Task] = None
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.inline_refreshes = 0
+        self.last_refresh_seconds = 0.0
+        self.max_refresh_seconds = 0.0
+
+    async def refresh(self, max_age: Optional[float] = None, wait: bool = False) -> bool:
+        """Refresh the view; returns False when it was skipped.
+
+        Skipped when the view is younger than `max_age`, or, without `wait`,
+        when another process holds the refresh lock. With `wait` the call
+        blocks behind that refresh and then re-checks the age.
+        """
+        lock = "pg_advisory_xact_lock" if wait else "pg_try_advisory_xact_lock"
+        async with database.async_engine.connect() as conn:
+            acquired = (await conn.execute(text(f"SELECT {lock}(:key)"), {"key": REFRESH_LOCK_ID})).scalar()
+            if acquired is False:
+                return False
+            if max_age is not None:
+                _, age = await snapshot_age(conn)
+                if age is not None and age < max_age:
+                    return False
+            started = time.perf_counter()
+            await conn.execute(REFRESH_SQL)
+            await conn.execute(MARK_REFRESHED_SQL)
+            await conn.commit()
+        elapsed = time.perf_counter() - started
+        self.refreshes += 1
+        self.last_refresh_seconds = elapsed
+        self.max_refresh_seconds = max(self.max_refresh_seconds, elapsed)
+        return True
+
+    async def ensure_fresh(self, db) -> Optional[datetime]:
+        """refreshed_at of the view as `db` sees it, refreshing it first if too stale."""
+        refreshed_at, age = await snapshot_age(db)
+        if age is None or age > self.max_staleness:
+            if await self.refresh(max_age=self.max_staleness, wait=True):
+                self.inline_refreshes += 1
+            refreshed_at, _ = await snapshot_age(db)
+        return refreshed_at
+
+    @property
+    def started(self) -> bool:
+        return self._task is not None
+
+    async def start(self) -> None:
+        if self.started or self.interval <= 0:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                # A refresh by any process within the interval counts
+                await self.refresh(max_age=self.interval * 0.9)
+            except Exception:
+                self.refresh_errors += 1
+                logger.warning("Refreshing top_posts failed", exc_info=True)
+
+    def stats(self) -> dict:
+        return {
+            "refreshes": self.refreshes,
+            "inline_refreshes": self.inline_refreshes,
+            "refresh_errors": self.refresh_errors,
+            "last_refresh_ms": self.last_refresh_seconds * 1000,
+            "max_refresh_ms": self.max_refresh_seconds * 1000,
+        }
+
+
+top_posts_ranking = TopPostsRanking(
+    interval=settings.top_posts_refresh_seconds,
+    max_staleness=settings.top_posts_max_staleness_seconds,
+)
@@ -1,3 +1,7 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
 import bcrypt
 
 # Ensure passlib-bcrypt compatibility across versions
@@ -9,6 +13,8 @@ if not hasattr(bcrypt, '__about__'):
 
 from passlib.context import CryptContext
 
+from .config import settings
+
 
 BCRYPT_ROUNDS = 8
 
@@ -26,3 +32,100 @@ def hash(password: str):
 
 def verify(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
+
+
+class PasswordHasher:
+    """Async front-end for `hash`/`verify` backed by a bounded worker pool.
+
+    bcrypt releases the GIL, so the thread executor already keeps the event
+    loop responsive; the process executor trades start-up cost for isolation
+    from the worker's own CPU time. At most `max_concurrency` jobs are handed
+    to the executor at once, the rest wait on a semaphore and are reported as
+    queue depth.
+    """
+
+    def __init__(self, executor: str = "thread", max_workers: int = 4,
+                 max_concurrency: Optional[int] = None):
+        if executor not in ("thread", "process"):
+            raise ValueError(f"unknown password hash executor: {executor!r}")
+        self.executor_kind = executor
+        self.max_workers = max_workers
+        self.max_concurrency = max_concurrency or max_workers
+        self._executor: Optional[Executor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.queue_depth = 0
+        self.peak_queue_depth = 0
+        self.in_flight = 0
+        self.completed = 0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix="pwhash")
+        return self._executor
+
+    def _get_semaphore(self, loop: asyncio.AbstractEventLoop) -> asyncio.Semaphore:
+        # A semaphore is bound to the loop it first blocks on; test clients
+        # may drive the app from more than one loop per process.
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        return self._semaphore
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        semaphore = self._get_semaphore(loop)
+        self.queue_depth += 1
+        self.peak_queue_depth = max(self.peak_queue_depth, self.queue_depth)
+        try:
+            await semaphore.acquire()
+        finally:
+            self.queue_depth -= 1
+        self.in_flight += 1
+        try:
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            semaphore.release()
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify, plain_password, hashed_password)
+
+    def stats(self) -> dict:
+        return {
+            "executor": self.executor_kind,
+            "max_workers": self.max_workers,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": self.queue_depth,
+            "peak_queue_depth": self.peak_queue_depth,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+        }
+
+    def shutdown(self, wait: bool = True) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    executor=settings.password_hash_executor,
+    max_workers=settings.password_hash_workers,
+    max_concurrency=settings.password_hash_max_concurrency,
+)
+
+
+async def hash_async(password: str) -> str:
+    return await password_hasher.hash(password)
+
+
+async def verify_async(plain_password: str, hashed_password: str) -> bool:
+    return await password_hasher.verify(plain_password, hashed_password)
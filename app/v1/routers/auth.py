@@ -1,8 +1,8 @@
 from fastapi import APIRouter, Depends, status, HTTPException, Response
 from fastapi.security.oauth2 import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from app.database import get_db
-from app import schemas, models, utils, oauth2
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
+from app import schemas, oauth2, services
 
 router = APIRouter(
     prefix="/v1/auth",
@@ -11,19 +11,18 @@ router = APIRouter(
 
 
 @router.post('/login', response_model=schemas.Token)
-def login(user_credentials: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(user_credentials: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
 
-    user = db.query(models.User).filter(models.User.email == user_credentials.username).first()
-
-    if not user:
+    try:
+        user = await services.authenticate(db, user_credentials.username, user_credentials.password)
+    except services.UserNotFoundError:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, 
                             detail=f"Invalid credentials, please try again.")
-    
-    if not utils.verify(user_credentials.password, user.password):
+    except services.InvalidPasswordError:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, 
                             detail="Invalid username or password.")
 
     # create a token
     access_token = oauth2.create_access_token(data = {"user_id": user.id})
     # return the token to users
-    return {"access_token": access_token, "token_type": "bearer"}
\ No newline at end of file
+    return {"access_token": access_token, "token_type": "bearer"}
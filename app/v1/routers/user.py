@@ -1,7 +1,7 @@
-from app import models, schemas, utils
+from app import schemas, services
 from fastapi import Response, status, HTTPException, Depends, APIRouter
-from sqlalchemy.orm import Session
-from app.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
 
 
 router = APIRouter(
@@ -11,24 +11,20 @@ router = APIRouter(
 
 
 @router.post("/", status_code=status.HTTP_201_CREATED, response_model=schemas.UserOut)
-def creat_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
+async def creat_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
 
-    #hash the password - user.password
-    hashed_password = utils.hash(user.password)
-    user.password = hashed_password
-    new_user = models.User(**user.model_dump())
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-
-    return new_user
+    try:
+        return await services.create_user(db, user)
+    except services.EmailTakenError:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail="User with this email already exists.")
 
 
 @router.get('/{id}', response_model=schemas.UserOut)
-def get_user(id: int, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.id == id).first()
+async def get_user(id: int, db: AsyncSession = Depends(get_async_db)):
+    user = await services.get_user(db, id)
     
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"User with id: {id} does not exist.")
     
-    return user
\ No newline at end of file
+    return user
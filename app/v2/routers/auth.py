@@ -1,10 +1,9 @@
 from fastapi import APIRouter, Depends, status, HTTPException
 from fastapi.security.oauth2 import OAuth2PasswordRequestForm
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_async_db
-from app import schemas, models, utils, oauth2
+from app import schemas, oauth2, services
 
 router = APIRouter(
     prefix="/v2/auth",
@@ -17,15 +16,12 @@ async def login(
     user_credentials: OAuth2PasswordRequestForm = Depends(),
     db: AsyncSession = Depends(get_async_db)
 ):
-    query = select(models.User).where(models.User.email == user_credentials.username)
-    result = await db.execute(query)
-    user = result.scalar_one_or_none()
-
-    if not user:
+    try:
+        user = await services.authenticate(db, user_credentials.username, user_credentials.password)
+    except services.UserNotFoundError:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
                             detail="Invalid credentials, please try again.")
-
-    if not utils.verify(user_credentials.password, user.password):
+    except services.InvalidPasswordError:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
                             detail="Invalid username or password.")
 
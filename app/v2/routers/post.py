@@ -1,42 +1,79 @@
-from fastapi import APIRouter, Depends, status, HTTPException
-from sqlalchemy.orm import selectinload
-from sqlalchemy import func, select
+from fastapi import APIRouter, Body, Depends, Query, Response, status, HTTPException
+from pydantic import TypeAdapter, ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Optional
+from typing import Any, List, Literal, Optional
 
-from app import models, schemas, oauth2
+from app import models, schemas, oauth2, services
+from app.config import settings
 from app.database import get_async_db
+from app.pagination import MAX_PAGE_SIZE, NEXT_CURSOR_HEADER
+from app.response_cache import cached_response, response_cache
+from app.top_posts import REFRESHED_AT_HEADER
 
 router = APIRouter(
     prefix="/v2/posts",
     tags=['Posts v2']
 )
 
+_PAGE_ADAPTER = TypeAdapter(List[schemas.PostWithVotes])
+_DETAIL_ADAPTER = TypeAdapter(schemas.PostWithVotes)
+
 
 @router.get("/", response_model=List[schemas.PostWithVotes])
 async def get_posts(
     db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(oauth2.get_current_user_async),
-    limit: int = 10,
-    skip: int = 0,
-    search: Optional[str] = ""
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    skip: int = Query(0, ge=0),
+    search: Optional[str] = "",
+    search_mode: Literal["contains", "fulltext"] = "contains",
+    pagination: Literal["offset", "cursor"] = "offset",
+    cursor: Optional[str] = None
+):
+    # Responses are identical for every caller, so they are cached by the
+    # normalized query parameters alone. Callers pinned to the primary after a
+    # write bypass the cache: an entry may have been filled from the replica.
+    cache_key, cached = None, None
+    if not db.info.get("read_your_writes"):
+        cache_key, cached = await response_cache.lookup("list", {
+            "limit": limit, "skip": skip, "search": search or None,
+            "search_mode": search_mode if search else None,
+            "pagination": pagination, "cursor": cursor,
+        })
+    if cached is not None:
+        return cached_response(*cached, hit=True)
+
+    if search and search_mode == "fulltext" and (pagination == "cursor" or cursor is not None):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="Cursor pagination is not supported for full-text search.")
+
+    entries, next_cursor = await services.list_posts(
+        db, limit=limit, skip=skip, search=search, search_mode=search_mode,
+        pagination=pagination, cursor=cursor)
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else {}
+
+    # Entries are built without validation; dump straight to JSON
+    body = _PAGE_ADAPTER.dump_json(entries)
+    await response_cache.store(cache_key, body, headers)
+    return cached_response(body, headers, hit=False)
+
+
+# Declared before /{id}, which would otherwise match "top"
+@router.get("/top", response_model=List[schemas.PostWithVotes])
+async def get_top_posts(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(oauth2.get_current_user_async),
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    skip: int = Query(0, ge=0)
 ):
-    query = (
-        select(
-            models.Post,
-            func.count(models.Vote.user_id).label("votes")
-        )
-        .join(models.Vote, models.Vote.post_id == models.Post.id, isouter=True)
-        .options(selectinload(models.Post.owner))
-        .where(models.Post.title.contains(search))
-        .where(models.Post.published == True)
-        .group_by(models.Post.id)
-        .limit(limit)
-        .offset(skip)
-    )
-    result = await db.execute(query)
-    rows = result.all()
-    return [{"post": row[0], "votes": int(row[1])} for row in rows]
+    if skip >= models.TOP_POSTS_SIZE:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"The ranking holds the top {models.TOP_POSTS_SIZE} posts; "
+                                   f"skip must be below {models.TOP_POSTS_SIZE}.")
+
+    entries, refreshed_at = await services.list_top_posts(db, limit=limit, skip=skip)
+    headers = {REFRESHED_AT_HEADER: refreshed_at.isoformat()} if refreshed_at else {}
+    return Response(content=_PAGE_ADAPTER.dump_json(entries), media_type="application/json", headers=headers)
 
 
 @router.post("/", status_code=status.HTTP_201_CREATED, response_model=schemas.Post)
@@ -45,12 +82,52 @@ async def create_post(
     db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(oauth2.get_current_user_async)
 ):
-    new_post = models.Post(owner_id=current_user.id, **post.model_dump())
-    db.add(new_post)
-    await db.commit()
-    await db.refresh(new_post)
-    await db.refresh(new_post, attribute_names=["owner"])
-    return new_post
+    return await services.create_post(db, current_user.id, post)
+
+
+@router.get("/batch", response_model=List[schemas.PostWithVotes])
+async def get_posts_batch(
+    ids: List[int] = Query(...),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(oauth2.get_current_user_async)
+):
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > settings.post_batch_max_items:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=f"At most {settings.post_batch_max_items} ids per batch.")
+
+    body = _PAGE_ADAPTER.dump_json([
+        schemas.PostWithVotes.construct_from(post, owner, post.vote_count)
+        for post, owner in await services.get_posts_by_ids(db, ids)
+    ])
+    return Response(content=body, media_type="application/json")
+
+
+@router.post("/batch", status_code=status.HTTP_201_CREATED, response_model=schemas.PostBatchResult)
+async def create_posts_batch(
+    items: List[Any] = Body(...),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(oauth2.get_current_user_async)
+):
+    if len(items) > settings.post_batch_max_items:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=f"At most {settings.post_batch_max_items} posts per batch.")
+
+    # Validate item by item so one bad entry doesn't reject the whole batch
+    valid, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            valid.append(schemas.PostCreate.model_validate(item))
+        except ValidationError as exc:
+            errors.append({"index": index, "detail": exc.errors(include_url=False, include_context=False)})
+
+    if not valid:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=errors)
+
+    return {
+        "created": await services.create_posts(db, current_user, valid),
+        "errors": errors,
+    }
 
 
 @router.get("/{id}", response_model=schemas.PostWithVotes)
@@ -59,24 +136,22 @@ async def get_post(
     db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(oauth2.get_current_user_async)
 ):
-    query = (
-        select(
-            models.Post,
-            func.count(models.Vote.user_id).label("votes")
-        )
-        .join(models.Vote, models.Vote.post_id == models.Post.id, isouter=True)
-        .options(selectinload(models.Post.owner))
-        .where(models.Post.id == id)
-        .group_by(models.Post.id)
-    )
-    result = await db.execute(query)
-    row = result.first()
-
-    if not row:
+    cache_key, cached = None, None
+    if not db.info.get("read_your_writes"):
+        cache_key, cached = await response_cache.lookup("detail", {"id": id}, post_id=id)
+    if cached is not None:
+        return cached_response(*cached, hit=True)
+
+    post = await services.get_post(db, id)
+
+    if not post:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail=f"post with id: {id} was not found")
 
-    return {"post": row[0], "votes": int(row[1])}
+    body = _DETAIL_ADAPTER.dump_json(
+        schemas.PostWithVotes.construct_from(post, post.owner, post.vote_count))
+    await response_cache.store(cache_key, body, {})
+    return cached_response(body, {}, hit=False)
 
 
 @router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -85,21 +160,15 @@ async def delete_post(
     db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(oauth2.get_current_user_async)
 ):
-    query = select(models.Post).where(models.Post.id == id)
-    result = await db.execute(query)
-    post_to_delete = result.scalar_one_or_none()
-
-    if post_to_delete is None:
+    try:
+        await services.delete_post(db, id, current_user.id)
+    except services.PostNotFoundError:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail=f"post with id: {id} does not exist")
-
-    if post_to_delete.owner_id != current_user.id:
+    except services.NotPostOwnerError:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
                             detail="Not authorized to perform requested action.")
 
-    await db.delete(post_to_delete)
-    await db.commit()
-
 
 @router.put("/{id}", response_model=schemas.Post)
 async def update_post(
@@ -108,23 +177,12 @@ async def update_post(
     db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(oauth2.get_current_user_async)
 ):
-    query = select(models.Post).where(models.Post.id == id)
-    result = await db.execute(query)
-    post_to_update = result.scalar_one_or_none()
-
-    if post_to_update is None:
+    try:
+        return await services.update_post(db, id, current_user.id, post)
+    except services.PostNotFoundError:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail=f"post with id: {id} does not exist")
-
-    if post_to_update.owner_id != current_user.id:
+    except services.NotPostOwnerError:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
                             detail="Not authorized to perform requested action.")
 
-    for key, value in post.model_dump().items():
-        setattr(post_to_update, key, value)
-
-    await db.commit()
-    await db.refresh(post_to_update)
-    await db.refresh(post_to_update, attribute_names=["owner"])
-    return post_to_update
-
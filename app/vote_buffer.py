@@ -0,0 +1,338 @@
+import asyncio
+import logging
+import os
+import re
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import text
+
+from .config import settings
+from . import database
+from .response_cache import response_cache
+
+
+logger = logging.getLogger(__name__)
+
+# One statement per flush: bulk insert upvotes, bulk delete removals and apply
+# the net per-post delta to posts.vote_count. Joining users/posts drops votes
+# whose post (or user) disappeared while buffered instead of failing the batch.
+FLUSH_SQL = text("""
+WITH up AS (
+    SELECT t.user_id, t.post_id
+    FROM unnest(CAST(:up_users AS integer[]), CAST(:up_posts AS integer[])) AS t(user_id, post_id)
+    JOIN posts ON posts.id = t.post_id
+    JOIN users ON users.id = t.user_id
+),
+inserted AS (
+    INSERT INTO votes (user_id, post_id)
+    SELECT user_id, post_id FROM up
+    ON CONFLICT (user_id, post_id) DO NOTHING
+    RETURNING post_id
+),
+deleted AS (
+    DELETE FROM votes
+    USING unnest(CAST(:down_users AS integer[]), CAST(:down_posts AS integer[])) AS t(user_id, post_id)
+    WHERE votes.user_id = t.user_id AND votes.post_id = t.post_id
+    RETURNING votes.post_id
+),
+deltas AS (
+    SELECT post_id, SUM(delta) AS delta
+    FROM (
+        SELECT post_id, 1 AS delta FROM inserted
+        UNION ALL
+        SELECT post_id, -1 AS delta FROM deleted
+    ) AS changes
+    GROUP BY post_id
+),
+updated AS (
+    UPDATE posts SET vote_count = posts.vote_count + deltas.delta
+    FROM deltas
+    WHERE posts.id = deltas.post_id
+    RETURNING posts.id
+)
+SELECT (SELECT COUNT(*) FROM inserted) AS inserted,
+       (SELECT COUNT(*) FROM deleted) AS deleted,
+       (SELECT array_agg(id) FROM updated) AS post_ids
+""")
+
+_SEGMENT_RE = re.compile(r"^votes-(\d+)-(\d+)\.log$")
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class VoteBuffer:
+    """Per-worker write-behind buffer for /v2/vote.
+
+    Votes are keyed by (user_id, post_id); within a batch the last direction
+    enqueued wins. A background task flushes when `max_batch` votes are
+    pending or every `flush_interval` seconds, and `stop()` flushes whatever
+    is left. With `journal_dir` set, every vote is appended to a journal
+    segment and fsynced (group commit) before `enqueue` returns; segments are
+    deleted once a flush covering them commits, and segments left behind by
+    dead workers are replayed on start. Without a journal, buffered votes are
+    lost if the worker crashes.
+    """
+
+    def __init__(self, session_factory=None, max_batch: int = 500,
+                 flush_interval: float = 0.05, journal_dir: Optional[str] = None):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.journal_dir = Path(journal_dir) if journal_dir else None
+        self._pending: Dict[Tuple[int, int], int] = {}
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._journal_lock: Optional[asyncio.Lock] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._sync_future: Optional[asyncio.Future] = None
+        # Group commits not yet done, with the fd each one syncs
+        self._syncs: Dict[asyncio.Future, int] = {}
+        self._fd: Optional[int] = None
+        self._segment = 0
+        self.enqueued = 0
+        self.flushes = 0
+        self.flush_errors = 0
+        self.votes_flushed = 0
+        self.inserted = 0
+        self.deleted = 0
+        self.last_batch_size = 0
+        self.max_batch_size = 0
+        self.last_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+        self.total_flush_seconds = 0.0
+
+    @property
+    def started(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def _segment_path(self, segment: int) -> Path:
+        return self.journal_dir / f"votes-{os.getpid()}-{segment}.log"
+
+    def _open_segment(self) -> None:
+        self._segment += 1
+        self._fd = os.open(self._segment_path(self._segment),
+                           os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+
+    def _replay_orphans(self) -> None:
+        # Segments named with our own pid are orphans too: they were left by an
+        # earlier process that had the same pid (pid 1 in a container)
+        pid = os.getpid()
+        orphans = []
+        for path in self.journal_dir.iterdir():
+            match = _SEGMENT_RE.match(path.name)
+            if match and (int(match.group(1)) == pid or not _pid_alive(int(match.group(1)))):
+                orphans.append((int(match.group(1)), int(match.group(2)), path))
+        # Number claimed segments past our own, so a rename never overwrites one
+        # that is yet to be read
+        self._segment = max([self._segment] + [segment for owner, segment, _ in orphans if owner == pid])
+        for _, _, path in sorted(orphans):
+            # Claim the segment under our own pid; it is deleted by the next
+            # successful flush like any other closed segment.
+            self._segment += 1
+            claimed = self._segment_path(self._segment)
+            try:
+                path.rename(claimed)
+            except FileNotFoundError:
+                continue  # another worker claimed it first
+            for line in claimed.read_text().splitlines():
+                try:
+                    user_id, post_id, direction = (int(part) for part in line.split())
+                except ValueError:
+                    # A write torn by the crash; its enqueue never returned
+                    logger.warning("vote buffer skipped malformed journal line %r in %s", line, claimed.name)
+                    continue
+                self._pending[(user_id, post_id)] = direction
+        if orphans:
+            logger.info("vote buffer replayed %d journal segments (%d votes)", len(orphans), len(self._pending))
+
+    async def start(self) -> None:
+        if self.started:
+            return
+        self._flush_lock = asyncio.Lock()
+        self._journal_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        if self.journal_dir is not None:
+            self.journal_dir.mkdir(parents=True, exist_ok=True)
+            self._replay_orphans()
+            self._open_segment()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        finally:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+                if not self._pending:
+                    self._delete_segments(upto=self._segment)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("vote buffer flush failed; batch kept for retry")
+
+    async def _fsync(self) -> None:
+        # Group commit: every caller that wrote before the fsync starts shares it
+        if self._sync_future is None:
+            self._sync_future = asyncio.get_running_loop().create_future()
+            self._syncs[self._sync_future] = self._fd
+
+            async def _sync(future: asyncio.Future, fd: int) -> None:
+                await asyncio.sleep(0)
+                if self._sync_future is future:
+                    self._sync_future = None
+                try:
+                    async with self._journal_lock:
+                        await asyncio.to_thread(os.fsync, fd)
+                except Exception as exc:
+                    future.set_exception(exc)
+                else:
+                    future.set_result(None)
+                finally:
+                    del self._syncs[future]
+
+            asyncio.create_task(_sync(self._sync_future, self._fd))
+        await asyncio.shield(self._sync_future)
+
+    def _rotate_segment(self) -> int:
+        """Switch writers to a new segment and return the old segment's fd.
+
+        Synchronous, so it happens in the same step as the batch swap: every
+        vote in the old segment is in the batch and every later one lands in
+        the new segment.
+        """
+        old_fd = self._fd
+        self._sync_future = None
+        self._open_segment()
+        return old_fd
+
+    async def _close_segment(self, fd: int) -> None:
+        # Group commits already started for the old segment still sync its fd,
+        # so it is closed only once they are done; their waiters see any failure
+        try:
+            async with self._journal_lock:
+                await asyncio.to_thread(os.fsync, fd)
+            syncs = [future for future, synced_fd in self._syncs.items() if synced_fd == fd]
+            if syncs:
+                await asyncio.wait(syncs)
+        finally:
+            os.close(fd)
+
+    async def enqueue(self, user_id: int, post_id: int, direction: int) -> None:
+        if not self.started:
+            await self.start()
+        if self._fd is not None:
+            os.write(self._fd, f"{user_id} {post_id} {direction}\n".encode())
+        self._pending[(user_id, post_id)] = direction
+        self.enqueued += 1
+        if len(self._pending) >= self.max_batch:
+            self._wakeup.set()
+        if self._fd is not None:
+            await self._fsync()
+
+    def _delete_segments(self, upto: int) -> None:
+        for segment in range(1, upto + 1):
+            try:
+                self._segment_path(segment).unlink()
+            except FileNotFoundError:
+                pass
+
+    async def flush(self) -> int:
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, {}
+            # Votes enqueued from here on land in a new segment
+            closed_segment = self._segment
+            old_fd = self._rotate_segment() if self._fd is not None else None
+
+            up = [key for key, direction in batch.items() if direction == 1]
+            down = [key for key, direction in batch.items() if direction == 0]
+            started = time.perf_counter()
+            try:
+                if old_fd is not None:
+                    await self._close_segment(old_fd)
+                # Default resolved here, after the lifespan has built the engines
+                session_factory = self.session_factory or database.AsyncSessionLocal
+                async with session_factory() as session:
+                    result = await session.execute(FLUSH_SQL, {
+                        "up_users": [user_id for user_id, _ in up],
+                        "up_posts": [post_id for _, post_id in up],
+                        "down_users": [user_id for user_id, _ in down],
+                        "down_posts": [post_id for _, post_id in down],
+                    })
+                    counts = result.one()
+                    await session.commit()
+            except Exception:
+                self.flush_errors += 1
+                # Newer votes for the same key win over the failed batch
+                for key, direction in batch.items():
+                    self._pending.setdefault(key, direction)
+                raise
+            elapsed = time.perf_counter() - started
+            if counts.post_ids:
+                await response_cache.invalidate(counts.post_ids)
+
+            if self.journal_dir is not None:
+                self._delete_segments(upto=closed_segment)
+            self.flushes += 1
+            self.votes_flushed += len(batch)
+            self.inserted += counts.inserted
+            self.deleted += counts.deleted
+            self.last_batch_size = len(batch)
+            self.max_batch_size = max(self.max_batch_size, len(batch))
+            self.last_flush_seconds = elapsed
+            self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+            self.total_flush_seconds += elapsed
+            return len(batch)
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "enqueued": self.enqueued,
+            "flushes": self.flushes,
+            "flush_errors": self.flush_errors,
+            "votes_flushed": self.votes_flushed,
+            "inserted": self.inserted,
+            "deleted": self.deleted,
+            "last_batch_size": self.last_batch_size,
+            "max_batch_size": self.max_batch_size,
+            "avg_batch_size": self.votes_flushed / self.flushes if self.flushes else 0.0,
+            "last_flush_ms": self.last_flush_seconds * 1000,
+            "max_flush_ms": self.max_flush_seconds * 1000,
+            "avg_flush_ms": self.total_flush_seconds * 1000 / self.flushes if self.flushes else 0.0,
+        }
+
+
+vote_buffer = VoteBuffer(
+    max_batch=settings.vote_buffer_max_batch,
+    flush_interval=settings.vote_buffer_flush_interval_ms / 1000,
+    journal_dir=settings.vote_buffer_journal_dir,
+)
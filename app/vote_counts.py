@@ -0,0 +1,48 @@
+from typing import Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+
+
+def _actual_vote_count():
+    return (
+        select(func.count(models.Vote.user_id))
+        .where(models.Vote.post_id == models.Post.id)
+        .correlate(models.Post)
+        .scalar_subquery()
+    )
+
+
+async def find_vote_count_drift(db: AsyncSession, limit: Optional[int] = None) -> list[dict]:
+    """Return posts whose stored vote_count disagrees with COUNT(votes)."""
+    actual = _actual_vote_count()
+    query = (
+        select(models.Post.id, models.Post.vote_count, actual.label("actual"))
+        .where(models.Post.vote_count != actual)
+        .order_by(models.Post.id)
+        .limit(limit)
+    )
+    result = await db.execute(query)
+    return [
+        {"post_id": row.id, "stored": row.vote_count, "actual": row.actual}
+        for row in result.all()
+    ]
+
+
+async def repair_vote_count_drift(db: AsyncSession) -> list[int]:
+    """Reset drifted counters in one UPDATE and return the repaired post ids.
+
+    The caller owns the transaction and must commit.
+    """
+    actual = _actual_vote_count()
+    query = (
+        update(models.Post)
+        .where(models.Post.vote_count != actual)
+        .values(vote_count=actual)
+        .returning(models.Post.id)
+        .execution_options(synchronize_session=False)
+    )
+    result = await db.execute(query)
+    return sorted(result.scalars().all())
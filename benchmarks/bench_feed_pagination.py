@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+"""Compare deep-page latency of offset and cursor pagination on /v2/posts.
+
+Drives the app in-process through httpx's ASGI transport against the
+database configured in `.env`. With `--seed` the script first tops the posts
+table up to `--posts` published rows owned by a dedicated benchmark user, so
+point it at a disposable database.
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+import httpx
+from sqlalchemy import func, select, text
+
+from app import models, oauth2, utils
+from app.database import AsyncSessionLocal
+from app.main import app
+from app.pagination import encode_cursor, keyset_order
+
+
+BENCH_EMAIL = "bench_pagination@example.com"
+
+
+async def _ensure_dataset(posts: int, seed: bool) -> int:
+    async with AsyncSessionLocal() as session:
+        user_id = (await session.execute(
+            select(models.User.id).where(models.User.email == BENCH_EMAIL)
+        )).scalar_one_or_none()
+        if user_id is None:
+            user = models.User(email=BENCH_EMAIL, password=utils.hash("bench"))
+            session.add(user)
+            await session.flush()
+            user_id = user.id
+
+        existing = (await session.execute(
+            select(func.count()).select_from(models.Post).where(models.Post.published == True)
+        )).scalar_one()
+        if existing < posts:
+            if not seed:
+                raise SystemExit(f"Only {existing} published posts; rerun with --seed to add more.")
+            await session.execute(
+                text(
+                    "INSERT INTO posts (title, content, published, owner_id, created_at) "
+                    "SELECT 'bench post ' || g, 'bench body', TRUE, :owner, "
+                    "now() - make_interval(secs => g) "
+                    "FROM generate_series(1, :missing) AS g"
+                ),
+                {"owner": user_id, "missing": posts - existing},
+            )
+            await session.execute(text("ANALYZE posts"))
+        await session.commit()
+        return user_id
+
+
+async def _cursor_before(offset: int) -> str:
+    async with AsyncSessionLocal() as session:
+        row = (await session.execute(
+            select(models.Post.created_at, models.Post.id)
+            .where(models.Post.published == True)
+            .order_by(*keyset_order())
+            .offset(offset - 1)
+            .limit(1)
+        )).one()
+    return encode_cursor(row.created_at, row.id)
+
+
+async def _time(client: httpx.AsyncClient, params: dict, repeat: int) -> list[float]:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        res = await client.get("/v2/posts/", params=params)
+        timings.append((time.perf_counter() - started) * 1000)
+        res.raise_for_status()
+    return timings
+
+
+async def _run(args: argparse.Namespace) -> None:
+    offset = (args.page - 1) * args.limit
+    user_id = await _ensure_dataset(max(args.posts, offset + args.limit), args.seed)
+    cursor = await _cursor_before(offset)
+    token = oauth2.create_access_token({"user_id": user_id})
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench",
+                                 headers={"Authorization": f"Bearer {token}"}) as client:
+        modes = {
+            "offset": {"limit": args.limit, "skip": offset},
+            "cursor": {"limit": args.limit, "cursor": cursor},
+        }
+        for params in modes.values():
+            await _time(client, params, 3)  # warm-up
+        print(f"page={args.page} limit={args.limit} (skip={offset})")
+        for mode, params in modes.items():
+            timings = sorted(await _time(client, params, args.repeat))
+            print(
+                f"{mode:>7}: p50={statistics.median(timings):7.2f}ms "
+                f"p95={timings[int(len(timings) * 0.95) - 1]:7.2f}ms "
+                f"min={timings[0]:7.2f}ms"
+            )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark offset vs cursor pagination.")
+    parser.add_argument("--page", type=int, default=1000, help="Page number to fetch (default: 1000)")
+    parser.add_argument("--limit", type=int, default=10, help="Page size (default: 10)")
+    parser.add_argument("--posts", type=int, default=20000, help="Published posts required (default: 20000)")
+    parser.add_argument("--repeat", type=int, default=50, help="Timed requests per mode (default: 50)")
+    parser.add_argument("--seed", action="store_true", help="Insert missing posts before timing")
+    return parser.parse_args()
+
+
+def main() -> None:
+    asyncio.run(_run(parse_args()))
+
+
+if __name__ == "__main__":
+    main()
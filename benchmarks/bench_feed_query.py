@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+"""Compare the two feed query modes of GET /v2/posts: "orm" vs "inline".
+
+"orm" loads Post entities and selectin-loads their owners (two statements per
+page); "inline" joins the owner columns into the page query and maps rows
+straight to the response (one statement). Drives the app in-process through
+httpx's ASGI transport against the database configured in `.env`, with the
+response cache bypassed, and reports statements and wall time per page. With
+`--seed` the script first tops the posts table up to `--posts` published rows
+spread over `--owners` benchmark users, so point it at a disposable database.
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+import httpx
+from sqlalchemy import event, func, select, text
+
+from app import models, oauth2, utils
+from app.config import settings
+from app.database import AsyncSessionLocal, async_engine
+from app.main import app
+from app.response_cache import NullResponseCache
+from app.v2.routers import post as post_router
+
+
+BENCH_EMAIL = "bench_feed_{}@example.com"
+
+
+async def _ensure_dataset(posts: int, owners: int, seed: bool) -> int:
+    async with AsyncSessionLocal() as session:
+        emails = [BENCH_EMAIL.format(i) for i in range(owners)]
+        existing_users = set((await session.execute(
+            select(models.User.email).where(models.User.email.in_(emails))
+        )).scalars())
+        password = utils.hash("bench")
+        session.add_all(
+            models.User(email=email, password=password) for email in emails if email not in existing_users)
+        await session.flush()
+        owner_ids = list((await session.execute(
+            select(models.User.id).where(models.User.email.in_(emails)).order_by(models.User.id)
+        )).scalars())
+
+        existing = (await session.execute(
+            select(func.count()).select_from(models.Post).where(models.Post.published == True)
+        )).scalar_one()
+        if existing < posts:
+            if not seed:
+                raise SystemExit(f"Only {existing} published posts; rerun with --seed to add more.")
+            await session.execute(
+                text(
+                    "INSERT INTO posts (title, content, published, owner_id, created_at) "
+                    "SELECT 'bench post ' || g, 'bench body', TRUE, "
+                    "(CAST(:owners AS int[]))[1 + g % :n_owners], now() - make_interval(secs => g) "
+                    "FROM generate_series(1, :missing) AS g"
+                ),
+                {"owners": owner_ids, "n_owners": len(owner_ids), "missing": posts - existing},
+            )
+            await session.execute(text("ANALYZE posts"))
+        await session.commit()
+        return owner_ids[0]
+
+
+async def _time(client: httpx.AsyncClient, params: dict, repeat: int, statements: list):
+    timings, counts = [], []
+    for _ in range(repeat):
+        statements.clear()
+        started = time.perf_counter()
+        res = await client.get("/v2/posts/", params=params)
+        timings.append((time.perf_counter() - started) * 1000)
+        res.raise_for_status()
+        counts.append(len(statements))
+    return timings, counts
+
+
+async def _run(args: argparse.Namespace) -> None:
+    user_id = await _ensure_dataset(args.posts, args.owners, args.seed)
+    token = oauth2.create_access_token({"user_id": user_id})
+    post_router.response_cache = NullResponseCache()
+
+    statements = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", _record)
+    params = {"pagination": "cursor", "limit": args.limit}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench",
+                                 headers={"Authorization": f"Bearer {token}"}) as client:
+        print(f"limit={args.limit} owners={args.owners}")
+        for mode in ("orm", "inline"):
+            settings.feed_query_mode = mode
+            await _time(client, params, 3, statements)  # warm-up
+            timings, counts = await _time(client, params, args.repeat, statements)
+            timings.sort()
+            print(
+                f"{mode:>7}: statements/page={statistics.mean(counts):.1f} "
+                f"p50={statistics.median(timings):7.2f}ms "
+                f"p95={timings[int(len(timings) * 0.95) - 1]:7.2f}ms "
+                f"min={timings[0]:7.2f}ms"
+            )
+    event.remove(async_engine.sync_engine, "before_cursor_execute", _record)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark ORM vs inline feed queries.")
+    parser.add_argument("--limit", type=int, default=50, help="Page size (default: 50)")
+    parser.add_argument("--owners", type=int, default=20, help="Distinct post owners (default: 20)")
+    parser.add_argument("--posts", type=int, default=5000, help="Published posts required (default: 5000)")
+    parser.add_argument("--repeat", type=int, default=200, help="Timed requests per mode (default: 200)")
+    parser.add_argument("--seed", action="store_true", help="Insert missing posts before timing")
+    return parser.parse_args()
+
+
+def main() -> None:
+    asyncio.run(_run(parse_args()))
+
+
+if __name__ == "__main__":
+    main()
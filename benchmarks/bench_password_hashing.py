@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+"""Compare event-loop lag and login throughput for inline vs pooled bcrypt.
+
+Simulates a login burst inside one event loop: every "login" verifies a
+password, while a probe task sleeps in short ticks and records how late it
+wakes up. The inline mode calls `utils.verify` directly (the old handler
+behaviour); the pooled mode awaits `utils.PasswordHasher.verify`.
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from app import utils
+
+
+PROBE_INTERVAL = 0.005
+
+
+async def _probe(lags: list[float], stop: asyncio.Event) -> None:
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        started = loop.time()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(max(0.0, loop.time() - started - PROBE_INTERVAL))
+
+
+async def _run(mode: str, logins: int, concurrency: int, hasher: utils.PasswordHasher) -> dict:
+    hashed = utils.hash("LoadTest!234")
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def login() -> None:
+        async with semaphore:
+            if mode == "inline":
+                ok = utils.verify("LoadTest!234", hashed)
+            else:
+                ok = await hasher.verify("LoadTest!234", hashed)
+            assert ok
+            # yield like a real handler would between DB and hashing work
+            await asyncio.sleep(0)
+
+    lags: list[float] = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(_probe(lags, stop))
+    await asyncio.sleep(PROBE_INTERVAL * 2)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await probe
+    lags_ms = sorted(lag * 1000 for lag in lags) or [0.0]
+    return {
+        "mode": mode,
+        "logins_per_sec": logins / elapsed,
+        "loop_lag_p50_ms": statistics.median(lags_ms),
+        "loop_lag_p99_ms": lags_ms[min(len(lags_ms) - 1, int(len(lags_ms) * 0.99))],
+        "loop_lag_max_ms": lags_ms[-1],
+        "peak_queue_depth": hasher.peak_queue_depth if mode == "pooled" else 0,
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark bcrypt on and off the event loop.")
+    parser.add_argument("--logins", type=int, default=200, help="Number of simulated logins (default: 200)")
+    parser.add_argument("--concurrency", type=int, default=50, help="Concurrent logins in flight (default: 50)")
+    parser.add_argument("--executor", choices=["thread", "process"], default="thread")
+    parser.add_argument("--workers", type=int, default=4, help="Executor workers (default: 4)")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    print(f"bcrypt rounds={utils.BCRYPT_ROUNDS} logins={args.logins} concurrency={args.concurrency}")
+    for mode in ("inline", "pooled"):
+        hasher = utils.PasswordHasher(executor=args.executor, max_workers=args.workers)
+        try:
+            result = asyncio.run(_run(mode, args.logins, args.concurrency, hasher))
+        finally:
+            hasher.shutdown()
+        print(
+            f"{result['mode']:>7}: {result['logins_per_sec']:8.1f} logins/s  "
+            f"loop lag p50={result['loop_lag_p50_ms']:.2f}ms "
+            f"p99={result['loop_lag_p99_ms']:.2f}ms max={result['loop_lag_max_ms']:.2f}ms  "
+            f"peak queue={result['peak_queue_depth']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+"""Offline microbenchmarks for the request hot paths, checked against a baseline.
+
+Covers JWT issue/verify, bcrypt hash/verify at `utils.BCRYPT_ROUNDS`,
+PostWithVotes page serialization and SQL compilation of the v2 feed query.
+Nothing here talks to a server or a database, so it runs anywhere the app
+imports (placeholder settings are filled in when no `.env` is present).
+
+Each benchmark reports the median per-call time over `--repeat` timed rounds,
+and how widely the rounds spread around it (interquartile range / median).
+`--save-baseline` writes both to `benchmarks/baseline.json`; a normal run
+compares against that file and exits 1 when any benchmark is slower than its
+baseline by more than its tolerance: the per-benchmark value, widened to
+three times the spread recorded with the baseline (up to 100%) for
+benchmarks that proved noisy. Baselines are only comparable on the same
+machine and Python version, so regenerate them when either changes.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import timeit
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Tuple
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+# Placeholder settings so the app imports without a .env; no connection is made
+for _name, _value in {
+    "DATABASE_HOSTNAME": "127.0.0.1", "DATABASE_PORT": "5432", "DATABASE_PASSWORD": "bench",
+    "DATABASE_NAME": "bench", "DATABASE_USERNAME": "bench", "SECRET_KEY": "bench-secret",
+    "ALGORITHM": "HS256", "ACCESS_TOKEN_EXPIRE_MINUTES": "30",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+from pydantic import TypeAdapter
+from sqlalchemy.dialects import postgresql
+
+from app import models, oauth2, schemas, services, utils
+from app.pagination import encode_cursor, keyset_after, keyset_order
+from bench_post_serialization import make_page
+
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+DEFAULT_TOLERANCE = 0.25
+DEFAULT_REPEAT = 15
+MIN_ROUND_SECONDS = 0.1
+# A benchmark's tolerance is at least this many times its recorded spread,
+# capped at MAX_TOLERANCE so a noisy baseline cannot hide a real slowdown
+# (benchmarks whose own tolerance is higher, like bcrypt, keep theirs)
+SPREAD_FACTOR = 3
+MAX_TOLERANCE = 0.3
+
+
+class Benchmark(NamedTuple):
+    name: str
+    setup: Callable[[], Callable[[], object]]
+    # bcrypt and friends are noisier than pure-Python paths
+    tolerance: float = DEFAULT_TOLERANCE
+
+
+def _jwt_create():
+    return lambda: oauth2.create_access_token({"user_id": 42})
+
+
+def _jwt_verify_uncached():
+    token = oauth2.create_access_token({"user_id": 42})
+
+    def run():
+        oauth2.token_cache.clear()
+        return oauth2.verify_access_token(token)
+    return run
+
+
+def _jwt_verify_cached():
+    token = oauth2.create_access_token({"user_id": 42})
+    oauth2.verify_access_token(token)
+    return lambda: oauth2.verify_access_token(token)
+
+
+def _bcrypt_hash():
+    return lambda: utils.hash("LoadTest!234")
+
+
+def _bcrypt_verify():
+    hashed = utils.hash("LoadTest!234")
+    return lambda: utils.verify("LoadTest!234", hashed)
+
+
+_PAGE_ADAPTER = TypeAdapter(List[schemas.PostWithVotes])
+
+
+def _serialize_page_trusted(size: int):
+    posts = make_page(size)
+    return lambda: _PAGE_ADAPTER.dump_json(
+        [schemas.PostWithVotes.construct_from(post, post.owner, post.vote_count) for post in posts])
+
+
+def _serialize_page_validated(size: int):
+    posts = make_page(size)
+    return lambda: _PAGE_ADAPTER.dump_json(_PAGE_ADAPTER.validate_python(
+        [{"post": post, "votes": post.vote_count} for post in posts], from_attributes=True))
+
+
+def _compile_feed_query():
+    cursor = encode_cursor(make_page(1)[0].created_at, 1000)
+    dialect = postgresql.asyncpg.dialect()
+
+    def run():
+        query = (
+            services.feed_query()
+            .where(models.Post.published == True)
+            .where(models.Post.title.contains("fastapi"))
+            .where(keyset_after(cursor))
+            .order_by(*keyset_order())
+            .limit(11)
+        )
+        return str(query.compile(dialect=dialect))
+    return run
+
+
+BENCHMARKS = [
+    Benchmark("jwt_create", _jwt_create),
+    Benchmark("jwt_verify_uncached", _jwt_verify_uncached),
+    Benchmark("jwt_verify_cached", _jwt_verify_cached),
+    Benchmark("bcrypt_hash", _bcrypt_hash, tolerance=0.5),
+    Benchmark("bcrypt_verify", _bcrypt_verify, tolerance=0.5),
+    Benchmark("serialize_page_trusted_10", lambda: _serialize_page_trusted(10)),
+    Benchmark("serialize_page_trusted_100", lambda: _serialize_page_trusted(100)),
+    Benchmark("serialize_page_validated_100", lambda: _serialize_page_validated(100)),
+    Benchmark("compile_feed_query", _compile_feed_query),
+]
+
+
+def measure(fn: Callable[[], object], repeat: int) -> Tuple[float, float]:
+    """(median seconds per call, IQR / median) over `repeat` rounds of at least MIN_ROUND_SECONDS."""
+    timer = timeit.Timer(fn)
+    number = 1
+    while timer.timeit(number) < MIN_ROUND_SECONDS:
+        number *= 2
+    rounds = [seconds / number for seconds in timer.repeat(repeat=repeat, number=number)]
+    median = statistics.median(rounds)
+    if len(rounds) < 4:
+        return median, 0.0
+    quartiles = statistics.quantiles(rounds, n=4)
+    return median, (quartiles[2] - quartiles[0]) / median
+
+
+def environment() -> dict:
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "system": platform.system(),
+        "bcrypt_rounds": utils.BCRYPT_ROUNDS,
+    }
+
+
+def tolerance_for(name: str, baseline: dict) -> float:
+    """The benchmark's own tolerance, widened when its baseline rounds were noisy."""
+    tolerance = {bench.name: bench.tolerance for bench in BENCHMARKS}.get(name, DEFAULT_TOLERANCE)
+    spread = baseline.get("spread", {}).get(name, 0.0)
+    return max(tolerance, min(SPREAD_FACTOR * spread, MAX_TOLERANCE))
+
+
+def compare(results: Dict[str, float], baseline: dict, tolerance_override=None) -> List[str]:
+    """Print a comparison table and return the names of regressed benchmarks."""
+    regressions = []
+    print(f"{'benchmark':<30} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, seconds in results.items():
+        previous = baseline["results"].get(name)
+        if previous is None:
+            print(f"{name:<30} {'-':>12} {_format(seconds):>12} {'new':>8}")
+            continue
+        change = seconds / previous - 1
+        tolerance = tolerance_override if tolerance_override is not None else tolerance_for(name, baseline)
+        flag = ""
+        if change > tolerance:
+            regressions.append(name)
+            flag = f"  REGRESSION (> {tolerance:.0%})"
+        print(f"{name:<30} {_format(previous):>12} {_format(seconds):>12} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def _format(seconds: float) -> str:
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f} ms"
+    return f"{seconds * 1e6:.2f} us"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run the offline microbenchmark suite.")
+    parser.add_argument("--only", action="append", metavar="NAME",
+                        help="Run only this benchmark (repeatable)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                        help=f"Timed rounds per benchmark (default: {DEFAULT_REPEAT})")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE,
+                        help=f"Baseline file (default: {DEFAULT_BASELINE.name})")
+    parser.add_argument("--tolerance", type=float, default=None,
+                        help="Allowed slowdown as a fraction, overriding per-benchmark values")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="Write the results as the new baseline instead of comparing")
+    parser.add_argument("--list", action="store_true", help="List benchmark names and exit")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    if args.list:
+        for bench in BENCHMARKS:
+            print(bench.name)
+        return 0
+
+    selected = [bench for bench in BENCHMARKS if not args.only or bench.name in args.only]
+    unknown = set(args.only or ()) - {bench.name for bench in selected}
+    if unknown:
+        print(f"Unknown benchmark(s): {', '.join(sorted(unknown))}", file=sys.stderr)
+        return 2
+
+    results, spread = {}, {}
+    for bench in selected:
+        results[bench.name], spread[bench.name] = measure(bench.setup(), args.repeat)
+        print(f"  {bench.name}: {_format(results[bench.name])} (spread {spread[bench.name]:.1%})",
+              file=sys.stderr)
+
+    if args.save_baseline:
+        existing = json.loads(args.baseline.read_text()) if args.baseline.exists() and args.only else {}
+        payload = {
+            "environment": environment(),
+            "results": {**existing.get("results", {}), **results},
+            "spread": {**existing.get("spread", {}), **spread},
+        }
+        args.baseline.write_text(json.dumps(payload, indent=2, sort_keys=True) + "\n")
+        print(f"Saved {len(results)} result(s) to {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}; run with --save-baseline first.", file=sys.stderr)
+        return 2
+    baseline = json.loads(args.baseline.read_text())
+    if baseline.get("environment") != environment():
+        print(f"warning: baseline was recorded on {baseline.get('environment')}, "
+              f"this run is {environment()}", file=sys.stderr)
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
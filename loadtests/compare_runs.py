@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+"""Summarize a locust run and diff it against a stored baseline run.
+
+Reads the CSV files written by `locust --csv PREFIX --csv-full-history` (as
+scripts/run_locust_with_metrics.sh does). With `PREFIX_stats_history.csv`
+present, p50/p95/p99 are the medians of locust's rolling-window percentiles
+and RPS is the mean per-second rate, both over the steady state only (rows
+after `--warmup` seconds); otherwise the whole-run numbers from
+`PREFIX_stats.csv` are used.
+
+    python loadtests/compare_runs.py sim_res/locust_20250101_120000 --save-baseline read-heavy
+    python loadtests/compare_runs.py sim_res/locust_20250102_120000 --baseline read-heavy
+
+A baseline is a summary JSON; `--baseline` takes a name under
+loadtests/baselines/, a path to a JSON file or another CSV prefix. Exits 1
+when `--fail-on-regression` is given and a latency rose (or RPS fell) by more
+than that fraction on any endpoint.
+"""
+
+import argparse
+import csv
+import json
+import statistics
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+BASELINE_DIR = Path(__file__).resolve().parent / "baselines"
+
+PERCENTILES = {"p50": "50%", "p95": "95%", "p99": "99%"}
+# For these, bigger is worse; for rps smaller is worse
+LATENCY_METRICS = tuple(PERCENTILES)
+AGGREGATED = "Aggregated"
+
+
+def _number(value: str) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None  # locust writes N/A before an endpoint has samples
+
+
+def _endpoint(row: Dict[str, str]) -> str:
+    name, method = row["Name"], row["Type"]
+    # locust_v2.py already names its requests "METHOD /path"
+    if not method or name.startswith(f"{method} "):
+        return name
+    return f"{method} {name}"
+
+
+def _from_stats(path: Path) -> Dict[str, dict]:
+    endpoints = {}
+    with path.open(newline="") as handle:
+        for row in csv.DictReader(handle):
+            endpoints[_endpoint(row)] = {
+                "requests": int(row["Request Count"]),
+                "failures": int(row["Failure Count"]),
+                "rps": _number(row["Requests/s"]),
+                **{metric: _number(row[column]) for metric, column in PERCENTILES.items()},
+            }
+    return endpoints
+
+
+def _from_history(path: Path, warmup: float) -> Dict[str, dict]:
+    rows = {}
+    with path.open(newline="") as handle:
+        for row in csv.DictReader(handle):
+            rows.setdefault(_endpoint(row), []).append(row)
+
+    start = min(int(row["Timestamp"]) for entries in rows.values() for row in entries)
+    endpoints = {}
+    for name, entries in rows.items():
+        steady = [row for row in entries if int(row["Timestamp"]) >= start + warmup]
+        last = entries[-1]
+        summary = {
+            "requests": int(last["Total Request Count"]),
+            "failures": int(last["Total Failure Count"]),
+            "rps": None,
+        }
+        rates = [rate for rate in (_number(row["Requests/s"]) for row in steady) if rate is not None]
+        if rates:
+            summary["rps"] = statistics.fmean(rates)
+        for metric, column in PERCENTILES.items():
+            values = [v for v in (_number(row[column]) for row in steady) if v is not None]
+            summary[metric] = statistics.median(values) if values else None
+        endpoints[name] = summary
+    return endpoints
+
+
+def summarize(prefix: str, warmup: float = 30.0) -> dict:
+    """Per-endpoint summary of the run whose CSV files start with `prefix`."""
+    stats = Path(f"{prefix}_stats.csv")
+    history = Path(f"{prefix}_stats_history.csv")
+    if not stats.exists():
+        raise FileNotFoundError(f"{stats} not found")
+    endpoints = _from_stats(stats)
+    source = "stats"
+    if history.exists() and history.stat().st_size:
+        steady = _from_history(history, warmup)
+        # Totals come from the final stats file; only endpoints with steady
+        # state samples take the history numbers
+        for name, summary in steady.items():
+            if name in endpoints:
+                endpoints[name].update({key: value for key, value in summary.items()
+                                        if key not in ("requests", "failures") and value is not None})
+        source = "history"
+    return {"source": str(prefix), "method": source, "warmup_seconds": warmup, "endpoints": endpoints}
+
+
+def load(reference: str, warmup: float) -> dict:
+    """A summary from a baseline name, a summary JSON file or a CSV prefix."""
+    path = Path(reference)
+    if path.suffix == ".json" and path.exists():
+        return json.loads(path.read_text())
+    named = BASELINE_DIR / f"{reference}.json"
+    if named.exists():
+        return json.loads(named.read_text())
+    return summarize(reference, warmup)
+
+
+def _change(previous: Optional[float], current: Optional[float]) -> Optional[float]:
+    if previous is None or current is None or previous == 0:
+        return None
+    return current / previous - 1
+
+
+def compare(current: dict, baseline: dict, threshold: Optional[float]) -> List[str]:
+    """Print the diff table and return "<endpoint> <metric>" for each regression."""
+    regressions = []
+    print(f"{'endpoint':<45} {'metric':<6} {'baseline':>10} {'current':>10} {'change':>8}")
+    names = sorted(set(current["endpoints"]) | set(baseline["endpoints"]),
+                   key=lambda name: (name == AGGREGATED, name))
+    for name in names:
+        now = current["endpoints"].get(name)
+        before = baseline["endpoints"].get(name)
+        if now is None or before is None:
+            print(f"{name:<45} {'only in ' + ('baseline' if now is None else 'current')}")
+            continue
+        for metric in (*LATENCY_METRICS, "rps"):
+            change = _change(before.get(metric), now.get(metric))
+            flag = ""
+            if change is not None and threshold is not None:
+                worse = change > threshold if metric in LATENCY_METRICS else change < -threshold
+                if worse:
+                    regressions.append(f"{name} {metric}")
+                    flag = "  REGRESSION"
+            print(f"{name:<45} {metric:<6} {_format(before.get(metric)):>10} "
+                  f"{_format(now.get(metric)):>10} {_format_change(change):>8}{flag}")
+        if now["failures"] or before["failures"]:
+            print(f"{name:<45} {'fail':<6} {before['failures']:>10} {now['failures']:>10}")
+    return regressions
+
+
+def _format(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.1f}"
+
+
+def _format_change(change: Optional[float]) -> str:
+    return "-" if change is None else f"{change:+.1%}"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Compare a locust run against a baseline run.")
+    parser.add_argument("prefix", help="CSV prefix of the run (the value passed to locust --csv)")
+    parser.add_argument("--baseline", help="Baseline name, summary JSON or CSV prefix to compare against")
+    parser.add_argument("--save-baseline", metavar="NAME",
+                        help="Store this run's summary as loadtests/baselines/NAME.json (or a .json path)")
+    parser.add_argument("--warmup", type=float, default=30.0,
+                        help="Seconds at the start of the run left out of steady state (default: 30)")
+    parser.add_argument("--fail-on-regression", type=float, metavar="FRACTION",
+                        help="Exit 1 if p50/p95/p99 rise or RPS falls by more than this fraction")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    try:
+        current = summarize(args.prefix, args.warmup)
+    except FileNotFoundError as exc:
+        print(exc, file=sys.stderr)
+        return 2
+
+    if args.save_baseline:
+        target = Path(args.save_baseline)
+        if target.suffix != ".json":
+            target = BASELINE_DIR / f"{args.save_baseline}.json"
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(json.dumps(current, indent=2, sort_keys=True) + "\n")
+        print(f"Saved baseline to {target}")
+
+    if not args.baseline:
+        if not args.save_baseline:
+            print(json.dumps(current, indent=2, sort_keys=True))
+        return 0
+
+    try:
+        baseline = load(args.baseline, args.warmup)
+    except FileNotFoundError as exc:
+        print(exc, file=sys.stderr)
+        return 2
+    regressions = compare(current, baseline, args.fail_on_regression)
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,314 @@
+#!/usr/bin/env python
+"""Bulk-load a large, reproducible dataset of users, posts and votes.
+
+Rows are streamed with COPY (one statement per table) rather than inserted
+through the ORM, and every user shares one password, hashed once. Votes per
+post follow a Zipf distribution: posts are ranked in a shuffled order and the
+post of rank r receives a share of `--votes` proportional to 1 / r**s (capped
+at the number of users, since a user votes on a post at most once).
+`posts.vote_count` is written to match, so no reconciliation is needed.
+
+Everything derived from the random generator (emails, titles, owners,
+timestamps, voters) is a function of `--seed`, `--end-date` (2025-01-01
+unless given, never the current date) and the sizes, so two runs with the
+same arguments into an empty database produce identical tables. Ids are
+assigned here, starting after the current maximum, so run it against a
+database nobody else is writing to. `--truncate` empties the three tables
+first. Secondary indexes on posts and votes are dropped for the load and
+rebuilt at the end, also when the load fails (`--keep-indexes` to skip that);
+if they cannot be, their definitions are printed.
+
+    python loadtests/generate_dataset.py --users 1000000 --posts 5000000 --votes 20000000 --truncate
+
+A credentials file in the format of seed_test_users.py (the first
+`--credentials` users) is written for the locust harness.
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Iterator, List, Sequence, Tuple
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+import psycopg
+
+from app import utils
+from app.config import settings
+
+
+WORDS = (
+    "fastapi", "async", "postgres", "index", "cache", "latency", "query", "vote", "feed", "cursor",
+    "python", "docker", "deploy", "worker", "pool", "replica", "benchmark", "profile", "schema",
+    "migration", "token", "search", "ranking", "throughput", "release", "debug", "review", "design",
+)
+
+# Fixed so the generated timestamps do not depend on the day of the run
+DEFAULT_END_DATE = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+class Progress:
+    """Prints rows done and rows/s for one table at most every `interval` seconds."""
+
+    def __init__(self, table: str, total: int, interval: float = 2.0):
+        self.table = table
+        self.total = total
+        self.interval = interval
+        self.done = 0
+        self.started = self._last = time.perf_counter()
+
+    def advance(self, rows: int = 1) -> None:
+        self.done += rows
+        now = time.perf_counter()
+        if now - self._last >= self.interval:
+            self._last = now
+            self._report(now, final=False)
+
+    def finish(self) -> float:
+        now = time.perf_counter()
+        self._report(now, final=True)
+        return now - self.started
+
+    def _report(self, now: float, final: bool) -> None:
+        elapsed = max(now - self.started, 1e-9)
+        share = f" ({self.done / self.total:.0%})" if self.total and not final else ""
+        print(f"  {self.table}: {self.done:,} rows{share} in {elapsed:.1f}s, "
+              f"{self.done / elapsed:,.0f} rows/s", file=sys.stderr, flush=True)
+
+
+def zipf_vote_counts(posts: int, votes: int, s: float, max_per_post: int,
+                     rng: random.Random) -> List[int]:
+    """Votes per post (indexed like the posts), Zipf-distributed over a shuffled ranking."""
+    if not posts:
+        return []
+    weights = [1 / rank ** s for rank in range(1, posts + 1)]
+    scale = votes / sum(weights)
+    by_rank = [min(max_per_post, int(weight * scale + rng.random())) for weight in weights]
+    order = list(range(posts))
+    rng.shuffle(order)
+    counts = [0] * posts
+    for rank, index in enumerate(order):
+        counts[index] = by_rank[rank]
+    return counts
+
+
+def _next_id(cur, table: str) -> int:
+    cur.execute(f"SELECT coalesce(max(id), 0) + 1 FROM {table}")
+    return cur.fetchone()[0]
+
+
+def _sync_sequence(cur, table: str) -> None:
+    cur.execute(
+        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), coalesce(max(id), 1), max(id) IS NOT NULL) "
+        f"FROM {table}"
+    )
+
+
+# Secondary indexes only; primary keys and unique constraints stay, they
+# are what keeps the generated rows honest
+_SECONDARY_INDEXES_SQL = """
+SELECT indexname, indexdef FROM pg_indexes i
+WHERE schemaname = current_schema() AND tablename = ANY(%s)
+  AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conname = i.indexname)
+"""
+
+
+def _drop_secondary_indexes(cur, tables: List[str]) -> List[Tuple[str, str]]:
+    cur.execute(_SECONDARY_INDEXES_SQL, (tables,))
+    indexes = cur.fetchall()
+    for name, _ in indexes:
+        cur.execute(f'DROP INDEX "{name}"')
+    return indexes
+
+
+def _restore_indexes(conn, indexes: List[Tuple[str, str]]) -> float:
+    """Recreate the dropped indexes, printing the definitions of any left undone on failure."""
+    started = time.perf_counter()
+    remaining = list(indexes)
+    try:
+        # Leaves the transaction of a load that failed halfway
+        conn.rollback()
+        with conn.cursor() as cur:
+            while remaining:
+                name, definition = remaining[0]
+                print(f"  rebuilding {name}", file=sys.stderr, flush=True)
+                cur.execute(definition)
+                conn.commit()
+                remaining.pop(0)
+    except Exception:
+        print("Could not rebuild every dropped index; run these to restore them:", file=sys.stderr)
+        for _, definition in remaining:
+            print(f"  {definition};", file=sys.stderr)
+        raise
+    return time.perf_counter() - started
+
+
+def _copy(conn, statement: str, rows: Iterator[Sequence], progress: Progress) -> float:
+    with conn.cursor() as cur:
+        with cur.copy(statement) as copy:
+            for row in rows:
+                copy.write_row(row)
+                progress.advance()
+    conn.commit()
+    return progress.finish()
+
+
+def _user_rows(first_id: int, count: int, args, hashed: str, end: datetime,
+               rng: random.Random) -> Iterator[Tuple]:
+    span = args.days * 86400
+    for offset in range(count):
+        user_id = first_id + offset
+        created_at = end - timedelta(seconds=rng.randrange(span))
+        yield user_id, f"{args.email_prefix}{args.seed}_{user_id}@{args.domain}", hashed, created_at
+
+
+def _post_rows(first_id: int, owners: Tuple[int, int], counts: List[int], args, end: datetime,
+               rng: random.Random) -> Iterator[Tuple]:
+    span = args.days * 86400
+    first_owner, owner_count = owners
+    for offset, vote_count in enumerate(counts):
+        title = " ".join(rng.choices(WORDS, k=rng.randint(3, 8))).capitalize()
+        content = " ".join(rng.choices(WORDS, k=rng.randint(20, 60)))
+        created_at = end - timedelta(seconds=rng.randrange(span))
+        yield (first_id + offset, title, content, rng.random() < args.published_ratio, created_at,
+               first_owner + rng.randrange(owner_count), vote_count)
+
+
+def _vote_rows(first_post: int, counts: List[int], users: Tuple[int, int],
+               rng: random.Random) -> Iterator[Tuple]:
+    first_user, user_count = users
+    for offset, count in enumerate(counts):
+        post_id = first_post + offset
+        for voter in rng.sample(range(user_count), count):
+            yield first_user + voter, post_id
+
+
+def _write_credentials(path: Path, first_user: int, count: int, args) -> None:
+    users = [
+        {"id": user_id, "email": f"{args.email_prefix}{args.seed}_{user_id}@{args.domain}",
+         "password": args.password}
+        for user_id in range(first_user, first_user + count)
+    ]
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({"password": args.password, "users": users}, indent=2))
+
+
+def _default_dsn() -> str:
+    host = settings.database_hostname.strip()
+    return (f"postgresql://{settings.database_username}:{settings.database_password}@"
+            f"{host}:{settings.database_port}/{settings.database_name}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Bulk-load users, posts and votes with COPY.")
+    parser.add_argument("--users", type=int, default=100_000, help="Users to create (default: 100000)")
+    parser.add_argument("--posts", type=int, default=500_000, help="Posts to create (default: 500000)")
+    parser.add_argument("--votes", type=int, default=2_000_000,
+                        help="Approximate number of votes to create (default: 2000000)")
+    parser.add_argument("--zipf-s", type=float, default=1.1,
+                        help="Zipf exponent of votes per post; higher is more skewed (default: 1.1)")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed (default: 42)")
+    parser.add_argument("--days", type=int, default=365,
+                        help="Spread created_at over this many days before --end-date (default: 365)")
+    parser.add_argument("--end-date", type=datetime.fromisoformat, default=DEFAULT_END_DATE,
+                        help="Latest created_at, ISO format, UTC unless an offset is given "
+                             "(default: %(default)s)")
+    parser.add_argument("--published-ratio", type=float, default=0.9,
+                        help="Fraction of posts that are published (default: 0.9)")
+    parser.add_argument("--password", default="LoadTest!234", help="Password shared by every user")
+    parser.add_argument("--email-prefix", default="bench_user_", help="Email prefix (default: bench_user_)")
+    parser.add_argument("--domain", default="example.com", help="Email domain (default: example.com)")
+    parser.add_argument("--credentials", type=int, default=200,
+                        help="Users written to the credentials file (default: 200)")
+    parser.add_argument("--output", default=str(ROOT_DIR / "loadtests" / "test_users.json"),
+                        help="Credentials file for locust_v2.py")
+    parser.add_argument("--dsn", default=None, help="libpq connection string (default: from app settings)")
+    parser.add_argument("--truncate", action="store_true",
+                        help="Empty users, posts and votes (and reset their ids) before loading")
+    parser.add_argument("--keep-indexes", action="store_true",
+                        help="Load with secondary indexes in place instead of rebuilding them afterwards")
+    parser.add_argument("--no-analyze", action="store_true", help="Skip VACUUM ANALYZE after loading")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    if args.users < 1 or args.posts < 0 or args.votes < 0:
+        print("--users must be positive; --posts and --votes must not be negative", file=sys.stderr)
+        return 2
+
+    rng = random.Random(args.seed)
+    end = args.end_date
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+
+    started = time.perf_counter()
+    hashed = utils.hash(args.password)
+    counts = zipf_vote_counts(args.posts, args.votes, args.zipf_s, args.users, rng)
+    total_votes = sum(counts)
+    print(f"Loading {args.users:,} users, {args.posts:,} posts and {total_votes:,} votes "
+          f"(seed {args.seed}, zipf s={args.zipf_s}, busiest post {max(counts, default=0):,} votes)",
+          file=sys.stderr)
+
+    with psycopg.connect(args.dsn or _default_dsn()) as conn:
+        with conn.cursor() as cur:
+            if args.truncate:
+                cur.execute("TRUNCATE votes, posts, users RESTART IDENTITY CASCADE")
+            first_user = _next_id(cur, "users")
+            first_post = _next_id(cur, "posts")
+            # Building an index once is far cheaper than updating it per row
+            # (the GIN full-text index especially)
+            indexes = [] if args.keep_indexes else _drop_secondary_indexes(cur, ["posts", "votes"])
+        conn.commit()
+
+        timings = {}
+        try:
+            timings["users"] = _copy(
+                conn, "COPY users (id, email, password, created_at) FROM STDIN",
+                _user_rows(first_user, args.users, args, hashed, end, rng),
+                Progress("users", args.users))
+            timings["posts"] = _copy(
+                conn, "COPY posts (id, title, content, published, created_at, owner_id, vote_count) FROM STDIN",
+                _post_rows(first_post, (first_user, args.users), counts, args, end, rng),
+                Progress("posts", args.posts))
+            timings["votes"] = _copy(
+                conn, "COPY votes (user_id, post_id) FROM STDIN",
+                _vote_rows(first_post, counts, (first_user, args.users), rng),
+                Progress("votes", total_votes))
+
+            with conn.cursor() as cur:
+                _sync_sequence(cur, "users")
+                _sync_sequence(cur, "posts")
+            conn.commit()
+        finally:
+            # Also after a failed or interrupted load: the indexes are gone either way
+            if indexes:
+                timings["indexes"] = _restore_indexes(conn, indexes)
+
+        if not args.no_analyze:
+            conn.autocommit = True
+            analyze_started = time.perf_counter()
+            conn.execute("VACUUM ANALYZE users, posts, votes")
+            timings["analyze"] = time.perf_counter() - analyze_started
+
+    credentials = min(args.credentials, args.users)
+    if credentials:
+        _write_credentials(Path(args.output), first_user, credentials, args)
+
+    rows = args.users + args.posts + total_votes
+    elapsed = time.perf_counter() - started
+    print(f"Loaded {rows:,} rows in {elapsed:.1f}s ({rows / elapsed:,.0f} rows/s); "
+          + ", ".join(f"{name} {seconds:.1f}s" for name, seconds in timings.items()))
+    if credentials:
+        print(f"Credentials for {credentials} users written to {args.output}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
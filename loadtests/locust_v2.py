@@ -1,10 +1,12 @@
+import bisect
+import itertools
 import json
 import os
 import random
 from collections import deque
 from pathlib import Path
 from threading import Lock
-from typing import Any, Deque, Dict, Optional
+from typing import Any, Callable, Deque, Dict, List, Optional
 from uuid import uuid4
 
 from locust import FastHttpUser, constant_pacing, events, task
@@ -17,6 +19,9 @@ DEFAULT_USERS_FILE = os.getenv(
 )
 
 
+SEARCH_TERMS = ("load", "test", "body", "locust", "post", "fastapi", "vote", "feed")
+
+
 @events.init_command_line_parser.add_listener
 def _(parser) -> None:
     parser.add_argument(
@@ -24,6 +29,113 @@ def _(parser) -> None:
         default=DEFAULT_USERS_FILE,
         help="Path to JSON credentials generated by scripts/seed_test_users.py",
     )
+    parser.add_argument(
+        "--workload",
+        choices=sorted(PROFILES),
+        default="mixed",
+        help="Workload profile (task mix); default: mixed",
+    )
+    parser.add_argument(
+        "--reservoir-size",
+        type=int,
+        default=1000,
+        help="Post ids remembered per simulated user (uniform reservoir sample)",
+    )
+    parser.add_argument(
+        "--hot-set-size",
+        type=int,
+        default=100,
+        help="Posts in the shared hot set targeted by the vote-storm profile",
+    )
+    parser.add_argument(
+        "--zipf-s",
+        type=float,
+        default=1.1,
+        help="Zipf exponent for picking hot posts (higher = more skewed)",
+    )
+
+
+class IdReservoir:
+    """Bounded uniform sample of the ids seen so far (Algorithm R).
+
+    `add` and `choice` are O(1), so memory and per-task cost stay flat no matter
+    how many ids a long run discovers.
+    """
+
+    def __init__(self, capacity: int, rng: random.Random) -> None:
+        self.capacity = capacity
+        self.items: List[int] = []
+        self._index: Dict[int, int] = {}
+        self._seen = 0
+        self._rng = rng
+
+    def add(self, item: int) -> None:
+        if item in self._index:
+            return
+        self._seen += 1
+        if len(self.items) < self.capacity:
+            self._index[item] = len(self.items)
+            self.items.append(item)
+            return
+        slot = self._rng.randrange(self._seen)
+        if slot < self.capacity:
+            del self._index[self.items[slot]]
+            self.items[slot] = item
+            self._index[item] = slot
+
+    def discard(self, item: int) -> None:
+        slot = self._index.pop(item, None)
+        if slot is None:
+            return
+        last = self.items.pop()
+        if slot < len(self.items):
+            self.items[slot] = last
+            self._index[last] = slot
+
+    def choice(self) -> Optional[int]:
+        return self._rng.choice(self.items) if self.items else None
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+
+class HotSet:
+    """Shared set of the first N post ids seen, drawn by Zipf rank.
+
+    Rank 1 is the hottest post; picking a rank is a bisect over precomputed
+    cumulative weights.
+    """
+
+    def __init__(self, size: int, s: float) -> None:
+        self.size = size
+        self.ids: List[int] = []
+        self._members = set()
+        self._lock = Lock()
+        self._cumulative = list(itertools.accumulate(1 / rank ** s for rank in range(1, size + 1)))
+
+    def offer(self, post_id: int) -> None:
+        if len(self.ids) >= self.size or post_id in self._members:
+            return
+        with self._lock:
+            if len(self.ids) < self.size and post_id not in self._members:
+                self._members.add(post_id)
+                self.ids.append(post_id)
+
+    def choice(self, rng: random.Random) -> Optional[int]:
+        filled = len(self.ids)
+        if not filled:
+            return None
+        total = self._cumulative[filled - 1]
+        return self.ids[bisect.bisect_left(self._cumulative, rng.random() * total, 0, filled - 1)]
+
+
+def _ensure_hot_set(environment) -> HotSet:
+    hot_set = getattr(environment, "hot_set", None)
+    if hot_set is None:
+        options = environment.parsed_options
+        hot_set = HotSet(getattr(options, "hot_set_size", 100), getattr(options, "zipf_s", 1.1))
+        environment.hot_set = hot_set
+    return hot_set
 
 
 @events.test_start.add_listener
@@ -53,12 +165,19 @@ def _ensure_store(environment) -> tuple[Deque[Dict[str, Any]], Lock]:
 
 
 class V2ApiUser(FastHttpUser):
-    """Exercise authentication, post, and vote flows for the v2 API."""
+    """Exercise authentication, post, and vote flows for the v2 API.
+
+    The task mix comes from the selected --workload (see PROFILES).
+    """
 
     wait_time = constant_pacing(0.1)
 
     def on_start(self) -> None:
-        self.known_post_ids: set[int] = set()
+        options = self.environment.parsed_options
+        capacity = getattr(options, "reservoir_size", 1000)
+        self.known_post_ids = IdReservoir(capacity, random.Random())
+        self.own_post_ids = IdReservoir(capacity, random.Random())
+        self.feed_cursor: Optional[str] = None
         self.auth_headers: Dict[str, str] = {}
         credential = self._acquire_credential()
         if credential is None:
@@ -111,6 +230,22 @@ class V2ApiUser(FastHttpUser):
             self.auth_headers = {"Authorization": f"Bearer {token}"}
             response.success()
 
+    def _remember(self, post_id: int, own: bool = False) -> None:
+        self.known_post_ids.add(post_id)
+        _ensure_hot_set(self.environment).offer(post_id)
+        if own:
+            self.own_post_ids.add(post_id)
+
+    def _forget(self, post_id: int) -> None:
+        self.known_post_ids.discard(post_id)
+        self.own_post_ids.discard(post_id)
+
+    def _remember_page(self, response) -> None:
+        for item in response.json():
+            post = item.get("post")
+            if post and "id" in post:
+                self._remember(post["id"])
+
     def _create_post(self, seed: bool = False) -> None:
         payload = {
             "title": f"Locust post {uuid4().hex}",
@@ -125,15 +260,35 @@ class V2ApiUser(FastHttpUser):
             catch_response=True,
         ) as response:
             if response.status_code == 201:
-                post_id = response.json()["id"]
-                self.known_post_ids.add(post_id)
+                self._remember(response.json()["id"], own=True)
                 response.success()
             else:
                 response.failure(f"Post creation failed: {response.status_code} {response.text}")
                 if seed:
                     raise StopUser()
 
-    @task(3)
+    def _vote(self, post_id: int) -> None:
+        direction = random.choice([0, 1])
+        with self.client.post(
+            "/v2/vote/",
+            headers=self.auth_headers,
+            json={"post_id": post_id, "dir": direction},
+            name="POST /v2/vote",
+            catch_response=True,
+        ) as response:
+            if response.status_code == 201:
+                response.success()
+            elif direction == 0 and response.status_code == 404:
+                response.success()
+            elif direction == 1 and response.status_code == 409:
+                response.success()
+            else:
+                response.failure(
+                    f"Vote failed: dir={direction} status={response.status_code} body={response.text}"
+                )
+
+    # Tasks; PROFILES decides which run and how often
+
     def list_posts(self) -> None:
         with self.client.get(
             "/v2/posts/",
@@ -142,38 +297,176 @@ class V2ApiUser(FastHttpUser):
             catch_response=True,
         ) as response:
             if response.status_code == 200:
-                for item in response.json():
-                    post = item.get("post")
-                    if post and "id" in post:
-                        self.known_post_ids.add(post["id"])
+                self._remember_page(response)
                 response.success()
             else:
                 response.failure(f"List posts failed: {response.status_code} {response.text}")
 
-    @task(2)
+    def browse_feed(self) -> None:
+        """Walk the cursor-paginated feed, starting over after the last page."""
+        params = {"pagination": "cursor", "limit": 20}
+        if self.feed_cursor:
+            params["cursor"] = self.feed_cursor
+        with self.client.get(
+            "/v2/posts/",
+            headers=self.auth_headers,
+            params=params,
+            name="GET /v2/posts?pagination=cursor",
+            catch_response=True,
+        ) as response:
+            if response.status_code == 200:
+                self._remember_page(response)
+                self.feed_cursor = response.headers.get("X-Next-Cursor")
+                response.success()
+            else:
+                self.feed_cursor = None
+                response.failure(f"Feed page failed: {response.status_code} {response.text}")
+
+    def read_post(self) -> None:
+        post_id = self.known_post_ids.choice()
+        if post_id is None:
+            return
+        with self.client.get(
+            f"/v2/posts/{post_id}",
+            headers=self.auth_headers,
+            name="GET /v2/posts/{id}",
+            catch_response=True,
+        ) as response:
+            if response.status_code == 200:
+                response.success()
+            elif response.status_code == 404:
+                # Deleted by its owner since we saw it
+                self._forget(post_id)
+                response.success()
+            else:
+                response.failure(f"Read post failed: {response.status_code} {response.text}")
+
+    def search_posts(self) -> None:
+        mode = random.choice(["contains", "fulltext"])
+        with self.client.get(
+            "/v2/posts/",
+            headers=self.auth_headers,
+            params={"search": random.choice(SEARCH_TERMS), "search_mode": mode},
+            name=f"GET /v2/posts?search_mode={mode}",
+            catch_response=True,
+        ) as response:
+            if response.status_code == 200:
+                self._remember_page(response)
+                response.success()
+            else:
+                response.failure(f"Search failed: {response.status_code} {response.text}")
+
     def create_post_task(self) -> None:
         self._create_post()
 
-    @task(2)
-    def vote_task(self) -> None:
-        if not self.known_post_ids:
-            return
-        post_id = random.choice(tuple(self.known_post_ids))
-        direction = random.choice([0, 1])
+    def create_batch_task(self) -> None:
+        payload = [
+            {"title": f"Locust batch post {uuid4().hex}", "content": "Load test body", "published": True}
+            for _ in range(5)
+        ]
         with self.client.post(
-            "/v2/vote/",
+            "/v2/posts/batch",
             headers=self.auth_headers,
-            json={"post_id": post_id, "dir": direction},
-            name="POST /v2/vote",
+            json=payload,
+            name="POST /v2/posts/batch",
             catch_response=True,
         ) as response:
             if response.status_code == 201:
+                for post in response.json()["created"]:
+                    self._remember(post["id"], own=True)
                 response.success()
-            elif direction == 0 and response.status_code == 404:
+            else:
+                response.failure(f"Batch creation failed: {response.status_code} {response.text}")
+
+    def update_own_post(self) -> None:
+        post_id = self.own_post_ids.choice()
+        if post_id is None:
+            return
+        payload = {"title": f"Locust edit {uuid4().hex}", "content": "Edited load test body", "published": True}
+        with self.client.put(
+            f"/v2/posts/{post_id}",
+            headers=self.auth_headers,
+            json=payload,
+            name="PUT /v2/posts/{id}",
+            catch_response=True,
+        ) as response:
+            if response.status_code == 200:
                 response.success()
-            elif direction == 1 and response.status_code == 409:
+            else:
+                response.failure(f"Update failed: {response.status_code} {response.text}")
+
+    def delete_own_post(self) -> None:
+        # Keep one post around so updates always have a target
+        if len(self.own_post_ids) < 2:
+            return
+        post_id = self.own_post_ids.choice()
+        with self.client.delete(
+            f"/v2/posts/{post_id}",
+            headers=self.auth_headers,
+            name="DELETE /v2/posts/{id}",
+            catch_response=True,
+        ) as response:
+            if response.status_code in (204, 404):
+                self._forget(post_id)
                 response.success()
             else:
-                response.failure(
-                    f"Vote failed: dir={direction} status={response.status_code} body={response.text}"
-                )
+                response.failure(f"Delete failed: {response.status_code} {response.text}")
+
+    def vote_task(self) -> None:
+        post_id = self.known_post_ids.choice()
+        if post_id is not None:
+            self._vote(post_id)
+
+    def vote_hot_task(self) -> None:
+        post_id = _ensure_hot_set(self.environment).choice(random)
+        if post_id is not None:
+            self._vote(post_id)
+
+
+# Task weights per workload profile. "mixed" is the original fixed mix.
+PROFILES: Dict[str, Dict[Callable, int]] = {
+    "mixed": {
+        V2ApiUser.list_posts: 3,
+        V2ApiUser.create_post_task: 2,
+        V2ApiUser.vote_task: 2,
+    },
+    "read-heavy": {
+        V2ApiUser.browse_feed: 6,
+        V2ApiUser.read_post: 4,
+        V2ApiUser.list_posts: 2,
+        V2ApiUser.vote_task: 1,
+    },
+    # Most votes land on a few posts: contention on the same votes rows
+    "vote-storm": {
+        V2ApiUser.vote_hot_task: 8,
+        V2ApiUser.vote_task: 1,
+        V2ApiUser.list_posts: 1,
+    },
+    "search-heavy": {
+        V2ApiUser.search_posts: 6,
+        V2ApiUser.read_post: 2,
+        V2ApiUser.list_posts: 1,
+    },
+    "write-heavy": {
+        V2ApiUser.create_post_task: 4,
+        V2ApiUser.update_own_post: 2,
+        V2ApiUser.create_batch_task: 1,
+        V2ApiUser.delete_own_post: 1,
+        V2ApiUser.list_posts: 1,
+    },
+}
+
+
+def _apply_profile(name: str) -> None:
+    V2ApiUser.tasks = [fn for fn, weight in PROFILES[name].items() for _ in range(weight)]
+
+
+_apply_profile("mixed")
+
+
+@events.test_start.add_listener
+def _select_profile(environment, **_) -> None:
+    options = environment.parsed_options
+    _apply_profile(getattr(options, "workload", None) or "mixed")
+    environment.hot_set = None
+    _ensure_hot_set(environment)
@@ -19,23 +19,24 @@ from app.database import AsyncSessionLocal
 
 
 async def _create_users(count: int, password: str, email_prefix: str, domain: str) -> list[dict]:
-    created: list[dict] = []
+    # Every user shares the password, so hash it once (bcrypt is the slow part)
+    hashed = utils.hash(password)
+    users = [
+        models.User(email=f"{email_prefix}{uuid4().hex}@{domain}", password=hashed)
+        for _ in range(count)
+    ]
     async with AsyncSessionLocal() as session:
         async with session.begin():
-            for _ in range(count):
-                email = f"{email_prefix}{uuid4().hex}@{domain}"
-                hashed = utils.hash(password)
-                user = models.User(email=email, password=hashed)
-                session.add(user)
-                try:
-                    await session.flush()
-                except IntegrityError as exc:
-                    raise RuntimeError(
-                        "User creation failed due to duplicate email. "
-                        "Choose a different prefix or domain."
-                    ) from exc
-                created.append({"id": user.id, "email": email, "password": password})
-    return created
+            session.add_all(users)
+            try:
+                # One flush: the ORM batches the INSERTs and returns the ids
+                await session.flush()
+            except IntegrityError as exc:
+                raise RuntimeError(
+                    "User creation failed due to duplicate email. "
+                    "Choose a different prefix or domain."
+                ) from exc
+            return [{"id": user.id, "email": user.email, "password": password} for user in users]
 
 
 def _write_output(path: Path | None, data: list[dict], password: str) -> None:
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+"""Find and repair drift between posts.vote_count and the votes table."""
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from app.database import AsyncSessionLocal
+from app.vote_counts import find_vote_count_drift, repair_vote_count_drift
+
+
+async def _reconcile(repair: bool, show: int) -> int:
+    async with AsyncSessionLocal() as session:
+        drift = await find_vote_count_drift(session)
+        for entry in drift[:show]:
+            print(f"  post {entry['post_id']}: stored={entry['stored']} actual={entry['actual']}")
+        if len(drift) > show:
+            print(f"  ... and {len(drift) - show} more")
+        print(f"Found {len(drift)} posts with drifted vote_count.")
+
+        if repair and drift:
+            repaired = await repair_vote_count_drift(session)
+            await session.commit()
+            print(f"Repaired {len(repaired)} posts.")
+    return len(drift)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Reconcile posts.vote_count with COUNT(votes).")
+    parser.add_argument(
+        "--repair",
+        action="store_true",
+        help="Rewrite drifted counters (default: report only)",
+    )
+    parser.add_argument("--show", type=int, default=20, help="Number of drifted posts to list (default: 20)")
+    parser.add_argument(
+        "--fail-on-drift",
+        action="store_true",
+        help="Exit with status 1 when drift is found (useful for cron alerts)",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    drifted = asyncio.run(_reconcile(args.repair, args.show))
+    if drifted and args.fail_on_drift:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
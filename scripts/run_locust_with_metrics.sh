@@ -12,6 +12,8 @@ SAMPLE_INTERVAL=${SAMPLE_INTERVAL:-2}
 PYTHON_BIN=${PYTHON_BIN:-python}
 SEED_COUNT=${SEED_COUNT:-$USERS}
 SEED_PASSWORD=${SEED_PASSWORD:-LoadTest!234}
+WORKLOAD=${WORKLOAD:-mixed}
+BASELINE=${BASELINE:-}
 
 if ! LOCUST_DIR=$(cd "$(dirname "${LOCUST_FILE}")" 2>/dev/null && pwd); then
   echo "Unable to resolve directory for LOCUST_FILE=${LOCUST_FILE}" >&2
@@ -36,7 +38,7 @@ else
   echo "Warning: seed script $SEED_SCRIPT not found; skipping user creation" >&2
 fi
 
-run_id=$(date +%Y%m%d_%H%M%S)
+run_id=$(date +%Y%m%d_%H%M%S)_${WORKLOAD}
 locust_log="$LOG_DIR/locust_${run_id}.log"
 csv_prefix="$LOG_DIR/locust_${run_id}"
 system_log="$LOG_DIR/system_${run_id}.log"
@@ -89,7 +91,8 @@ locust -f "$LOCUST_FILE" \
   --loglevel INFO \
   --csv "$csv_prefix" \
   --csv-full-history \
-  --users-file "$USERS_FILE"
+  --users-file "$USERS_FILE" \
+  --workload "$WORKLOAD"
 
 echo "Locust log: $locust_log"
 echo "Locust CSV prefix: ${csv_prefix}_*.csv"
@@ -100,3 +103,7 @@ fi
 if [[ -f "$svc_log" ]]; then
   echo "Service log: $svc_log"
 fi
+
+if [[ -n "$BASELINE" ]]; then
+  "$PYTHON_BIN" "${LOCUST_DIR}/compare_runs.py" "$csv_prefix" --baseline "$BASELINE" || true
+fi
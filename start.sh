@@ -22,4 +22,4 @@ until alembic -c alembic.ini upgrade head; do
 done
 
 echo "[start] migrations applied. Launching app..."
-exec uvicorn app.main:app --host 0.0.0.0 --port "${PORT:-8000}"
+exec python -m app.serve --bind "0.0.0.0:${PORT:-8000}"
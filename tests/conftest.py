@@ -15,33 +15,28 @@ import pytest
 from fastapi.testclient import TestClient
 
 from app.main import app
-from app.database import Base, engine, SessionLocal, get_db
+from app.database import Base, async_engine
+from app.oauth2 import clear_principal_cache
+from app.response_cache import response_cache
 
 
-@pytest.fixture()
-def session() -> Generator:
+async def _reset_database():
     # WARNING: This drops and recreates all tables in the configured database.
     # Ensure your env points to a dedicated TEST database before running.
-    Base.metadata.drop_all(bind=engine)
-    Base.metadata.create_all(bind=engine)
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    # ids restart with every fresh schema, so cached principals/responses would go stale
+    clear_principal_cache()
+    await response_cache.clear()
 
 
 @pytest.fixture()
-def client(session) -> Generator[TestClient, None, None]:
-    def override_get_db():
-        try:
-            yield session
-        finally:
-            pass
-
-    # Override the app dependency to use the PostgreSQL-backed test session
-    app.dependency_overrides[get_db] = override_get_db
+def client() -> Generator[TestClient, None, None]:
+    # asyncpg connections belong to the event loop that opened them, so the
+    # setup runs on the client's loop; the lifespan empties the pool on exit
     with TestClient(app) as c:
+        c.portal.call(_reset_database)
         yield c
 
 
@@ -107,4 +107,40 @@ def test_delete_post_forbidden(client, authorized_client, test_user2):
     res = client.delete(
         f"/v1/posts/{post.id}", headers={"Authorization": f"Bearer {token2}"}
     )
-    assert res.status_code == status.HTTP_403_FORBIDDEN
\ No newline at end of file
+    assert res.status_code == status.HTTP_403_FORBIDDEN
+
+def test_get_posts_cursor_pagination(authorized_client, test_posts):
+    first = authorized_client.get("/v1/posts/", params={"pagination": "cursor", "limit": 1})
+    assert first.status_code == status.HTTP_200_OK
+    assert len(first.json()) == 1
+    cursor = first.headers["X-Next-Cursor"]
+
+    second = authorized_client.get("/v1/posts/", params={"cursor": cursor, "limit": 1})
+    assert second.status_code == status.HTTP_200_OK
+    assert len(second.json()) == 1
+    assert "X-Next-Cursor" not in second.headers
+    assert second.json()[0]["post"]["id"] != first.json()[0]["post"]["id"]
+
+    res = authorized_client.get("/v1/posts/", params={"pagination": "cursor", "limit": 0})
+    assert res.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_get_posts_offset_pages_newest_first(authorized_client, test_posts):
+    res = authorized_client.get("/v1/posts/", params={"limit": 1, "skip": 1})
+    assert res.status_code == status.HTTP_200_OK
+    assert [item["post"]["id"] for item in res.json()] == [test_posts[0]["id"]]
+
+
+def test_get_posts_page_bounds(authorized_client):
+    for params in ({"limit": 101}, {"limit": 0}, {"skip": -1}):
+        res = authorized_client.get("/v1/posts/", params=params)
+        assert res.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert authorized_client.get("/v1/posts/", params={"limit": 100}).status_code == status.HTTP_200_OK
+
+
+def test_update_post_reports_db_queries(authorized_client, test_posts):
+    res = authorized_client.put(f"/v1/posts/{test_posts[0]['id']}", json={"title": "t", "content": "c"})
+    assert res.status_code == status.HTTP_200_OK
+    # post lookup, the UPDATE and the refreshes of the post and its owner
+    assert int(res.headers["X-DB-Queries"]) >= 4
+    assert res.headers["Server-Timing"].startswith("db;dur=")
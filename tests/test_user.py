@@ -13,4 +13,11 @@ def test_get_user_success(authorized_client, test_user):
 
 def test_get_user_not_found(client):
     res = client.get("/v1/users/999999")
-    assert res.status_code == status.HTTP_404_NOT_FOUND
\ No newline at end of file
+    assert res.status_code == status.HTTP_404_NOT_FOUND
+
+def test_create_user_duplicate_email_conflict(client, test_user):
+    # Used to surface as a 500 from the unique constraint
+    payload = {"email": test_user["user"]["email"], "password": "other"}
+    res = client.post("/v1/users/", json=payload)
+    assert res.status_code == status.HTTP_409_CONFLICT
+    assert res.json()["detail"] == "User with this email already exists."
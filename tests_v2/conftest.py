@@ -13,9 +13,12 @@ if str(ROOT_DIR) not in sys.path:
 
 os.environ["DATABASE_HOSTNAME"] = "127.0.0.1"
 
+from app.config import settings
 from app.main import app
 from app.database import Base, AsyncSessionLocal, async_engine
 from app.models import User
+from app.oauth2 import clear_principal_cache
+from app.response_cache import response_cache
 from app.utils import hash as hash_password
 
 
@@ -32,6 +35,9 @@ async def db_setup():
     async with async_engine.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)
         await conn.run_sync(Base.metadata.create_all)
+    # ids restart with every fresh schema, so cached principals/responses would go stale
+    clear_principal_cache()
+    await response_cache.clear()
     yield
 
 
@@ -42,6 +48,12 @@ async def async_client():
         yield client
 
 
+@pytest.fixture()
+def internal_headers(monkeypatch) -> dict:
+    monkeypatch.setattr(settings, "internal_token", "s3cret")
+    return {"X-Internal-Token": "s3cret"}
+
+
 @pytest_asyncio.fixture()
 async def test_user():
     user_data = {"email": "user1@example.com", "password": "secret"}
@@ -1,7 +1,15 @@
 
+import asyncio
+import time
+
 import pytest
-from fastapi import status
+from fastapi import HTTPException, status
+from jose import jwt
+from app.config import settings
+from app.oauth2 import (create_access_token, invalidate_principal, principal_cache,
+                        token_cache, verify_access_token)
 from app.schemas import Token
+from app.utils import PasswordHasher
 
 pytestmark = pytest.mark.asyncio
 
@@ -25,3 +33,57 @@ async def test_login_nonexistent_user(async_client):
     form = {"username": "nouser@example.com", "password": "secret"}
     res = await async_client.post("/v2/auth/login", data=form)
     assert res.status_code == status.HTTP_403_FORBIDDEN
+
+async def test_password_hasher_roundtrip():
+    hasher = PasswordHasher(executor="thread", max_workers=2, max_concurrency=1)
+    try:
+        hashed = await hasher.hash("secret")
+        results = await asyncio.gather(hasher.verify("secret", hashed), hasher.verify("wrong", hashed))
+        assert results == [True, False]
+        stats = hasher.stats()
+        assert stats["completed"] == 3
+        assert stats["in_flight"] == 0 and stats["queue_depth"] == 0
+        assert stats["peak_queue_depth"] >= 1
+    finally:
+        hasher.shutdown()
+
+async def test_principal_cache_skips_user_lookup(authorized_async_client, test_user):
+    user_id = test_user["user"]["id"]
+    res = await authorized_async_client.get("/v2/posts/")
+    assert res.status_code == status.HTTP_200_OK
+    hits = principal_cache.stats()["hits"]
+    res = await authorized_async_client.get("/v2/posts/")
+    assert res.status_code == status.HTTP_200_OK
+    assert principal_cache.stats()["hits"] == hits + 1
+
+    invalidate_principal(user_id)
+    assert principal_cache.get(user_id) is None
+
+async def test_principal_cache_lightweight_mode(authorized_async_client, test_user, monkeypatch):
+    monkeypatch.setattr(settings, "principal_cache_lightweight", True)
+    payload = {"title": "t", "content": "c", "published": True}
+    for _ in range(2):
+        res = await authorized_async_client.post("/v2/posts/", json=payload)
+        assert res.status_code == status.HTTP_201_CREATED
+        assert res.json()["owner"]["email"] == test_user["user"]["email"]
+
+async def test_token_cache_reuses_verified_claims(monkeypatch):
+    token = create_access_token({"user_id": 42})
+    first = verify_access_token(token)
+    hits = token_cache.stats()["hits"]
+    assert verify_access_token(token) is first
+    assert token_cache.stats()["hits"] == hits + 1
+
+    # Once the clock passes exp the cached claims must not be served again
+    exp = jwt.get_unverified_claims(token)["exp"]
+    monkeypatch.setattr(token_cache, "clock", lambda: exp)
+    expirations = token_cache.stats()["expirations"]
+    verify_access_token(token)
+    assert token_cache.stats()["expirations"] == expirations + 1
+
+async def test_expired_token_rejected():
+    expired = jwt.encode({"user_id": 1, "exp": int(time.time()) - 5}, settings.secret_key,
+                         algorithm=settings.algorithm)
+    with pytest.raises(HTTPException) as exc_info:
+        verify_access_token(expired)
+    assert exc_info.value.status_code == status.HTTP_401_UNAUTHORIZED
@@ -0,0 +1,53 @@
+import pytest
+from sqlalchemy import exc, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.database import ASYNC_SQLALCHEMY_DATABASE_URL
+from app.pool_metrics import instrumented_pool_class, plan_pool_sizes, pool_stats
+
+
+def test_plan_pool_sizes_fits_budget():
+    pools = {"async": (20, 40), "sync": (5, 10)}
+    planned = plan_pool_sizes(pools, max_connections=100, reserved=10, workers=4)
+    assert sum(size + overflow for size, overflow in planned.values()) <= 90 // 4
+    assert planned["async"][0] >= 1 and planned["sync"][0] >= 1
+    # A budget larger than the settings leaves them untouched
+    assert plan_pool_sizes(pools, max_connections=1000, reserved=10, workers=1) == pools
+
+
+@pytest.mark.asyncio
+async def test_pool_metrics_record_checkouts_and_timeouts():
+    engine = create_async_engine(
+        ASYNC_SQLALCHEMY_DATABASE_URL,
+        poolclass=instrumented_pool_class(AsyncAdaptedQueuePool, "test"),
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.1,
+    )
+    try:
+        async with engine.connect() as held:
+            await held.execute(text("SELECT 1"))
+            assert pool_stats(engine)["checked_out"] == 1
+            with pytest.raises(exc.TimeoutError):
+                async with engine.connect():
+                    pass
+        # dispose() swaps in a new pool instance; the counters carry over
+        await engine.dispose()
+        stats = pool_stats(engine)
+        assert stats["checkouts"] == 1
+        assert stats["timeouts"] == 1
+        assert stats["peak_checked_out"] == 1
+        assert stats["checked_out"] == 0
+        assert stats["wait_ms_max"] >= 100
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_internal_stats_include_pools(async_client, internal_headers):
+    res = await async_client.get("/internal/stats", headers=internal_headers)
+    assert res.status_code == 200
+    pools = res.json()["db_pools"]
+    assert pools["primary"]["checkouts"] > 0
+    assert pools["replica"] is None
@@ -0,0 +1,69 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+from app import metrics
+from app.config import settings
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture(autouse=True)
+def fresh_registry():
+    metrics.registry.reset()
+    yield
+    metrics.registry.reset()
+
+
+async def test_metrics_by_route_template(authorized_async_client, test_posts, internal_headers):
+    await authorized_async_client.get("/v2/posts/")
+    await authorized_async_client.get(f"/v2/posts/{test_posts[0]['id']}")
+    await authorized_async_client.get("/v2/posts/999999")
+    await authorized_async_client.get("/no/such/path")
+
+    res = await authorized_async_client.get("/metrics", headers=internal_headers)
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = res.text
+    assert 'http_requests_total{method="GET",route="/v2/posts/{id}",status="200"} 1' in body
+    assert 'http_requests_total{method="GET",route="/v2/posts/{id}",status="404"} 1' in body
+    assert 'http_requests_total{method="GET",route="<unmatched>",status="404"} 1' in body
+    assert 'http_request_duration_seconds_count{method="GET",route="/v2/posts/{id}"} 2' in body
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/v2/posts/",le="+Inf"} 1' in body
+    assert 'http_response_size_bytes_count{method="GET",route="/v2/posts/"} 1' in body
+    # the scrape itself is in flight while it renders
+    assert "http_requests_in_flight 1" in body
+
+
+async def test_metrics_multiprocess_aggregation(async_client, tmp_path, monkeypatch, internal_headers):
+    monkeypatch.setattr(settings, "metrics_multiproc_dir", str(tmp_path))
+    exited = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"],
+                            capture_output=True, text=True, check=True)
+    dead_pid = int(exited.stdout)
+
+    other = metrics.MetricsRegistry()
+    for _ in range(5):
+        other.observe("GET", "/v2/posts/", 200, 0.02, 512)
+    other.in_flight = 3
+    (tmp_path / f"metrics-{dead_pid}.json").write_text(json.dumps(other.to_dict()))
+
+    await async_client.get("/")
+    metrics.write_snapshot(str(tmp_path))  # stale copy of our own numbers is ignored
+    res = await async_client.get("/metrics", headers=internal_headers)
+    body = res.text
+    assert 'http_requests_total{method="GET",route="/v2/posts/",status="200"} 5' in body
+    assert 'http_requests_total{method="GET",route="/",status="200"} 1' in body
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/v2/posts/",le="0.025"} 5' in body
+    assert "http_requests_in_flight 1" in body
+
+
+async def test_metrics_require_internal_token(async_client, monkeypatch):
+    monkeypatch.setattr(settings, "internal_token", None)
+    assert (await async_client.get("/metrics")).status_code == 403
+
+    monkeypatch.setattr(settings, "internal_token", "s3cret")
+    assert (await async_client.get("/metrics")).status_code == 403
+    res = await async_client.get("/metrics", headers={"X-Internal-Token": "s3cret"})
+    assert res.status_code == 200
@@ -1,6 +1,16 @@
 import pytest
 from fastapi import status
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from sqlalchemy import event, select
+from sqlalchemy.orm import selectinload
+
+from app import models
+from app.config import settings
+from app.database import AsyncSessionLocal, async_engine
+from app.response_cache import response_cache
 from app.schemas import PostCreate, Post, PostWithVotes
+from app.top_posts import top_posts_ranking
 
 pytestmark = pytest.mark.asyncio
 
@@ -84,4 +94,189 @@ async def test_delete_post_forbidden(async_client, test_user2, test_posts):
     res = await async_client.delete(
         f"/v2/posts/{post_to_delete['id']}", headers={"Authorization": f"Bearer {token2}"}
     )
-    assert res.status_code == status.HTTP_403_FORBIDDEN
\ No newline at end of file
+    assert res.status_code == status.HTTP_403_FORBIDDEN
+
+async def test_get_posts_cursor_pagination(authorized_async_client, test_posts):
+    extra = [{"title": f"Extra {i}", "content": "c", "published": True} for i in range(3)]
+    for payload in extra:
+        res = await authorized_async_client.post("/v2/posts/", json=payload)
+        assert res.status_code == status.HTTP_201_CREATED
+
+    seen = []
+    params = {"pagination": "cursor", "limit": 2}
+    while True:
+        res = await authorized_async_client.get("/v2/posts/", params=params)
+        assert res.status_code == status.HTTP_200_OK
+        seen.extend(item["post"]["id"] for item in res.json())
+        next_cursor = res.headers.get("X-Next-Cursor")
+        if next_cursor is None:
+            break
+        params = {"cursor": next_cursor, "limit": 2}
+
+    # 5 published posts, newest first, no duplicates or gaps
+    assert len(seen) == 5
+    assert seen == sorted(seen, reverse=True)
+
+async def test_get_posts_rejects_out_of_range_limit(authorized_async_client):
+    for params in ({"limit": 0, "pagination": "cursor"}, {"limit": -1}, {"limit": 101}, {"skip": -1}):
+        res = await authorized_async_client.get("/v2/posts/", params=params)
+        assert res.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY, params
+
+async def test_get_posts_invalid_cursor(authorized_async_client):
+    res = await authorized_async_client.get("/v2/posts/", params={"cursor": "not-a-cursor"})
+    assert res.status_code == status.HTTP_400_BAD_REQUEST
+
+async def test_get_posts_fulltext_search_ranked(authorized_async_client, test_user):
+    payloads = [
+        {"title": "Gardening notes", "content": "tomatoes and basil", "published": True},
+        {"title": "Tomatoes", "content": "growing tomatoes, more tomatoes", "published": True},
+        {"title": "Unrelated", "content": "nothing here", "published": True},
+    ]
+    for payload in payloads:
+        res = await authorized_async_client.post("/v2/posts/", json=payload)
+        assert res.status_code == status.HTTP_201_CREATED
+
+    res = await authorized_async_client.get(
+        "/v2/posts/", params={"search": "tomato", "search_mode": "fulltext"}
+    )
+    assert res.status_code == status.HTTP_200_OK
+    titles = [item["post"]["title"] for item in res.json()]
+    assert titles == ["Tomatoes", "Gardening notes"]
+
+async def test_get_posts_empty_search_returns_all(authorized_async_client, test_posts):
+    res = await authorized_async_client.get("/v2/posts/", params={"search": ""})
+    assert res.status_code == status.HTTP_200_OK
+    assert len(res.json()) == 2
+
+async def test_trusted_serialization_matches_validated_output(authorized_async_client, test_user):
+    payload = {"title": "Ünïcode   \"quoted\" </script>", "content": "emoji \U0001F600", "published": True}
+    res = await authorized_async_client.post("/v2/posts/", json=payload)
+    assert res.status_code == status.HTTP_201_CREATED
+    post_id = res.json()["id"]
+
+    async with AsyncSessionLocal() as session:
+        post = (await session.execute(
+            select(models.Post).options(selectinload(models.Post.owner)).where(models.Post.id == post_id)
+        )).scalar_one()
+        # What FastAPI's response_model path would render for the same rows
+        adapter = TypeAdapter(PostWithVotes)
+        validated = adapter.validate_python({"post": post, "votes": post.vote_count}, from_attributes=True)
+        expected_detail = JSONResponse(adapter.dump_python(validated, mode="json")).body
+        expected_page = JSONResponse([adapter.dump_python(validated, mode="json")]).body
+
+    detail = await authorized_async_client.get(f"/v2/posts/{post_id}")
+    assert detail.content == expected_detail
+    page = await authorized_async_client.get("/v2/posts/")
+    assert page.content == expected_page
+
+async def test_get_posts_batch(authorized_async_client, test_posts):
+    ids = [test_posts[1]["id"], 999999, test_posts[0]["id"], test_posts[1]["id"]]
+    res = await authorized_async_client.get("/v2/posts/batch", params={"ids": ids})
+    assert res.status_code == status.HTTP_200_OK
+    data = [PostWithVotes.model_validate(item) for item in res.json()]
+    assert [item.post.id for item in data] == [test_posts[1]["id"], test_posts[0]["id"]]
+
+async def test_get_posts_batch_over_cap(authorized_async_client, monkeypatch):
+    monkeypatch.setattr(settings, "post_batch_max_items", 2)
+    res = await authorized_async_client.get("/v2/posts/batch", params={"ids": [1, 2, 3]})
+    assert res.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+
+async def test_create_posts_batch_with_item_errors(authorized_async_client, test_user):
+    items = [
+        {"title": "a", "content": "x"},
+        {"title": "missing content"},
+        {"title": "b", "content": "y", "published": False},
+    ]
+    res = await authorized_async_client.post("/v2/posts/batch", json=items)
+    assert res.status_code == status.HTTP_201_CREATED
+    body = res.json()
+    created = [Post.model_validate(item) for item in body["created"]]
+    assert [post.title for post in created] == ["a", "b"]
+    assert all(post.owner.id == test_user["user"]["id"] for post in created)
+    assert [error["index"] for error in body["errors"]] == [1]
+
+async def test_create_posts_batch_limits(authorized_async_client, monkeypatch):
+    res = await authorized_async_client.post("/v2/posts/batch", json=[{"title": "only"}])
+    assert res.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    monkeypatch.setattr(settings, "post_batch_max_items", 1)
+    items = [{"title": "a", "content": "x"}, {"title": "b", "content": "y"}]
+    res = await authorized_async_client.post("/v2/posts/batch", json=items)
+    assert res.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+
+async def test_feed_query_modes_render_the_same_page(authorized_async_client, test_posts, monkeypatch):
+    await authorized_async_client.get(f"/v2/posts/{test_posts[0]['id']}")  # warm the auth caches
+    statements = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    pages = {}
+    event.listen(async_engine.sync_engine, "before_cursor_execute", _record)
+    try:
+        for mode in ("orm", "inline"):
+            monkeypatch.setattr(settings, "feed_query_mode", mode)
+            await response_cache.clear()
+            statements.clear()
+            res = await authorized_async_client.get("/v2/posts/", params={"pagination": "cursor", "limit": 1})
+            assert res.status_code == status.HTTP_200_OK
+            pages[mode] = (res.content, res.headers.get("X-Next-Cursor"), len(statements))
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", _record)
+
+    assert pages["inline"][:2] == pages["orm"][:2]
+    assert pages["orm"][2] == 2
+    assert pages["inline"][2] == 1
+
+async def test_top_posts_ranked_by_votes_and_paginated(authorized_async_client, test_posts):
+    first, second, hidden = test_posts
+    for post in (second, hidden):
+        res = await authorized_async_client.post("/v2/vote/", json={"post_id": post["id"], "dir": 1})
+        assert res.status_code == status.HTTP_201_CREATED
+
+    # The snapshot taken at the schema reset predates the posts
+    await top_posts_ranking.refresh()
+    res = await authorized_async_client.get("/v2/posts/top")
+    assert res.status_code == status.HTTP_200_OK
+    assert res.headers["X-Ranking-Refreshed-At"]
+    ranked = [PostWithVotes.model_validate(item) for item in res.json()]
+    assert [(item.post.id, item.votes) for item in ranked] == [(second["id"], 1), (first["id"], 0)]
+
+    res = await authorized_async_client.get("/v2/posts/top", params={"limit": 1, "skip": 1})
+    assert [item["post"]["id"] for item in res.json()] == [first["id"]]
+
+async def test_top_posts_snapshot_refreshed_past_staleness_bound(authorized_async_client, test_posts, monkeypatch):
+    first, second, _ = test_posts
+    await authorized_async_client.post("/v2/vote/", json={"post_id": second["id"], "dir": 1})
+    await top_posts_ranking.refresh()
+    res = await authorized_async_client.get("/v2/posts/top")
+    assert [item["post"]["id"] for item in res.json()] == [second["id"], first["id"]]
+    refreshed_at = res.headers["X-Ranking-Refreshed-At"]
+
+    # Within the bound the order is the snapshot's; totals are live
+    await authorized_async_client.post("/v2/vote/", json={"post_id": second["id"], "dir": 0})
+    await authorized_async_client.post("/v2/vote/", json={"post_id": first["id"], "dir": 1})
+    res = await authorized_async_client.get("/v2/posts/top")
+    assert [item["post"]["id"] for item in res.json()] == [second["id"], first["id"]]
+    assert res.headers["X-Ranking-Refreshed-At"] == refreshed_at
+
+    monkeypatch.setattr(top_posts_ranking, "max_staleness", 0.0)
+    res = await authorized_async_client.get("/v2/posts/top")
+    assert [item["post"]["id"] for item in res.json()] == [first["id"], second["id"]]
+    assert res.headers["X-Ranking-Refreshed-At"] > refreshed_at
+
+async def test_top_posts_empty_ranking_counts_as_fresh(authorized_async_client):
+    refreshes = top_posts_ranking.refreshes
+    for _ in range(3):
+        res = await authorized_async_client.get("/v2/posts/top")
+        assert res.status_code == status.HTTP_200_OK
+        assert res.json() == []
+        assert res.headers["X-Ranking-Refreshed-At"]
+    assert top_posts_ranking.refreshes == refreshes
+
+async def test_top_posts_rejects_out_of_range_paging(authorized_async_client):
+    res = await authorized_async_client.get("/v2/posts/top", params={"skip": models.TOP_POSTS_SIZE})
+    assert res.status_code == status.HTTP_400_BAD_REQUEST
+    for params in ({"limit": 0}, {"limit": 101}, {"skip": -1}):
+        res = await authorized_async_client.get("/v2/posts/top", params=params)
+        assert res.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY, params
@@ -0,0 +1,58 @@
+import httpx
+import pytest
+import pytest_asyncio
+
+from app.config import settings
+from app.main import app
+from app.profiler import CATEGORIES, ProfilerMiddleware, profile_store
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest_asyncio.fixture()
+async def profiled(monkeypatch, token):
+    monkeypatch.setattr(settings, "internal_token", "s3cret")
+    monkeypatch.setattr(settings, "profiler_interval_ms", 0.2)
+    transport = httpx.ASGITransport(app=ProfilerMiddleware(app))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test",
+                                 headers={"Authorization": f"Bearer {token}"}) as client:
+        yield client
+
+
+async def test_profiled_request_stores_folded_stacks(profiled, test_posts):
+    res = await profiled.get("/v2/posts/", headers={"X-Profile": "1", "X-Internal-Token": "s3cret"})
+    assert res.status_code == 200
+    assert res.headers["X-Profile-Summary"].startswith("auth=")
+
+    profile = profile_store.get(res.headers["X-Profile-Id"])
+    assert profile is not None and profile.stacks
+    lines = profile.folded().splitlines()
+    for line in lines:
+        stack, count = line.rsplit(" ", 1)
+        assert stack.split(";", 1)[0] in CATEGORIES
+        assert int(count) > 0
+    # The handler and the DB round trip are both visible in the samples
+    assert any("get_posts (app/v2/routers/post.py" in line for line in lines)
+    assert profile.to_dict()["categories_ms"]["db"] > 0
+
+
+async def test_profiles_served_from_internal_endpoint(profiled):
+    res = await profiled.get("/v2/posts/", headers={"X-Profile": "1", "X-Internal-Token": "s3cret"})
+    profile_id = res.headers["X-Profile-Id"]
+    internal = {"X-Internal-Token": "s3cret"}
+
+    summary = await profiled.get(f"/internal/profiles/{profile_id}", headers=internal)
+    assert summary.status_code == 200
+    assert summary.json()["path"] == "/v2/posts/"
+    assert summary.json()["samples"] > 0
+    folded = await profiled.get(f"/internal/profiles/{profile_id}/folded", headers=internal)
+    assert folded.text == profile_store.get(profile_id).folded()
+    missing = await profiled.get("/internal/profiles/nope", headers=internal)
+    assert missing.status_code == 404
+
+
+async def test_profiling_requires_valid_token(profiled):
+    for headers in ({"X-Profile": "1"}, {"X-Profile": "1", "X-Internal-Token": "wrong"}):
+        res = await profiled.get("/v2/posts/", headers=headers)
+        assert res.status_code == 200
+        assert "X-Profile-Id" not in res.headers
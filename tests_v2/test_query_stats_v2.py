@@ -0,0 +1,50 @@
+import json
+import logging
+
+import pytest
+from sqlalchemy import event
+
+from app.config import settings
+from app.database import async_engine
+from app.query_stats import fingerprint, normalize_statement
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_db_query_headers_match_statements(authorized_async_client, test_posts):
+    post_id = test_posts[0]["id"]
+    statements = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", _record)
+    try:
+        res = await authorized_async_client.put(f"/v2/posts/{post_id}", json={"title": "t", "content": "c"})
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", _record)
+
+    assert res.status_code == 200
+    assert int(res.headers["X-DB-Queries"]) == len(statements) > 0
+    assert res.headers["Server-Timing"].startswith("db;dur=")
+    assert f'desc="{len(statements)} queries"' in res.headers["Server-Timing"]
+
+
+async def test_slow_query_log_groups_by_fingerprint(authorized_async_client, test_posts, monkeypatch, caplog):
+    monkeypatch.setattr(settings, "slow_query_threshold_ms", 0.0)
+    with caplog.at_level(logging.WARNING, logger="app.slow_query"):
+        for post in test_posts[:2]:
+            await authorized_async_client.get(f"/v2/posts/{post['id']}")
+
+    entries = [json.loads(record.getMessage()) for record in caplog.records if record.name == "app.slow_query"]
+    lookups = [e for e in entries if e["statement"].startswith("SELECT posts.id")]
+    assert len(lookups) == 2
+    assert lookups[0]["fingerprint"] == lookups[1]["fingerprint"]
+    assert lookups[0]["parameters"] != lookups[1]["parameters"]
+    assert lookups[0]["request"] == f"GET /v2/posts/{test_posts[0]['id']}"
+
+
+async def test_normalize_statement():
+    statement = "SELECT * FROM posts WHERE id IN ($1::INTEGER, $2::INTEGER) AND title = 'x''y'  AND n > 10"
+    assert normalize_statement(statement) == "SELECT * FROM posts WHERE id IN (...) AND title = ? AND n > ?"
+    assert fingerprint("SELECT 1 FROM t WHERE a IN (1, 2, 3)") == fingerprint("SELECT 1 FROM t WHERE a IN (4)")
@@ -0,0 +1,138 @@
+import asyncio
+
+import pytest
+import pytest_asyncio
+from fastapi import status
+
+from app.config import settings
+from app.response_cache import InMemoryBackend, RedisBackend, response_cache
+from app.schemas import Vote
+
+pytestmark = pytest.mark.asyncio
+
+
+class FakeRedis:
+    """Tiny RESP2 stand-in supporting the commands RedisBackend issues."""
+
+    def __init__(self):
+        self.data = {}
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                header = await reader.readline()
+                if not header:
+                    break
+                args = []
+                for _ in range(int(header[1:-2])):
+                    length = int((await reader.readline())[1:-2])
+                    args.append((await reader.readexactly(length + 2))[:-2])
+                writer.write(self.dispatch(args[0].decode().upper(), args[1:]))
+                await writer.drain()
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _bulk(value):
+        return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+
+    def dispatch(self, command, args):
+        if command == "GET":
+            return self._bulk(self.data.get(args[0]))
+        if command == "SET":
+            self.data[args[0]] = args[1]
+            return b"+OK\r\n"
+        if command == "INCR":
+            value = int(self.data.get(args[0], b"0")) + 1
+            self.data[args[0]] = str(value).encode()
+            return b":%d\r\n" % value
+        if command == "SCAN":
+            prefix = args[2].rstrip(b"*")
+            keys = [key for key in self.data if key.startswith(prefix)]
+            return b"*2\r\n" + self._bulk(b"0") + b"*%d\r\n" % len(keys) + b"".join(self._bulk(k) for k in keys)
+        if command == "DEL":
+            removed = sum(self.data.pop(key, None) is not None for key in args)
+            return b":%d\r\n" % removed
+        return b"-ERR unknown command\r\n"
+
+
+@pytest_asyncio.fixture()
+async def fake_redis():
+    fake = FakeRedis()
+    server = await asyncio.start_server(fake.handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    try:
+        yield fake, f"redis://127.0.0.1:{port}/0"
+    finally:
+        server.close()
+        await server.wait_closed()
+
+
+async def test_post_list_cache_hit_and_invalidation(authorized_async_client, test_posts):
+    first = await authorized_async_client.get("/v2/posts/", params={"limit": 5})
+    assert first.headers["X-Cache"] == "MISS"
+    second = await authorized_async_client.get("/v2/posts/", params={"limit": 5})
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.content == first.content
+
+    res = await authorized_async_client.post("/v2/posts/", json={"title": "new", "content": "c"})
+    assert res.status_code == status.HTTP_201_CREATED
+    third = await authorized_async_client.get("/v2/posts/", params={"limit": 5})
+    assert third.headers["X-Cache"] == "MISS"
+    assert len(third.json()) == 3
+
+async def test_post_detail_invalidated_by_vote(authorized_async_client, test_posts):
+    post_id = test_posts[0]["id"]
+    await authorized_async_client.get(f"/v2/posts/{post_id}")
+    cached = await authorized_async_client.get(f"/v2/posts/{post_id}")
+    assert cached.headers["X-Cache"] == "HIT"
+
+    res = await authorized_async_client.post("/v2/vote/", json=Vote(post_id=post_id, dir=1).model_dump())
+    assert res.status_code == status.HTTP_201_CREATED
+    fresh = await authorized_async_client.get(f"/v2/posts/{post_id}")
+    assert fresh.headers["X-Cache"] == "MISS"
+    assert fresh.json()["votes"] == 1
+
+async def test_in_memory_counters_bounded_and_never_go_back():
+    backend = InMemoryBackend(maxsize=8, counters_maxsize=2)
+    assert await backend.incr("a") == 1
+    assert await backend.incr("a") == 2
+    await backend.incr("b")
+    await backend.incr("c")
+    # "a" was evicted at 2; it and every other unseen key now start past that
+    assert len(backend._counters) == 2
+    assert await backend.get_counter("a") == 3
+    assert await backend.get_counter("never-seen") == 3
+    assert await backend.incr("a") == 4
+
+async def test_redis_backend_against_stand_in(authorized_async_client, test_posts, fake_redis, monkeypatch):
+    fake, url = fake_redis
+    monkeypatch.setattr(response_cache, "backend", RedisBackend(url))
+    post_id = test_posts[1]["id"]
+
+    assert (await authorized_async_client.get(f"/v2/posts/{post_id}")).headers["X-Cache"] == "MISS"
+    assert (await authorized_async_client.get(f"/v2/posts/{post_id}")).headers["X-Cache"] == "HIT"
+    assert any(key.startswith(b"posts:detail:") for key in fake.data)
+
+    res = await authorized_async_client.put(
+        f"/v2/posts/{post_id}", json={"title": "renamed", "content": "c", "published": True}
+    )
+    assert res.status_code == status.HTTP_200_OK
+    fresh = await authorized_async_client.get(f"/v2/posts/{post_id}")
+    assert fresh.headers["X-Cache"] == "MISS"
+    assert fresh.json()["post"]["title"] == "renamed"
+
+    await response_cache.clear()
+    assert fake.data == {}
+
+async def test_internal_stats_require_token(async_client, monkeypatch):
+    monkeypatch.setattr(settings, "internal_token", None)
+    assert (await async_client.get("/internal/stats")).status_code == status.HTTP_403_FORBIDDEN
+
+    monkeypatch.setattr(settings, "internal_token", "s3cret")
+    assert (await async_client.get("/internal/stats")).status_code == status.HTTP_403_FORBIDDEN
+    wrong = await async_client.get("/internal/stats", headers={"X-Internal-Token": "nope"})
+    assert wrong.status_code == status.HTTP_403_FORBIDDEN
+    res = await async_client.get("/internal/stats", headers={"X-Internal-Token": "s3cret"})
+    assert res.status_code == status.HTTP_200_OK
+    assert "hits" in res.json()["response_cache"]
@@ -0,0 +1,25 @@
+from gunicorn.config import Config
+from uvicorn_worker import UvicornWorker
+
+from app import serve
+
+
+def test_worker_count_from_cpus_unless_configured():
+    assert serve.worker_count(cpus=4, per_cpu=1.0) == 4
+    assert serve.worker_count(cpus=4, per_cpu=2.0) == 8
+    assert serve.worker_count(cpus=1, per_cpu=0.5) == 1
+    assert serve.worker_count(cpus=4, per_cpu=1.0, configured=3) == 3
+    assert serve.available_cpus() >= 1
+
+
+def test_gunicorn_options_are_valid_settings():
+    args = serve.parse_args(["--workers", "2", "--max-requests", "1000", "--max-requests-jitter", "100"])
+    config = Config()
+    for key, value in serve.gunicorn_options(args).items():
+        config.set(key, value)
+
+    assert config.workers == 2
+    assert config.preload_app is True
+    assert config.max_requests == 1000
+    assert config.worker_class is serve.UvicornWorker
+    assert issubclass(config.worker_class, UvicornWorker)
@@ -0,0 +1,38 @@
+import pytest
+
+from app import database, services
+from app.main import app
+from app.startup import startup_state
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_ready_only_after_lifespan_startup(async_client):
+    # ASGITransport does not run the lifespan, so nothing has marked us ready
+    res = await async_client.get("/ready")
+    assert res.status_code == 503
+    assert res.json()["ready"] is False
+
+    async with app.router.lifespan_context(app):
+        res = await async_client.get("/ready")
+        assert res.status_code == 200
+        body = res.json()
+        assert body["ready"] is True
+        assert {"settings", "import", "engine", "prewarm"} <= set(body["phases"])
+
+    assert startup_state.ready is False
+
+
+async def test_prewarm_opens_separate_connections_and_warms_each():
+    await database.async_engine.dispose()
+    warmed = []
+
+    async def warm_up(conn):
+        await services.warm_up(conn)
+        warmed.append(id(await conn.get_raw_connection()))
+
+    opened = await database.prewarm(3, warm_up)
+
+    assert opened["primary"] == 3
+    assert len(set(warmed)) == 3
+    assert database.async_engine.pool.checkedin() == 3
@@ -1,7 +1,20 @@
 
+import asyncio
+import logging
+import os
+
 import pytest
 from fastapi import status
+from sqlalchemy import event, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app import services
+from app.config import settings
+from app.database import AsyncSessionLocal, async_engine
+from app.models import Post
 from app.schemas import Vote
+from app.vote_buffer import VoteBuffer, vote_buffer
+from app.vote_counts import find_vote_count_drift, repair_vote_count_drift
 
 pytestmark = pytest.mark.asyncio
 
@@ -31,6 +44,138 @@ async def test_vote_revoke_without_vote(authorized_async_client, test_posts):
     assert res.status_code == status.HTTP_404_NOT_FOUND
 
 async def test_vote_on_missing_post(authorized_async_client):
-    payload = Vote(post_id=999999, dir=1).model_dump()
-    res = await authorized_async_client.post("/v2/vote/", json=payload)
-    assert res.status_code == status.HTTP_404_NOT_FOUND
+    for direction in (1, 0):
+        payload = Vote(post_id=999999, dir=direction).model_dump()
+        res = await authorized_async_client.post("/v2/vote/", json=payload)
+        assert res.status_code == status.HTTP_404_NOT_FOUND
+        assert res.json()["detail"] == "Post 999999 not found"
+
+async def test_vote_integrity_errors_other_than_missing_post_propagate(test_posts):
+    # votes.user_id foreign key: not a missing post
+    async with AsyncSessionLocal() as session:
+        with pytest.raises(IntegrityError):
+            await services.add_vote(session, 999999, test_posts[0]["id"])
+
+async def test_vote_updates_post_vote_count(authorized_async_client, test_posts):
+    post_id = test_posts[0]["id"]
+    res = await authorized_async_client.post("/v2/vote/", json=Vote(post_id=post_id, dir=1).model_dump())
+    assert res.status_code == status.HTTP_201_CREATED
+    res = await authorized_async_client.get(f"/v2/posts/{post_id}")
+    assert res.json()["votes"] == 1
+
+    res = await authorized_async_client.post("/v2/vote/", json=Vote(post_id=post_id, dir=0).model_dump())
+    assert res.status_code == status.HTTP_201_CREATED
+    res = await authorized_async_client.get(f"/v2/posts/{post_id}")
+    assert res.json()["votes"] == 0
+
+async def test_reconcile_vote_count_drift(authorized_async_client, test_posts):
+    post_id = test_posts[0]["id"]
+    res = await authorized_async_client.post("/v2/vote/", json=Vote(post_id=post_id, dir=1).model_dump())
+    assert res.status_code == status.HTTP_201_CREATED
+
+    async with AsyncSessionLocal() as session:
+        await session.execute(update(Post).where(Post.id == post_id).values(vote_count=7))
+        await session.commit()
+        drift = await find_vote_count_drift(session)
+        assert drift == [{"post_id": post_id, "stored": 7, "actual": 1}]
+        assert await repair_vote_count_drift(session) == [post_id]
+        await session.commit()
+        assert await find_vote_count_drift(session) == []
+
+async def test_vote_is_single_statement(authorized_async_client, test_posts):
+    post_id = test_posts[0]["id"]
+    # warm the token/principal caches so only the vote itself hits the database
+    await authorized_async_client.get(f"/v2/posts/{post_id}")
+
+    statements = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", _record)
+    try:
+        for direction in (1, 0):
+            res = await authorized_async_client.post(
+                "/v2/vote/", json=Vote(post_id=post_id, dir=direction).model_dump()
+            )
+            assert res.status_code == status.HTTP_201_CREATED
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", _record)
+
+    assert len(statements) == 2
+
+async def test_vote_buffered_mode(authorized_async_client, test_posts, monkeypatch):
+    monkeypatch.setattr(settings, "vote_buffer_enabled", True)
+    post_id = test_posts[0]["id"]
+    try:
+        res = await authorized_async_client.post("/v2/vote/", json=Vote(post_id=post_id, dir=1).model_dump())
+        assert res.status_code == status.HTTP_202_ACCEPTED
+        await vote_buffer.flush()
+    finally:
+        await vote_buffer.stop()
+    res = await authorized_async_client.get(f"/v2/posts/{post_id}")
+    assert res.json()["votes"] == 1
+
+async def test_vote_buffer_replays_journal_last_write_wins(test_user, test_posts, tmp_path):
+    user_id = test_user["user"]["id"]
+    first, second = test_posts[0]["id"], test_posts[1]["id"]
+    # Segment left behind by a worker that died before flushing
+    (tmp_path / "votes-999999-1.log").write_text(
+        f"{user_id} {first} 1\n{user_id} {second} 1\n{user_id} {first} 0\n{user_id} 424242 1\n"
+    )
+    buffer = VoteBuffer(AsyncSessionLocal, max_batch=100, flush_interval=60, journal_dir=str(tmp_path))
+    await buffer.start()
+    await buffer.enqueue(user_id, test_posts[2]["id"], 1)
+    await buffer.stop()
+
+    stats = buffer.stats()
+    assert stats["last_batch_size"] == 4
+    assert stats["inserted"] == 2 and stats["deleted"] == 0
+    assert list(tmp_path.iterdir()) == []
+    async with AsyncSessionLocal() as session:
+        counts = dict((await session.execute(select(Post.id, Post.vote_count))).all())
+    assert counts == {first: 0, second: 1, test_posts[2]["id"]: 1}
+
+async def test_vote_buffer_enqueue_during_rotation_lands_in_new_segment(test_user, test_posts, tmp_path):
+    user_id = test_user["user"]["id"]
+    first, second = test_posts[0]["id"], test_posts[1]["id"]
+    buffer = VoteBuffer(AsyncSessionLocal, max_batch=100, flush_interval=60, journal_dir=str(tmp_path))
+    await buffer.start()
+    await buffer.enqueue(user_id, first, 1)
+    old_segment, new_segment = (tmp_path / f"votes-{os.getpid()}-{n}.log" for n in (1, 2))
+    # Block the old segment's fsync/close, then vote while the flush waits on it
+    async with buffer._journal_lock:
+        flush = asyncio.create_task(buffer.flush())
+        await asyncio.sleep(0)
+        vote = asyncio.create_task(buffer.enqueue(user_id, second, 1))
+        await asyncio.sleep(0)
+        assert old_segment.read_text() == f"{user_id} {first} 1\n"
+        assert new_segment.read_text() == f"{user_id} {second} 1\n"
+        assert list(buffer._pending) == [(user_id, second)]
+    assert await flush == 1
+    await vote
+    # The flush covered only the old segment; the new vote stays journaled
+    assert sorted(tmp_path.iterdir()) == [new_segment]
+    await buffer.stop()
+
+    assert buffer.stats()["votes_flushed"] == 2
+    assert list(tmp_path.iterdir()) == []
+    async with AsyncSessionLocal() as session:
+        counts = dict((await session.execute(select(Post.id, Post.vote_count))).all())
+    assert counts[first] == 1 and counts[second] == 1
+
+async def test_vote_buffer_replays_own_pid_segments_and_skips_torn_line(test_user, test_posts, tmp_path, caplog):
+    user_id = test_user["user"]["id"]
+    first, second = test_posts[0]["id"], test_posts[1]["id"]
+    # Left by an earlier process with our pid, and by a dead one; both end in a torn write
+    (tmp_path / f"votes-{os.getpid()}-1.log").write_text(f"{user_id} {first} 1\n{user_id} 4")
+    (tmp_path / "votes-999999-1.log").write_text(f"{user_id} {second} 1\n{user_id}\n")
+    buffer = VoteBuffer(AsyncSessionLocal, max_batch=100, flush_interval=60, journal_dir=str(tmp_path))
+    with caplog.at_level(logging.WARNING, logger="app.vote_buffer"):
+        await buffer.start()
+    assert buffer._pending == {(user_id, first): 1, (user_id, second): 1}
+    assert sum("malformed journal line" in record.message for record in caplog.records) == 2
+    await buffer.stop()
+
+    assert buffer.stats()["inserted"] == 2
+    assert list(tmp_path.iterdir()) == []